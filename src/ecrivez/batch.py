@@ -0,0 +1,260 @@
+"""Offline batch processing of JSONL prompts with resumable checkpoints.
+
+``ecrivez batch prompts.jsonl -o results.jsonl`` sends every input line
+through the configured provider on a bounded thread pool and appends one
+result record per item to the output as soon as it completes (so output
+order is completion order; use ``id``/``line`` to join).  Input lines are
+either a JSON string (the prompt) or an object with ``prompt`` and optional
+``id`` and ``system`` – or ready-made ``messages``.
+
+Next to the output, ``<output>.ckpt`` holds the checkpoint index:
+
+* ``watermark`` – every input line before it is done, and ``offset`` – the
+  byte offset of that line, so a resumed job seeks straight to it;
+* ``done`` – the (few) completed lines past the watermark;
+* ``output_bytes`` – how much of the output the index covers.
+
+Records appended after the last checkpoint are recovered from the output on
+resume and a torn final record is cut off, so a crashed job never redoes
+completed items.  Items whose provider call failed are written with an
+``error`` and retried by the next run; only the last record per ``id``
+counts.  Input lines are read lazily and at most ``concurrency`` items are in
+flight, so memory does not grow with the job size.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, List, Optional, TypedDict
+
+from ecrivez.chat import BaseProvider, Message
+
+__all__ = ["BatchItem", "BatchJob", "BatchStats", "parse_item"]
+
+
+class BatchItem(TypedDict):
+    line: int  # 0-based input line
+    id: str
+    messages: List[Message]
+
+
+class BatchStats(TypedDict):
+    total: int  # input lines
+    done: int  # completed in this run
+    failed: int  # provider errors in this run (retried on resume)
+    skipped: int  # already completed by a previous run
+    elapsed: float
+    rate: float  # items per second in this run
+    eta: Optional[float]  # seconds
+
+
+def parse_item(line: int, raw: str) -> BatchItem:
+    """Turn one JSONL input line into a :class:`BatchItem` (raises ValueError)."""
+
+    data = json.loads(raw)
+    if isinstance(data, str):
+        data = {"prompt": data}
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object or string")
+    if "messages" in data:
+        messages = [{"role": str(m["role"]), "content": str(m["content"])} for m in data["messages"]]
+    elif "prompt" in data:
+        messages = [{"role": "user", "content": str(data["prompt"])}]
+        if data.get("system"):
+            messages.insert(0, {"role": "system", "content": str(data["system"])})
+    else:
+        raise ValueError("item has neither 'prompt' nor 'messages'")
+    return {"line": line, "id": str(data.get("id", line)), "messages": messages}  # type: ignore[typeddict-item]
+
+
+def _count_lines(path: Path) -> int:
+    count, last = 0, b"\n"
+    with path.open("rb") as fh:
+        while chunk := fh.read(1 << 20):
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    return count + (last != b"\n")
+
+
+class BatchJob:
+    """Process the prompts of *input_path* into *output_path*, resumably."""
+
+    def __init__(
+        self,
+        input_path: str | Path,
+        output_path: str | Path,
+        provider: BaseProvider,
+        concurrency: int = 8,
+        checkpoint_every: float = 1.0,
+    ) -> None:
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path)
+        self.checkpoint_path = self.output_path.with_name(self.output_path.name + ".ckpt")
+        self.provider = provider
+        self.concurrency = max(1, concurrency)
+        self.checkpoint_every = checkpoint_every
+        self.watermark = 0
+        self.offset = 0
+        self.done: set[int] = set()
+        self._offsets: dict[int, int] = {}  # input offset of lines at/after the watermark
+
+    # -- checkpoint --------------------------------------------------------
+
+    def _load(self) -> int:
+        """Restore the checkpoint and recover records written after it; return the output size."""
+
+        try:
+            state = json.loads(self.checkpoint_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            state = {}
+        self.watermark = int(state.get("watermark", 0))
+        self.offset = int(state.get("offset", 0))
+        self.done = set(state.get("done", []))
+        covered = int(state.get("output_bytes", 0))
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_path.touch()
+        size = self.output_path.stat().st_size
+        if covered > size:  # output replaced or truncated: trust what it contains
+            self.watermark, self.offset, self.done, covered = 0, 0, set(), 0
+        with self.output_path.open("r+b") as fh:
+            fh.seek(covered)
+            good = covered
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    break  # torn record of a crashed run
+                good += len(raw)
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if "error" not in record or record.get("permanent"):
+                    self.done.add(int(record["line"]))
+            fh.truncate(good)
+        return good
+
+    def _save(self, output: Any) -> None:
+        output.flush()
+        os.fsync(output.fileno())
+        state = {
+            "input": str(self.input_path),
+            "watermark": self.watermark,
+            "offset": self.offset,
+            "done": sorted(self.done),
+            "output_bytes": output.tell(),
+        }
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.checkpoint_path)
+
+    def _mark_done(self, line: int) -> None:
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.discard(self.watermark)
+            self._offsets.pop(self.watermark, None)
+            self.watermark += 1
+        self.offset = self._offsets.get(self.watermark, self.offset)
+
+    # -- running -----------------------------------------------------------
+
+    def _call(self, item: BatchItem) -> tuple[str, float]:
+        started = time.perf_counter()
+        reply = self.provider.chat_completion(item["messages"])
+        return reply, time.perf_counter() - started
+
+    def run(self, progress: Callable[[BatchStats], None] | None = None) -> BatchStats:
+        """Process all pending items; *progress* gets stats after each completion."""
+
+        self._load()
+        total = _count_lines(self.input_path)
+        skipped = self.watermark + len(self.done)
+        done = failed = ignored = 0  # ignored: blank or invalid input lines
+        started = last_save = time.perf_counter()
+
+        def stats() -> BatchStats:
+            elapsed = time.perf_counter() - started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            remaining = total - skipped - done - failed - ignored
+            return {
+                "total": total,
+                "done": done,
+                "failed": failed,
+                "skipped": skipped,
+                "elapsed": elapsed,
+                "rate": rate,
+                "eta": remaining / rate if rate > 0 else None,
+            }
+
+        in_flight: dict[Future[tuple[str, float]], BatchItem] = {}
+        with (
+            ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ecrivez-batch") as pool,
+            self.output_path.open("ab") as output,
+            self.input_path.open("rb") as source,
+        ):
+
+            def write(record: dict[str, Any]) -> None:
+                output.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+
+            def settle(future: Future[tuple[str, float]]) -> None:
+                nonlocal done, failed
+                item = in_flight.pop(future)
+                try:
+                    reply, latency = future.result()
+                except Exception as exc:  # noqa: BLE001 – recorded, retried on resume
+                    write({"id": item["id"], "line": item["line"], "error": str(exc)})
+                    failed += 1
+                else:
+                    write({"id": item["id"], "line": item["line"], "reply": reply, "latency": round(latency, 4)})
+                    self._mark_done(item["line"])
+                    done += 1
+
+            try:
+                source.seek(self.offset)
+                lineno, position = self.watermark, self.offset
+                self._offsets[lineno] = position
+                for raw in source:
+                    line, lineno, position = lineno, lineno + 1, position + len(raw)
+                    self._offsets[lineno] = position  # the watermark may reach the next line
+                    if line < self.watermark or line in self.done:
+                        self._mark_done(line)  # recovered from the output
+                        continue
+                    text = raw.decode("utf-8", "replace").strip()
+                    if not text:
+                        self._mark_done(line)
+                        ignored += 1
+                        continue
+                    try:
+                        item = parse_item(line, text)
+                    except (ValueError, KeyError, TypeError) as exc:
+                        write({"id": str(line), "line": line, "error": f"invalid item: {exc}", "permanent": True})
+                        self._mark_done(line)
+                        ignored += 1
+                        continue
+                    while len(in_flight) >= self.concurrency:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            settle(future)
+                            if progress is not None:
+                                progress(stats())
+                    in_flight[pool.submit(self._call, item)] = item
+                    if time.perf_counter() - last_save >= self.checkpoint_every:
+                        self._save(output)
+                        last_save = time.perf_counter()
+                while in_flight:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        settle(future)
+                        if progress is not None:
+                            progress(stats())
+                self.offset = self._offsets.get(self.watermark, self.offset)
+            finally:
+                for future in list(in_flight):
+                    if future.cancel():
+                        in_flight.pop(future)
+                    elif future.done():
+                        settle(future)
+                self._save(output)
+        return stats()
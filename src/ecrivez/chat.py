@@ -6,22 +6,26 @@ For the time being we keep things minimal:
   in ``.ecrivez/config.yaml``.
 * If no provider library is available, we fall back to a *local echo* model so
   the rest of the UX can be exercised without network credentials.
-* Conversation context is kept in-memory only.  When the session ends the
-  history is discarded – later steps can persist it if desired.
+* Every turn is appended to ``.ecrivez/sessions/<session_id>.jsonl`` and
+  indexed for full-text search (see :pymod:`ecrivez.session`), so sessions can
+  be resumed with ``ecrivez repl --session <id>``.
 """
 
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, List, TypedDict
+from typing import Any, Callable, Iterable, Iterator, List, Literal, NotRequired, TypedDict
 
 import json
 import sys
 
 import yaml
 
+from ecrivez.history import History, RequestView
+from ecrivez.prefix import PromptMeter, Telemetry, build_request
 from ecrivez.tools import run_shell
 from ecrivez.nvim_api import connect, apply_diff
+from ecrivez.session import SessionStore
 from pydantic import BaseModel, Extra, ValidationError
 from typing import Optional
 from pydantic import Extra
@@ -29,19 +33,161 @@ from pydantic import Extra
 # ---------------------------------------------------------------------------
 # Input processing helper (Milestone 3)
 # ---------------------------------------------------------------------------
+def _apply_in_nvim(project: str, diff: str) -> None:
+    """Apply *diff*: headless when it names files, else to the Neovim buffer."""
+
+    if "\n+++ " not in diff:
+        from ecrivez.nvim_mirror import get_mirror
+
+        apply_diff(connect(project), diff, mirror=get_mirror(project))
+        return
+    from ecrivez.tools.patch import apply_patch
+
+    try:
+        nvim = connect(project)
+    except Exception:  # noqa: BLE001 – no editor attached, e.g. in CI
+        nvim = None
+    apply_patch(diff, nvim=nvim)
+
+
+DEFAULT_SHELL_TIMEOUT = 600.0  # seconds; a hung ``!cmd`` restarts the shell instead of the REPL hanging
+
+
+def _persistent_shell(
+    cfg: dict[str, Any], on_output: Callable[[str], None] | None = None
+) -> Callable[[str], str]:
+    """``run_shell``-compatible runner backed by the session's persistent shell.
+
+    *on_output* receives the output while the command runs (see
+    :meth:`~ecrivez.tools.shell.ShellSession.run`).
+    """
+
+    from ecrivez.tools.shell import get_shell
+
+    def run(cmd: str) -> str:
+        shell = get_shell(cfg.get("session_id", "default"), cfg.get("shell", "bash"))
+        result = shell.run(cmd, timeout=cfg.get("shell_timeout", DEFAULT_SHELL_TIMEOUT), on_output=on_output)
+        output = result["output"].strip()
+        if result["exit_code"] != 0:
+            return f"Command failed with exit code {result['exit_code']}:\n{output}"
+        return output or "<no output>"
+
+    return run
+
+
+def _tool_label(payload: dict[str, Any]) -> str | None:
+    """Command label of a JSON tool call (groups its outputs in ``History``); None if unknown."""
+
+    tool_name = payload.get("tool")
+    if tool_name == "shell":
+        return payload.get("cmd", "")
+    if tool_name == "pytest":
+        return "pytest " + " ".join(str(a) for a in payload.get("args", []))
+    if tool_name == "python":
+        return "python " + str(payload.get("code", ""))
+    if tool_name == "mcp":
+        arguments = payload.get("arguments") or {}
+        return f"mcp {payload.get('server', '')}.{payload.get('name', '')} {json.dumps(arguments, sort_keys=True)}"
+    return None
+
+
+def _run_tool(payload: dict[str, Any], cfg: dict[str, Any], shell: Callable[[str], str]) -> tuple[str | None, str]:
+    """Execute a JSON tool call; return its command label (None if unknown) and output."""
+
+    tool_name = payload.get("tool")
+    tool_cmd = _tool_label(payload)
+    if tool_name == "shell":
+        reply = shell(tool_cmd or "")
+    elif tool_name == "pytest":
+        from ecrivez.tools.testloop import get_test_loop
+
+        args = [str(a) for a in payload.get("args", [])]
+        run = get_test_loop().run(args, full=bool(payload.get("full")), timeout=payload.get("timeout"))
+        reply = (
+            f"[{run['mode']} run, {len(run['selected'])} selected, "
+            f"exit {run['exit_code']}, {run['duration']:.2f}s]\n{run['output']}"
+        )
+    elif tool_name == "python":
+        from ecrivez.tools.kernel import get_kernel
+
+        result = get_kernel(str(cfg.get("session_id", "default"))).execute(
+            str(payload.get("code", "")), timeout=payload.get("timeout", 60)
+        )
+        status = "" if result["status"] == "ok" else f"[{result['status']}]\n"
+        reply = status + (result["output"].rstrip("\n") or "<no output>")
+    elif tool_name == "mcp":
+        from ecrivez.config.mcp import MCPError, format_result, get_mcp_pool
+
+        try:
+            pool = get_mcp_pool(cfg.get("mcp_servers"))
+            reply = format_result(pool.call(payload.get("server", ""), payload.get("name", ""), payload.get("arguments") or {}))
+        except MCPError as exc:
+            reply = f"MCP error: {exc}"
+    else:
+        reply = f"Unknown tool: {tool_name}"
+    return tool_cmd, reply
+
+
+ToolRunner = Callable[[dict[str, Any], dict[str, Any], Callable[[str], str]], "tuple[str | None, str]"]
+
+
 def _process_input(
     user_input: str,
     cfg: dict[str, Any],
     provider: BaseProvider,
     history: List[Message],
+    shell: Callable[[str], str] | None = None,
+    apply: Callable[[str, str], None] | None = None,
+    meter: PromptMeter | None = None,
+    run_tool: ToolRunner | None = None,
 ) -> str:
-    """Process one REPL input, update history, and return assistant reply."""
+    """Process one REPL input, update history, and return assistant reply.
+
+    When *history* is a :class:`~ecrivez.history.History`, large tool outputs
+    are stored by reference and the returned reply is still the full output.
+    *shell* and *apply* replace :func:`run_shell` and the Neovim diff
+    application (``apply(project, diff)``), and *run_tool* replaces the
+    executor of JSON tool calls (``run_tool(payload, cfg, shell)`` returning
+    ``(label, output)``, see :func:`_run_tool`), e.g. to replay recorded
+    outputs without side effects.
+    Provider requests use the stable layout of :func:`build_request` (with
+    the ``context`` of *cfg* after the system prompt); with a
+    *meter* their cached/uncached prompt tokens are accounted.  With
+    ``model_tools`` in *cfg*, JSON tool calls in the reply are run as soon as
+    they are complete (see :mod:`ecrivez.toolcalls`) and their results
+    appended to the reply; a provider without ``stream_completion`` is
+    treated as a stream of one delta.
+    """
+    shell = shell or (_persistent_shell(cfg) if cfg.get("persistent_shell") else run_shell)
+    apply = apply or _apply_in_nvim
+    run_tool = run_tool or _run_tool
+
+    def ask() -> str:
+        request = build_request(history, cfg.get("context"))
+        if cfg.get("model_tools"):
+            from ecrivez.toolcalls import stream_tool_calls
+
+            stream = getattr(provider, "stream_completion", None)
+            # non-streaming providers (and wrappers) hand over the reply in one piece
+            deltas = stream(request) if stream is not None else iter([provider.chat_completion(request)])
+            streamed = stream_tool_calls(deltas, lambda call: run_tool(call, cfg, shell)[1])
+            answer = streamed["text"].strip()
+            for done in streamed["calls"]:
+                answer += f"\n\n[tool {json.dumps(done['call'], sort_keys=True)}]\n{done['result']}"
+        else:
+            answer = provider.chat_completion(request)
+        if meter is not None:
+            meter.measure(request, provider)
+        return answer
+
     # record user turn
     history.append({"role": "user", "content": user_input})
+    tool_cmd: str | None = None
 
     # shell shortcut
     if user_input.startswith("!"):
-        reply = run_shell(user_input[1:])
+        tool_cmd = user_input[1:]
+        reply = shell(tool_cmd)
     # JSON-based tool invocation
     elif user_input.strip().startswith("{"):
         try:
@@ -50,29 +196,27 @@ def _process_input(
             reply = "Invalid JSON tool invocation"
         else:
             if payload.get("type") == "tool":
-                tool_name = payload.get("tool")
-                if tool_name == "shell":
-                    reply = run_shell(payload.get("cmd", ""))
-                else:
-                    reply = f"Unknown tool: {tool_name}"
+                tool_cmd, reply = run_tool(payload, cfg, shell)
             else:
-                reply = provider.chat_completion(history)
+                reply = ask()
     # diff application
     elif user_input.startswith("/apply"):
         diff = user_input[len("/apply"):].strip()
         project = cfg.get("name", "")
         try:
-            nvim = connect(project)
-            apply_diff(nvim, diff)
+            apply(project, diff)
             reply = "(diff applied)"
         except Exception as exc:
             reply = f"Error applying diff: {exc}"
     # default chat
     else:
-        reply = provider.chat_completion(history)
+        reply = ask()
 
     # record assistant turn
-    history.append({"role": "assistant", "content": reply})
+    if tool_cmd is not None and isinstance(history, History):
+        history.add_tool_output(tool_cmd, reply)
+    else:
+        history.append({"role": "assistant", "content": reply})
     return reply
 
 __all__ = ["start_repl"]
@@ -86,6 +230,7 @@ __all__ = ["start_repl"]
 class Message(TypedDict):
     role: str  # "user" | "assistant" | "system"
     content: str
+    ref: NotRequired[str]  # digest of a tool output held by ``History``
 
 # Pydantic schema for project config validation
 class ProjectConfig(BaseModel):
@@ -93,6 +238,15 @@ class ProjectConfig(BaseModel):
     model: str
     provider: str
     openai_api_key: Optional[str] = None
+    session_format: Literal["jsonl", "binary"] = "jsonl"
+    mcp_servers: dict[str, dict[str, Any]] = {}
+    system_prompt: Optional[str] = None  # prompt id, see ecrivez.config.prompts
+    context: Optional[str] = None  # project notes sent after the system prompt, see ecrivez.prefix
+    inline_output_lines: int = 60  # larger replies are summarised, see ecrivez.ui.pager
+    persistent_shell: bool = True  # run !cmd in one long-lived shell, see ecrivez.tools.shell
+    shell: str = "bash"
+    shell_timeout: Optional[float] = DEFAULT_SHELL_TIMEOUT  # None: wait forever
+    model_tools: bool = False  # run JSON tool calls found in model replies, see ecrivez.toolcalls
 
     class Config:
         extra = Extra.forbid
@@ -107,6 +261,9 @@ class BaseProvider:  # pragma: no cover – interface only
     """Minimal abstraction for an LLM chat completion provider."""
 
     name: str
+    #: usage of the last request as reported by the API, e.g.
+    #: ``{"prompt_tokens": 1200, "cached_tokens": 1024}`` (None if unknown)
+    last_usage: Optional[dict[str, int]] = None
 
     def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
         """Return the assistant's next reply given the current conversation."""
@@ -123,6 +280,20 @@ class EchoProvider(BaseProvider):
                 return f"(echo) {msg['content']}"
         return "(echo) <no user message>"
 
+    def stream_completion(self, messages: List[Message]) -> Iterator[str]:
+        """Yield the reply word by word, like a streaming API would."""
+        reply = self.chat_completion(messages)
+        for i, word in enumerate(reply.split(" ")):
+            yield word if i == 0 else " " + word
+
+
+def _wire_messages(messages: Iterable[Message]) -> Iterable[dict[str, str]]:
+    """Messages as ``{"role", "content"}`` for the API; a request view already is one."""
+
+    if isinstance(messages, RequestView):
+        return messages
+    return [{"role": m["role"], "content": m["content"]} for m in messages]
+
 
 class OpenAIProvider(BaseProvider):
     """OpenAI wrapper (only instantiated if ``openai`` is importable)."""
@@ -132,19 +303,108 @@ class OpenAIProvider(BaseProvider):
 
         self._openai = openai
         self._model = model
+        # Routes requests sharing a prefix to the same cache (e.g. the session id).
+        self.cache_key: str | None = None
 
     @property
     def name(self) -> str:  # noqa: D401
         return f"openai:{self._model}"
 
+    def _extra(self) -> dict[str, Any]:
+        return {"extra_body": {"prompt_cache_key": self.cache_key}} if self.cache_key else {}
+
+    def _record_usage(self, usage: Any) -> None:
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.last_usage = {
+                "prompt_tokens": usage.prompt_tokens,
+                "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+            }
+
     def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
+        self.last_usage = None  # never report the previous request's numbers
         response = self._openai.chat.completions.create(  # type: ignore[attr-defined]
             model=self._model,
-            messages=[{"role": m["role"], "content": m["content"]} for m in messages],
+            messages=_wire_messages(messages),
+            **self._extra(),
         )
+        self._record_usage(getattr(response, "usage", None))
         # OpenAI v1 API returns choices[0].message.content
         return response.choices[0].message.content  # type: ignore[index]
 
+    def stream_completion(self, messages: List[Message]) -> Iterator[str]:
+        """Yield content deltas as the API produces them.
+
+        Usage arrives in a final chunk without choices
+        (``stream_options.include_usage``) and is kept in ``last_usage``.
+        """
+        self.last_usage = None
+        stream = self._openai.chat.completions.create(  # type: ignore[attr-defined]
+            model=self._model,
+            messages=_wire_messages(messages),
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._extra(),
+        )
+        for chunk in stream:
+            self._record_usage(getattr(chunk, "usage", None))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class CachedProvider(BaseProvider):
+    """Memoise another provider's replies, keyed by a hash of the conversation.
+
+    With *path* the cache is persisted as JSONL, so a second run over the same
+    conversations (e.g. ``ecrivez replay --cache``) is answered offline.
+    """
+
+    def __init__(self, inner: BaseProvider, path: str | Path | None = None) -> None:
+        import threading
+
+        self._inner = inner
+        self._path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._cache: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        if self._path is not None and self._path.exists():
+            with self._path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._cache[entry["key"]] = entry["reply"]
+
+    @property
+    def name(self) -> str:  # noqa: D401
+        return f"cached:{self._inner.name}"
+
+    @staticmethod
+    def key(messages: List[Message]) -> str:
+        import hashlib
+
+        digest = hashlib.sha256()
+        for m in messages:
+            digest.update(json.dumps([m["role"], m["content"]], ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
+        key = self.key(messages)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                return self._cache[key]
+        reply = self._inner.chat_completion(messages)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = reply
+            if self._path is not None:
+                with self._path.open("a", encoding="utf-8") as fh:
+                    fh.write(json.dumps({"key": key, "reply": reply}, ensure_ascii=False) + "\n")
+        return reply
+
 
 # ---------------------------------------------------------------------------
 # Bootstrap helpers
@@ -213,23 +473,71 @@ def _choose_provider(cfg: dict[str, Any]) -> BaseProvider:
     return EchoProvider()
 
 
+# Only these config values reach prompt templates (never e.g. API keys).
+PROMPT_VARIABLES = ("name", "model", "provider")
+
+
+def _system_prompt(cfg: dict[str, Any]) -> Message | None:
+    """The rendered ``system_prompt`` of *cfg*, or None (with a warning) if it is unknown."""
+
+    from ecrivez.config.prompts import get_prompt_registry
+
+    variables = {key: cfg[key] for key in PROMPT_VARIABLES if cfg.get(key) is not None}
+    try:
+        rendered = get_prompt_registry().render(cfg["system_prompt"], variables)
+    except KeyError as exc:
+        print(f"Warning: system prompt not used – {exc.args[0]}", file=sys.stderr)
+        return None
+    return {"role": "system", "content": rendered["text"]}
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
 
-def start_repl() -> None:  # noqa: WPS231 – small enough
-    """Interactive session executed in the *second* tmux pane or standalone."""
+def start_repl(session_id: str | None = None) -> None:  # noqa: WPS231 – small enough
+    """Interactive session executed in the *second* tmux pane or standalone.
+
+    Pass *session_id* (or a unique prefix of it) to resume a previous session.
+    """
 
     cfg = _load_config()
     provider = _choose_provider(cfg)
+    store = SessionStore(fmt=cfg.get("session_format", "jsonl"))
 
-    # generate a session ID for persistence
-    import uuid
-    session_id = uuid.uuid4().hex
+    if session_id is None:
+        import uuid
+
+        session_id = uuid.uuid4().hex
+    else:
+        store.sync()
+        try:
+            session_id = store.resolve(session_id)
+        except KeyError:
+            pass  # unknown id – start a fresh session under that name
+    store.open_session(session_id, model=cfg.get("model", ""), provider=provider.name)
+    cfg = {**cfg, "session_id": session_id}  # selects this session's shell and kernel
+    history = History(store.load(session_id))
+    if not history and cfg.get("system_prompt"):
+        system = _system_prompt(cfg)
+        if system is not None:
+            history.append(system)
+            store.append(session_id, history[:1])
+    if cfg.get("name"):
+        from ecrivez.nvim_mirror import get_mirror
+
+        get_mirror(cfg["name"])  # mirror the editor's buffers from the start (None without one)
+    meter = PromptMeter(cfg.get("model", "gpt-4o"))
+    telemetry = Telemetry()
+    if hasattr(provider, "cache_key"):
+        provider.cache_key = session_id
     print(f"🖋  Ecrivez REPL – provider = {provider.name}, session = {session_id}  (Ctrl-D to quit)\n")
-    history = _load_history(session_id)
 
+    from ecrivez.ui.pager import SpillBuffer, view_command
+
+    inline = int(cfg.get("inline_output_lines", 60))
+    view: Optional[SpillBuffer] = None
     try:
         while True:
             try:
@@ -239,28 +547,30 @@ def start_repl() -> None:  # noqa: WPS231 – small enough
                 break
             if not user_input.strip():
                 continue
+            viewed = view_command(user_input, view)
+            if viewed is not None:
+                if viewed:
+                    print(viewed)
+                continue
 
-            assistant_reply = _process_input(user_input, cfg, provider, history)
-            print("llm › " + assistant_reply)
+            start = len(history)
+            metered = len(meter.turns)
+            assistant_reply = _process_input(user_input, cfg, provider, history, meter=meter)
+            store.append(session_id, [history.expand(m) for m in history[start:]])
+            for usage in meter.turns[metered:]:
+                telemetry.record(session_id, provider.name, usage)
+            reply_view = SpillBuffer.from_text(assistant_reply, head_lines=inline // 2, tail_lines=inline // 2)
+            if reply_view.n_lines <= inline and reply_view.n_bytes <= inline * 400:
+                reply_view.close()
+                print("llm › " + assistant_reply)
+                continue
+            if view is not None:
+                view.close()
+            view = reply_view  # large: head/tail inline, the rest on demand
+            print("llm › " + view.summary())
     except KeyboardInterrupt:
         print("\nInterrupted – goodbye!")
-    # persist history
-    _save_history(history, session_id)
-
-
-# ---------------------------------------------------------------------------
-# Persistence (very simple, opt-in later)
-# ---------------------------------------------------------------------------
-
-
-def _save_history(history: List[Message]) -> None:
-    """Store the conversation next to the session for debugging."""
-
-    sessions_dir = Path(".ecrivez") / "sessions"
-    sessions_dir.mkdir(exist_ok=True)
-    out_file = sessions_dir / "last_session.jsonl"
-
-    with out_file.open("w") as fh:
-        for item in history:
-            json.dump(item, fh, ensure_ascii=False)
-            fh.write("\n")
+    finally:
+        if view is not None:
+            view.close()
+        store.close()
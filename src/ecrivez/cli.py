@@ -34,11 +34,585 @@ def chat(file: str | None):
 
 
 @click.command()
-def repl():
+@click.option("--session", "session_id", default=None, help="Resume this session id (or prefix)")
+@click.option("--server", "server_socket", default=None, help="Send turns to the 'ecrivez serve' socket at this path")
+def repl(session_id: str | None, server_socket: str | None):
     """Start an interactive chat REPL (runs outside tmux as well)."""
+    if server_socket is not None:
+        from .server import run_client_repl
+
+        try:
+            run_client_repl(server_socket, session_id)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+        return
+
     from .chat import start_repl
 
-    start_repl()
+    start_repl(session_id)
+
+
+@click.command()
+@click.option("--socket", "socket_path", default=None, help="Unix socket path (default: /tmp/ecrivez-<project>.sock)")
+@click.option("-j", "--concurrency", default=16, show_default=True, help="Turns processed in parallel")
+@click.option("--rate", type=float, default=None, help="Max provider calls per second, shared by all sessions")
+@click.option("--cache", type=click.Path(dir_okay=False), default=None, help="Memoise provider replies in this JSONL file")
+@click.option("--no-persist", is_flag=True, help="Do not write sessions to .ecrivez/sessions")
+@click.option("--load-test", "load_clients", type=int, default=None, help="Instead of serving, run N simulated clients against the echo provider")
+@click.option("--turns", default=10, show_default=True, help="Turns per simulated client (with --load-test)")
+def serve(socket_path, concurrency: int, rate: float | None, cache: str | None, no_persist: bool, load_clients: int | None, turns: int):
+    """Serve many REPL sessions from one process over a local socket"""
+    import asyncio
+
+    from .chat import CachedProvider, EchoProvider, _choose_provider, _load_config
+    from .server import SOCKET_TEMPLATE, SessionServer, load_test
+
+    if load_clients is not None:
+        stats = load_test(EchoProvider(), clients=load_clients, turns=turns, max_concurrency=concurrency)
+        click.echo(
+            f"{stats['clients']} clients, {stats['turns']} turns in {stats['elapsed']:.2f}s "
+            f"({stats['turns_per_second']:.0f} turns/s), p50 {stats['latency_p50'] * 1000:.1f} ms, "
+            f"max {stats['latency_max'] * 1000:.1f} ms, {stats['memory_per_session'] / 1024:.1f} KiB/session"
+        )
+        return
+
+    cfg = _load_config()
+    provider = _choose_provider(cfg)
+    if cache is not None:
+        provider = CachedProvider(provider, cache)
+    path = socket_path or SOCKET_TEMPLATE.format(name=cfg["name"])
+    store = None
+    if not no_persist:
+        from .session import SessionStore
+
+        store = SessionStore(fmt=cfg.get("session_format", "jsonl"))
+    server = SessionServer(provider, cfg=cfg, store=store, max_concurrency=concurrency, rate=rate)
+    click.echo(f"Serving {provider.name} on {path} (Ctrl-C to stop)")
+    try:
+        asyncio.run(server.serve_forever(path))
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    finally:
+        server.close()
+        if store is not None:
+            store.close()
+
+
+def _fmt_ts(ts: float) -> str:
+    from datetime import datetime
+
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+
+
+@click.group()
+def sessions():
+    """List, search and show persisted chat sessions"""
+    pass
+
+
+@sessions.command("list")
+@click.option("--limit", default=20, show_default=True, help="Number of sessions to show")
+def sessions_list(limit: int):
+    """List the most recently updated sessions"""
+    from .session import SessionStore
+
+    with SessionStore() as store:
+        store.sync()
+        rows = store.list_sessions(limit)
+    if not rows:
+        click.echo("No sessions found.")
+        return
+    for row in rows:
+        click.echo(
+            f"{row['id'][:12]}  {_fmt_ts(row['updated_at'])}  "
+            f"{row['n_messages']:>5} msgs  {row['tokens']:>8} tok  {row['model']}"
+        )
+
+
+@sessions.command("search")
+@click.argument("query", nargs=-1, required=True)
+@click.option("--limit", default=20, show_default=True, help="Maximum number of hits")
+@click.option("--role", type=click.Choice(["user", "assistant", "system"]), help="Only match this role")
+@click.option("--session", "session_id", default=None, help="Restrict to one session id (or prefix)")
+@click.option("--raw", is_flag=True, help="Pass QUERY to SQLite FTS5 unquoted")
+def sessions_search(query, limit: int, role: str | None, session_id: str | None, raw: bool):
+    """Full-text search across every message of every session"""
+    import sqlite3
+
+    from .session import SessionStore
+
+    with SessionStore() as store:
+        store.sync()
+        try:
+            if session_id is not None:
+                session_id = store.resolve(session_id)
+            hits = store.search(" ".join(query), limit=limit, role=role, session_id=session_id, raw=raw)
+        except (KeyError, sqlite3.OperationalError) as exc:
+            raise click.ClickException(str(exc)) from exc
+    for hit in hits:
+        snippet = " ".join(hit["snippet"].split())
+        click.echo(f"{hit['session_id'][:12]}#{hit['seq']:<4} {_fmt_ts(hit['ts'])}  {hit['role']:<9} {snippet}")
+
+
+@sessions.command("show")
+@click.argument("session_id")
+@click.option("--tail", type=int, default=None, help="Only show the last N messages")
+def sessions_show(session_id: str, tail: int | None):
+    """Print the transcript of SESSION_ID (a unique prefix is enough)"""
+    from .session import SessionStore
+
+    with SessionStore() as store:
+        store.sync()
+        try:
+            session_id = store.resolve(session_id)
+        except KeyError as exc:
+            raise click.ClickException(exc.args[0]) from exc
+        records = store.iter_records(session_id) if tail is None else store.tail(session_id, tail)
+        for record in records:
+            prefix = "you › " if record["role"] == "user" else "llm › "
+            click.echo(prefix + record["content"])
+
+
+@sessions.command("export")
+@click.argument("session_id")
+@click.option("--to", "fmt", type=click.Choice(["jsonld", "jsonl"]), default="jsonld", show_default=True)
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-", help="Output file")
+def sessions_export(session_id: str, fmt: str, output):
+    """Export SESSION_ID as JSON-LD (session template layout) or JSONL"""
+    import json
+
+    from .session import SessionStore
+    from .session.jsonld import write_jsonld
+
+    with SessionStore() as store:
+        store.sync()
+        try:
+            session_id = store.resolve(session_id)
+        except KeyError as exc:
+            raise click.ClickException(exc.args[0]) from exc
+        records = store.iter_records(session_id)
+        if fmt == "jsonl":
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        info = store.session_info(session_id)
+        write_jsonld(output, session_id, records, model=info["model"], provider=info["provider"])
+
+
+@sessions.command("usage")
+@click.argument("session_id", required=False)
+@click.option("--turns", is_flag=True, help="Show every turn, not only the totals")
+def sessions_usage(session_id: str | None, turns: bool):
+    """Cached vs. uncached prompt tokens (all sessions, or SESSION_ID)"""
+    from .prefix import Telemetry
+    from .session import SessionStore
+
+    if session_id is not None:
+        with SessionStore() as store:
+            store.sync()
+            try:
+                session_id = store.resolve(session_id)
+            except KeyError:
+                pass  # telemetry may outlive the journal
+    entries = Telemetry().entries(session_id)
+    if not entries:
+        click.echo("No usage recorded.")
+        return
+    if turns:
+        for entry in entries:
+            click.echo(
+                f"{entry['session'][:12]}  {_fmt_ts(entry['ts'])}  prompt {entry['prompt_tokens']:>7}  "
+                f"cached {entry['cached_tokens']:>7}  ({entry['source']})"
+            )
+    prompt = sum(e["prompt_tokens"] for e in entries)
+    cached = sum(e["cached_tokens"] for e in entries)
+    ratio = cached / prompt if prompt else 0.0
+    click.echo(f"{len(entries)} turns: {prompt} prompt tokens, {cached} cached ({ratio:.0%}), {prompt - cached} uncached")
+
+
+@sessions.command("graph")
+@click.argument("session_ids", nargs=-1)
+@click.option("-o", "--output", type=click.Path(dir_okay=False), default="sessions.html", show_default=True)
+@click.option("--slow", default=30.0, show_default=True, help="Highlight steps slower than this many seconds")
+@click.option("--mode", type=click.Choice(["auto", "layout", "cluster", "plain"]), default="auto", show_default=True)
+def sessions_graph(session_ids, output: str, slow: float, mode: str):
+    """Render SESSION_IDS (default: all) as a message/tool/edit graph"""
+    from .session import SessionStore
+    from .session.graph import SessionGraph
+    from .ui.generate_graph import write_html
+
+    with SessionStore() as store:
+        store.sync()
+        try:
+            ids = [store.resolve(s) for s in session_ids] or [r["id"] for r in store.list_sessions(-1)]
+        except KeyError as exc:
+            raise click.ClickException(exc.args[0]) from exc
+        graph = SessionGraph(store, slow=slow)
+        processed = sum(graph.update(s) for s in ids)
+        with open(output, "w", encoding="utf-8") as out:
+            counts = write_html(lambda: graph.items(ids), out, mode=mode, title="Ecrivez sessions")
+    click.echo(f"{len(ids)} sessions ({processed} new records): {counts['nodes']} nodes, {counts['edges']} edges → {output}")
+
+
+@click.command()
+@click.argument("session_ids", nargs=-1)
+@click.option("--provider", "provider_name", type=click.Choice(["recorded", "echo", "config"]), default="recorded", show_default=True, help="Who answers chat turns")
+@click.option("--cache", type=click.Path(dir_okay=False), default=None, help="Memoise provider replies in this JSONL file")
+@click.option("-j", "--concurrency", default=8, show_default=True, help="Sessions replayed in parallel")
+@click.option("--repeat", default=1, show_default=True, help="Replay every session N times (load testing)")
+@click.option("--diffs", "max_diffs", default=5, show_default=True, help="Number of reply diffs to print")
+def replay(session_ids, provider_name: str, cache: str | None, concurrency: int, repeat: int, max_diffs: int):
+    """Replay recorded sessions (all of them by default) with stubbed tools"""
+    from .chat import CachedProvider, EchoProvider, _choose_provider, _load_config
+    from .session import SessionStore
+    from .session.replay import diff_turn, replay_sessions, split_session
+
+    cfg: dict = {}
+    if provider_name == "config":
+        cfg = _load_config()
+        shared = _choose_provider(cfg)
+    elif provider_name == "echo":
+        shared = EchoProvider()
+    else:
+        shared = None
+    if cache is not None:
+        if shared is None:
+            raise click.UsageError("--cache needs --provider echo or --provider config")
+        shared = CachedProvider(shared, cache)
+
+    with SessionStore() as store:
+        store.sync()
+        try:
+            ids = [store.resolve(s) for s in session_ids] or [
+                row["id"] for row in store.list_sessions(limit=-1)
+            ]
+        except KeyError as exc:
+            raise click.ClickException(exc.args[0]) from exc
+        sessions = []
+        for sid in ids:
+            system, turns = split_session(store.iter_records(sid))
+            sessions.append((sid, turns, system))
+
+    report = replay_sessions(sessions, lambda: shared, concurrency=concurrency, repeat=repeat, cfg=cfg)
+    lat = report["latency"]
+    click.echo(
+        f"{report['sessions']} sessions, {report['turns']} turns in {report['elapsed']:.2f}s "
+        f"({report['turns_per_second']:.1f} turns/s)"
+    )
+    click.echo(
+        "latency ms  p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+            *(lat[k] * 1000 for k in ("p50", "p90", "p99", "max"))
+        )
+    )
+    click.echo(f"{len(report['mismatches'])} replies differ from the recording")
+    for result in report["mismatches"][:max_diffs]:
+        click.echo(diff_turn(result))
+
+
+@click.command()
+@click.argument("spec_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--provider", "provider_name", type=click.Choice(["config", "echo"]), default="config", show_default=True)
+@click.option("--checkpoint", type=click.Path(dir_okay=False), default=None, help="Checkpoint file (default: .ecrivez/workflows/<spec>.jsonl)")
+@click.option("-j", "--concurrency", type=int, default=None, help="Steps run in parallel (overrides the spec)")
+def workflow(spec_file: str, provider_name: str, checkpoint: str | None, concurrency: int | None):
+    """Run (or resume) the step DAG described in SPEC_FILE (YAML)"""
+    from pathlib import Path
+
+    import yaml
+
+    from .chat import EchoProvider, _choose_provider, _load_config
+    from .workflow import WorkflowError, load_workflow
+
+    spec = yaml.safe_load(Path(spec_file).read_text()) or {}
+    provider = EchoProvider() if provider_name == "echo" else _choose_provider(_load_config())
+    checkpoint = checkpoint or str(Path(".ecrivez") / "workflows" / f"{Path(spec_file).stem}.jsonl")
+    try:
+        wf = load_workflow(spec, provider=provider, checkpoint=checkpoint, max_concurrency=concurrency)
+        wf.run_sync()
+    except (ValueError, WorkflowError) as exc:
+        raise click.ClickException(str(exc)) from exc
+    for name in wf.order:
+        status = "cached" if name in wf.skipped else f"{wf.timings.get(name, 0.0):.2f}s"
+        click.echo(f"{name:<24} {status}")
+
+
+@click.command()
+@click.argument("text")
+@click.option("--provider", "provider_name", type=click.Choice(["config", "echo"]), default="config", show_default=True)
+@click.option("--queue-size", type=int, default=64, show_default=True, help="Chunks buffered between stages")
+@click.option("--stats", is_flag=True, help="Print per-stage throughput and backpressure to stderr")
+def pipeline(text: str, provider_name: str, queue_size: int, stats: bool):
+    """Stream stdin through the pipeline TEXT, e.g. 'grep ERROR | { head 5 , llm -n 50 Summarise }'"""
+    import asyncio
+    import sys
+
+    from .chat import EchoProvider, _choose_provider, _load_config
+    from .pipeline import Pipeline, PipelineError, read_lines
+
+    def write(chunk: str) -> None:
+        sys.stdout.write(chunk + "\n")
+        sys.stdout.flush()
+
+    provider = EchoProvider() if provider_name == "echo" else _choose_provider(_load_config())
+    try:
+        pipe = Pipeline(text, provider=provider, queue_size=queue_size)
+    except PipelineError as exc:
+        raise click.ClickException(str(exc)) from exc
+    asyncio.run(pipe.run(read_lines(sys.stdin), write))
+    if stats:
+        for s in pipe.stats():
+            click.echo(
+                f"{s['stage']:<32} in {s['chunks_in']:>8}  out {s['chunks_out']:>8}  "
+                f"{s['throughput']:>10.1f}/s  busy {s['busy']:.2f}s  blocked {s['blocked']:.2f}s",
+                err=True,
+            )
+
+
+@click.group()
+def mcp():
+    """Inspect the configured MCP servers"""
+
+
+@mcp.command("tools")
+@click.argument("server", required=False)
+@click.option("--refresh", is_flag=True, help="Start the server(s) and re-fetch the tool schemas")
+def mcp_tools(server: str | None, refresh: bool):
+    """List the tools of SERVER (default: all servers), from cache when possible"""
+    from .chat import _load_config
+    from .config.mcp import MCPError, get_mcp_pool
+
+    try:
+        pool = get_mcp_pool(_load_config().get("mcp_servers"))
+        names = [server] if server else list(pool.servers)
+        for name in names:
+            if refresh:
+                pool.connection(name).tools_changed = True
+            for tool in pool.tools(name):
+                click.echo(f"{name}.{tool['name']:<32} {tool.get('description', '')}")
+    except MCPError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+
+@click.group()
+def prompts():
+    """Browse the prompt library"""
+
+
+@prompts.command("list")
+@click.option("--refresh", is_flag=True, help="Re-scan the prompt directories")
+def prompts_list(refresh: bool):
+    """List prompt ids with their description"""
+    from .config.prompts import get_prompt_registry
+
+    registry = get_prompt_registry()
+    if refresh:
+        registry.refresh()
+    for prompt_id in registry.ids():
+        prompt = registry.prompts[prompt_id]
+        click.echo(f"{prompt_id:<24} {prompt.meta.get('description', '')}")
+
+
+@prompts.command("show")
+@click.argument("prompt_id")
+@click.option("--var", "variables", multiple=True, metavar="NAME=VALUE", help="Template variable")
+def prompts_show(prompt_id: str, variables: tuple[str, ...]):
+    """Render PROMPT_ID and print it with its token count"""
+    from .config.prompts import get_prompt_registry
+
+    values = dict(v.split("=", 1) for v in variables if "=" in v)
+    try:
+        rendered = get_prompt_registry().render(prompt_id, values)
+    except KeyError as exc:
+        raise click.ClickException(str(exc.args[0])) from exc
+    click.echo(rendered["text"])
+    click.echo(f"[{rendered['tokens']} tokens]", err=True)
+
+
+@click.command()
+@click.argument("source", type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "--output", type=click.Path(dir_okay=False), default=None, help="HTML file (default: SOURCE with .html)")
+@click.option("--data-file", is_flag=True, help="Write items to a separate NDJSON file loaded incrementally")
+@click.option("--mode", type=click.Choice(["auto", "layout", "cluster", "plain"]), default="auto", show_default=True)
+@click.option("--threshold", default=5000, show_default=True, help="Node count above which 'auto' pre-lays out")
+def graph(source: str, output: str | None, data_file: bool, mode: str, threshold: int):
+    """Render the YAML/JSON node/edge graph in SOURCE as an HTML page"""
+    from pathlib import Path
+
+    from .ui.generate_graph import write_html
+
+    out_path = Path(output) if output else Path(source).with_suffix(".html")
+    data_path = out_path.with_suffix(".ndjson") if data_file else None
+    try:
+        with out_path.open("w", encoding="utf-8") as out:
+            counts = write_html(Path(source), out, data_file=data_path, threshold=threshold, mode=mode)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(f"{counts['nodes']} nodes, {counts['edges']} edges → {out_path}")
+
+
+@click.command()
+@click.argument("patch_file", type=click.File("r"), default="-")
+@click.option("--root", type=click.Path(file_okay=False, exists=True), default=".", show_default=True)
+@click.option("--workers", type=int, default=None, help="Threads applying hunks (default: CPUs + 4)")
+@click.option("--check", is_flag=True, help="Only verify that the patch applies")
+@click.option("--nvim", "project", default=None, help="Reload buffers of this project's Neovim afterwards")
+def patch(patch_file, root: str, workers: int | None, check: bool, project: str | None):
+    """Apply the multi-file unified diff PATCH_FILE (default: stdin) atomically"""
+    from .tools.patch import PatchError, apply_patch
+
+    nvim = None
+    if project:
+        from .nvim_api import connect
+
+        try:
+            nvim = connect(project)
+        except Exception as exc:  # noqa: BLE001
+            raise click.ClickException(f"cannot attach to Neovim: {exc}") from exc
+    try:
+        result = apply_patch(patch_file.read(), root=root, workers=workers, nvim=nvim, check=check)
+    except PatchError as exc:
+        raise click.ClickException(str(exc)) from exc
+    verb = "would patch" if check else "patched"
+    click.echo(f"{verb} {len(result['files'])} files ({result['hunks']} hunks) in {result['duration']:.3f}s")
+    for old, new in result["renamed"]:
+        click.echo(f"renamed {old} -> {new}")
+
+
+@click.command("best-of")
+@click.argument("task")
+@click.option("-n", "--samples", default=4, show_default=True, help="Candidates requested in parallel")
+@click.option("--test-cmd", default="python -m pytest -q", show_default=True, help="Command run in each worktree")
+@click.option("--provider", "provider_name", type=click.Choice(["config", "echo"]), default="config", show_default=True)
+@click.option("--workers", type=int, default=None, help="Concurrent test runs (default: min(N, CPUs))")
+@click.option("--timeout", type=float, default=600.0, show_default=True, help="Seconds per test run")
+@click.option("--no-apply", is_flag=True, help="Report the winner without applying it")
+def best_of(task: str, samples: int, test_cmd: str, provider_name: str, workers: int | None, timeout: float, no_apply: bool):
+    """Generate N candidate patches for TASK and keep the first that passes the tests"""
+    from .chat import EchoProvider, _choose_provider, _load_config
+    from .tools.candidates import CandidateError, best_of as run_best_of
+
+    provider = EchoProvider() if provider_name == "echo" else _choose_provider(_load_config())
+    try:
+        result = run_best_of(
+            provider, task, n=samples, test_cmd=test_cmd, workers=workers, timeout=timeout, apply=not no_apply
+        )
+    except CandidateError as exc:
+        raise click.ClickException(str(exc)) from exc
+    for candidate in result["candidates"]:
+        click.echo(
+            f"#{candidate['index']:<3} {candidate['status']:<10} generated {candidate['generate_time']:.1f}s  "
+            f"tests {candidate['test_time']:.1f}s"
+        )
+    if result["winner"] is None:
+        raise click.ClickException(f"no candidate passed ({result['duration']:.1f}s)")
+    verb = "selected" if no_apply else "applied"
+    click.echo(f"{verb} candidate #{result['winner']} after {result['duration']:.1f}s")
+
+
+@click.command()
+@click.argument("input_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "--output", type=click.Path(dir_okay=False), required=True, help="Result JSONL (appended, resumable)")
+@click.option("--provider", "provider_name", type=click.Choice(["config", "echo"]), default="config", show_default=True)
+@click.option("-j", "--concurrency", default=8, show_default=True, help="Provider calls in flight")
+@click.option("--quiet", is_flag=True, help="No progress line")
+def batch(input_file: str, output: str, provider_name: str, concurrency: int, quiet: bool):
+    """Run every prompt of INPUT_FILE (JSONL) through the provider, resuming where a previous run stopped"""
+    import time
+
+    from .batch import BatchJob
+    from .chat import EchoProvider, _choose_provider, _load_config
+
+    provider = EchoProvider() if provider_name == "echo" else _choose_provider(_load_config())
+    shown = [0.0]
+
+    def progress(stats) -> None:
+        now = time.monotonic()
+        if quiet or now - shown[0] < 0.5:
+            return
+        shown[0] = now
+        finished = stats["skipped"] + stats["done"]
+        eta = f"{stats['eta']:.0f}s" if stats["eta"] is not None else "?"
+        click.echo(
+            f"\r{finished}/{stats['total']}  {stats['rate']:.1f} items/s  ETA {eta}  failed {stats['failed']}",
+            nl=False,
+            err=True,
+        )
+
+    stats = BatchJob(input_file, output, provider, concurrency=concurrency).run(progress=progress)
+    if not quiet:
+        click.echo("", err=True)
+    click.echo(
+        f"{stats['done']} done, {stats['failed']} failed, {stats['skipped']} already done "
+        f"in {stats['elapsed']:.2f}s ({stats['rate']:.1f} items/s) → {output}"
+    )
+    if stats["failed"]:
+        raise click.ClickException(f"{stats['failed']} items failed; run again to retry them")
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", type=int, default=7860, show_default=True)
+@click.option("-j", "--concurrency", default=16, show_default=True, help="Turns processed in parallel")
+@click.option("--max-queue", default=256, show_default=True, help="Turns allowed to wait for a slot")
+@click.option("--provider", "provider_name", type=click.Choice(["config", "echo"]), default="config", show_default=True)
+@click.option("--load-test", "load_clients", type=int, default=None, help="Instead of serving, run N simulated browser clients")
+@click.option("--turns", default=5, show_default=True, help="Turns per simulated client (with --load-test)")
+def web(host: str, port: int, concurrency: int, max_queue: int, provider_name: str, load_clients: int | None, turns: int):
+    """Serve the chat in the browser (Gradio), one isolated history per browser session"""
+    from .chat import EchoProvider, _choose_provider, _load_config
+    from .ui.web import build_app, load_test
+
+    cfg = _load_config() if provider_name == "config" else {}
+    provider = EchoProvider() if provider_name == "echo" else _choose_provider(cfg)
+    if load_clients is not None:
+        stats = load_test(provider, clients=load_clients, turns=turns, concurrency=concurrency, cfg=cfg)
+        click.echo(
+            f"{stats['clients']} clients, {stats['turns']} turns in {stats['elapsed']:.2f}s "
+            f"({stats['turns_per_second']:.1f} turns/s), p50 {stats['latency_p50'] * 1000:.1f} ms, "
+            f"p90 {stats['latency_p90'] * 1000:.1f} ms, max {stats['latency_max'] * 1000:.1f} ms"
+        )
+        if stats["errors"]:
+            raise click.ClickException(f"{len(stats['errors'])} turns failed, first: {stats['errors'][0]}")
+        return
+
+    app = build_app(provider, cfg, concurrency=concurrency, max_queue=max_queue)
+    click.echo(f"Serving {provider.name} on http://{host}:{port} (Ctrl-C to stop)")
+    app.launch(server_name=host, server_port=port, quiet=True)
+
+
+@click.command()
+@click.argument("input_file", type=click.File("r", encoding="utf-8"), default="-")
+@click.option("--from", "from_fmt", default=None, help="jsonl (json), jsonld or md (markdown); default: from the file name")
+@click.option("--to", "to_fmt", default=None, help="Output format; default: from --output, else jsonl")
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-", help="Output file")
+@click.option("--tee", type=click.File("w", encoding="utf-8"), default=None, help="Also write the output to this file")
+@click.option("--session-id", default=None, help="Session id for jsonld/md output (default: from the input)")
+@click.option("--model", default=None, help="Model name for jsonld output")
+def convert(input_file, from_fmt: str | None, to_fmt: str | None, output, tee, session_id: str | None, model: str | None):
+    """Stream a session between JSONL, JSON-LD and Markdown, one record at a time"""
+    from pathlib import Path
+
+    from .session.convert import ConvertError, convert as run_convert
+
+    def guess(stream, explicit: str | None, default: str | None) -> str:
+        if explicit:
+            return explicit
+        suffix = Path(getattr(stream, "name", "")).suffix.lstrip(".")
+        if suffix in ("jsonl", "jsonld", "json", "md", "markdown"):
+            return suffix
+        if default is None:
+            raise click.UsageError("cannot tell the input format; pass --from")
+        return default
+
+    try:
+        source = guess(input_file, from_fmt, None)
+        if session_id is None and source in ("jsonl", "json") and input_file.name not in ("-", "<stdin>"):
+            session_id = Path(input_file.name).stem  # journals are named after their session
+        run_convert(input_file, output, source, guess(output, to_fmt, "jsonl"), session_id=session_id, model=model, tee=tee)
+    except ConvertError as exc:
+        raise click.ClickException(str(exc)) from exc
 
 
 # ---------------------------------------------------------------------------
@@ -50,3 +624,16 @@ ecrivez.add_command(init)
 ecrivez.add_command(config)
 ecrivez.add_command(chat)
 ecrivez.add_command(repl)
+ecrivez.add_command(sessions)
+ecrivez.add_command(replay)
+ecrivez.add_command(serve)
+ecrivez.add_command(workflow)
+ecrivez.add_command(pipeline)
+ecrivez.add_command(mcp)
+ecrivez.add_command(prompts)
+ecrivez.add_command(graph)
+ecrivez.add_command(patch)
+ecrivez.add_command(best_of)
+ecrivez.add_command(batch)
+ecrivez.add_command(web)
+ecrivez.add_command(convert)
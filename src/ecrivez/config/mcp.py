@@ -0,0 +1,354 @@
+"""Model Context Protocol client: pooled stdio servers and cached tool schemas.
+
+Servers are configured by name (``mcp_servers`` in ``.ecrivez/config.yaml``)::
+
+    mcp_servers:
+      files: {command: [npx, -y, "@modelcontextprotocol/server-filesystem", "."]}
+
+:func:`get_mcp_pool` returns the process-wide :class:`MCPPool`.  A server
+process is launched the first time one of its tools is called and then kept
+alive for later turns and sessions (including every session of ``ecrivez
+serve``); a dead server is restarted on the next call.  Each connection
+multiplexes concurrent JSON-RPC requests by id, so several threads can call
+tools of the same server at once without extra processes.
+
+``tools/list`` results are cached in ``.ecrivez/mcp/tools.json`` keyed by the
+server's command line and the version it reports on ``initialize``.  Listing
+tools at startup therefore reads the cache without spawning anything; when a
+server is started later and reports another version (or announces
+``notifications/tools/list_changed``) its schemas are fetched again.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+__all__ = [
+    "DefaultMCP",
+    "MCPConnection",
+    "MCPError",
+    "MCPPool",
+    "MCPServerConfig",
+    "format_result",
+    "get_mcp_pool",
+]
+
+PROTOCOL_VERSION = "2024-11-05"
+
+
+class MCPError(RuntimeError):
+    """JSON-RPC error returned by a server, a dead/unresponsive server, or a
+    server that cannot be configured or started."""
+
+
+class MCPServerConfig(BaseModel):
+    command: List[str] = Field(..., description="Server command line (stdio transport)")
+    env: Dict[str, str] = Field(default_factory=dict, description="Extra environment variables")
+    cwd: Optional[str] = Field(None, description="Working directory")
+
+    def key(self) -> str:
+        """Stable hash of the launch configuration (part of the schema cache key)."""
+
+        encoded = json.dumps(self.model_dump(), sort_keys=True)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class DefaultMCP(BaseModel):
+    servers: Dict[str, MCPServerConfig] = Field(default_factory=dict, description="MCP servers by name")
+    cache_dir: Path = Field(Path(".ecrivez") / "mcp", description="Tool schema cache directory")
+    timeout: float = Field(60.0, description="Seconds to wait for a tool call")
+
+
+# ---------------------------------------------------------------------------
+# One server connection
+# ---------------------------------------------------------------------------
+
+
+class MCPConnection:
+    """A running stdio MCP server; requests from any thread, matched by id."""
+
+    def __init__(self, name: str, config: MCPServerConfig, timeout: float = 60.0) -> None:
+        self.name = name
+        self.config = config
+        self.timeout = timeout
+        self.server_info: dict[str, Any] = {}
+        self.tools_changed = False
+        self._ids = itertools.count(1)
+        self._pending: dict[int, Future[Any]] = {}
+        self._write_lock = threading.Lock()
+        try:
+            self._proc = subprocess.Popen(  # noqa: S603 – configured by the user
+                config.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=config.cwd,
+                env={**os.environ, **config.env},
+            )
+        except OSError as exc:  # missing command, bad cwd, not executable…
+            raise MCPError(f"{name}: cannot start {config.command!r}: {exc}") from exc
+        self._reader = threading.Thread(target=self._read_loop, name=f"mcp-{name}", daemon=True)
+        self._reader.start()
+        try:
+            result = self.request(
+                "initialize",
+                {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {},
+                    "clientInfo": {"name": "ecrivez", "version": "0.1.0"},
+                },
+                timeout=timeout,
+            )
+        except BaseException:
+            self.close()
+            raise
+        self.server_info = result.get("serverInfo", {})
+        self.notify("notifications/initialized")
+
+    @property
+    def version(self) -> str:
+        return str(self.server_info.get("version", ""))
+
+    @property
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def _send(self, message: dict[str, Any]) -> None:
+        data = json.dumps({"jsonrpc": "2.0", **message}, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._write_lock:
+            assert self._proc.stdin is not None
+            try:
+                self._proc.stdin.write(data)
+                self._proc.stdin.flush()
+            except (BrokenPipeError, ValueError) as exc:
+                raise MCPError(f"MCP server {self.name!r} is not running") from exc
+
+    def _read_loop(self) -> None:
+        assert self._proc.stdout is not None
+        for line in self._proc.stdout:
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # servers sometimes log to stdout
+            if "method" in message:
+                self._on_server_message(message)
+                continue
+            future = self._pending.pop(message.get("id"), None)
+            if future is None:
+                continue
+            if "error" in message:
+                error = message["error"]
+                future.set_exception(MCPError(f"{self.name}: {error.get('message', error)}"))
+            else:
+                future.set_result(message.get("result", {}))
+        exc = MCPError(f"MCP server {self.name!r} exited")
+        for future in list(self._pending.values()):
+            future.set_exception(exc)
+        self._pending.clear()
+
+    def _on_server_message(self, message: dict[str, Any]) -> None:
+        method = message["method"]
+        if method == "notifications/tools/list_changed":
+            self.tools_changed = True
+        if "id" not in message:
+            return
+        if method == "ping":
+            self._send({"id": message["id"], "result": {}})
+        else:
+            self._send({"id": message["id"], "error": {"code": -32601, "message": f"Unsupported: {method}"}})
+
+    def request(self, method: str, params: dict[str, Any] | None = None, timeout: float | None = None) -> Any:
+        """Send a request and block until its response (other requests may interleave)."""
+
+        request_id = next(self._ids)
+        future: Future[Any] = Future()
+        self._pending[request_id] = future
+        message: dict[str, Any] = {"id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            self._send(message)
+            return future.result(timeout=timeout or self.timeout)
+        except TimeoutError as exc:
+            raise MCPError(f"{self.name}: {method} timed out") from exc
+        finally:
+            self._pending.pop(request_id, None)
+
+    def notify(self, method: str, params: dict[str, Any] | None = None) -> None:
+        self._send({"method": method, **({"params": params} if params is not None else {})})
+
+    def list_tools(self) -> List[dict[str, Any]]:
+        tools: List[dict[str, Any]] = []
+        cursor = None
+        while True:
+            result = self.request("tools/list", {"cursor": cursor} if cursor else {})
+            tools.extend(result.get("tools", []))
+            cursor = result.get("nextCursor")
+            if not cursor:
+                break
+        self.tools_changed = False
+        return tools
+
+    def call_tool(self, tool: str, arguments: dict[str, Any] | None = None, timeout: float | None = None) -> Any:
+        return self.request("tools/call", {"name": tool, "arguments": arguments or {}}, timeout=timeout)
+
+    def close(self) -> None:
+        if self._proc.stdin:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+        try:
+            self._proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+
+
+# ---------------------------------------------------------------------------
+# Pool and schema cache
+# ---------------------------------------------------------------------------
+
+
+class MCPPool:
+    """Named servers started on demand and reused; tool schemas cached on disk."""
+
+    def __init__(self, config: DefaultMCP | None = None) -> None:
+        self.config = config or DefaultMCP()
+        self.cache_path = Path(self.config.cache_dir) / "tools.json"
+        self._connections: dict[str, MCPConnection] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+        self.spawned = 0
+
+    @property
+    def servers(self) -> Dict[str, MCPServerConfig]:
+        return self.config.servers
+
+    def configure(self, servers: Dict[str, MCPServerConfig | dict[str, Any]]) -> None:
+        """Add or update servers; changed ones are restarted on next use."""
+
+        for name, server in servers.items():
+            try:
+                server = server if isinstance(server, MCPServerConfig) else MCPServerConfig.model_validate(server)
+            except ValidationError as exc:
+                raise MCPError(f"invalid configuration of MCP server {name!r}: {exc}") from exc
+            old = self.config.servers.get(name)
+            self.config.servers[name] = server
+            if old is not None and old != server:
+                with self._lock:
+                    conn = self._connections.pop(name, None)
+                if conn is not None:
+                    conn.close()
+
+    # -- cache -------------------------------------------------------------
+
+    def _load_cache(self) -> dict[str, Any]:
+        try:
+            return json.loads(self.cache_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _store_tools(self, name: str, version: str, tools: List[dict[str, Any]]) -> None:
+        with self._lock:
+            self._cache[name] = {"key": self.servers[name].key(), "version": version, "tools": tools}
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._cache, ensure_ascii=False))
+            os.replace(tmp, self.cache_path)
+
+    def _cached(self, name: str, version: str | None = None) -> List[dict[str, Any]] | None:
+        entry = self._cache.get(name)
+        if not entry or entry.get("key") != self.servers[name].key():
+            return None
+        if version is not None and entry.get("version") != version:
+            return None
+        return entry["tools"]
+
+    # -- connections -------------------------------------------------------
+
+    def connection(self, name: str) -> MCPConnection:
+        if name not in self.servers:
+            raise MCPError(f"Unknown MCP server: {name!r}")
+        with self._lock:
+            server_lock = self._locks.setdefault(name, threading.Lock())
+        with server_lock:  # one start per server even under concurrent calls
+            conn = self._connections.get(name)
+            if conn is not None and conn.alive:
+                return conn
+            conn = MCPConnection(name, self.servers[name], timeout=self.config.timeout)
+            self.spawned += 1
+            if self._cached(name, conn.version) is None:
+                self._store_tools(name, conn.version, conn.list_tools())
+            with self._lock:
+                self._connections[name] = conn
+            return conn
+
+    def tools(self, name: str) -> List[dict[str, Any]]:
+        """Tool schemas of server *name*; served from cache when possible."""
+
+        conn = self._connections.get(name)
+        if conn is not None and conn.alive and conn.tools_changed:
+            self._store_tools(name, conn.version, conn.list_tools())
+        cached = self._cached(name)
+        if cached is not None:
+            return cached
+        self.connection(name)
+        return self._cached(name) or []
+
+    def all_tools(self) -> dict[str, List[dict[str, Any]]]:
+        return {name: self.tools(name) for name in self.servers}
+
+    def call(
+        self, server: str, tool: str, arguments: dict[str, Any] | None = None, timeout: float | None = None
+    ) -> Any:
+        return self.connection(server).call_tool(tool, arguments, timeout=timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for conn in connections:
+            conn.close()
+
+
+def format_result(result: dict[str, Any]) -> str:
+    """Render a ``tools/call`` result as plain text for the conversation."""
+
+    parts = []
+    for item in result.get("content", []):
+        if item.get("type") == "text":
+            parts.append(item.get("text", ""))
+        elif item.get("type") == "resource":
+            resource = item.get("resource", {})
+            parts.append(resource.get("text") or f"[resource {resource.get('uri', '')}]")
+        else:
+            parts.append(f"[{item.get('type', 'content')}]")
+    text = "\n".join(parts)
+    return f"Error: {text}" if result.get("isError") else text
+
+
+_POOL: MCPPool | None = None
+
+
+def get_mcp_pool(servers: Dict[str, Any] | None = None) -> MCPPool:
+    """Process-wide :class:`MCPPool`, updated with *servers* when given."""
+
+    global _POOL
+    if _POOL is None:
+        _POOL = MCPPool()
+        atexit.register(_POOL.close)
+    if servers:
+        _POOL.configure(servers)
+    return _POOL
@@ -0,0 +1,280 @@
+"""Prompt template library with a persistent index and cached renders.
+
+Prompt files are Markdown documents found in the configured directories
+(glob patterns such as ``~/.config/ecrivez/prompts/**``).  A file
+``prompt__review.md`` (or plain ``review.md``) defines the prompt id
+``review``; an optional YAML front matter block carries metadata::
+
+    ---
+    description: Code review persona
+    model: gpt-4o
+    ---
+    You are reviewing ${language} code.  Be ${tone}.
+
+Placeholders use :class:`string.Template` syntax so code samples with braces
+need no escaping; unknown placeholders are left untouched.
+
+:class:`PromptRegistry` scans the directories once and stores the resulting
+index – ids, paths, mtimes, metadata, template bodies and the mtime of every
+scanned directory – in ``.ecrivez/cache/prompts.json`` (the ``.temp-prompt``
+cache entry of the config design).  Later processes load that index and only
+re-scan directories whose mtime changed (or configured directories that
+did not exist yet), so ``get(id)`` at startup is a dictionary lookup plus
+one ``stat`` of the prompt file; an unknown id triggers one re-scan before
+it is reported.  Templates are
+compiled once per file version and rendered prompts are cached together
+with their token counts.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from string import Template
+from typing import Any, Dict, List, Optional, TypedDict
+
+import yaml
+from pydantic import BaseModel, Field
+
+from ecrivez.tokens import count_tokens
+
+__all__ = ["DefaultPrompts", "Prompt", "PromptRegistry", "Rendered", "get_prompt_registry"]
+
+_FRONT_MATTER = re.compile(r"\A---\s*\n(.*?)\n---\s*\n", re.DOTALL)
+_ID_PREFIX = "prompt__"
+
+
+class DefaultPrompts(BaseModel):
+    dirs: List[str] = Field(
+        default_factory=lambda: [".ecrivez/prompts/**", "~/.config/ecrivez/prompts/**"],
+        description="Glob patterns of directories holding prompt files",
+    )
+    pattern: str = Field("*.md", description="Prompt file name pattern inside those directories")
+    cache_file: Path = Field(Path(".ecrivez") / "cache" / "prompts.json", description="Index cache")
+    model: str = Field("gpt-4o", description="Model used for token counts")
+
+
+class Rendered(TypedDict):
+    id: str
+    text: str
+    tokens: int
+
+
+class Prompt:
+    """One prompt file, compiled once per mtime."""
+
+    __slots__ = ("id", "path", "mtime", "meta", "body", "_template", "_names")
+
+    def __init__(self, prompt_id: str, path: str, mtime: float, meta: dict[str, Any], body: str) -> None:
+        self.id = prompt_id
+        self.path = path
+        self.mtime = mtime
+        self.meta = meta
+        self.body = body
+        self._template = Template(body)
+        self._names = frozenset(
+            m.group("named") or m.group("braced")
+            for m in Template.pattern.finditer(body)
+            if m.group("named") or m.group("braced")
+        )
+
+    @classmethod
+    def load(cls, prompt_id: str, path: str) -> "Prompt":
+        mtime = os.stat(path).st_mtime
+        text = Path(path).read_text(encoding="utf-8")
+        meta: dict[str, Any] = {}
+        match = _FRONT_MATTER.match(text)
+        if match:
+            meta = yaml.safe_load(match.group(1)) or {}
+            text = text[match.end() :]
+        return cls(prompt_id, path, mtime, meta, text)
+
+    @property
+    def variables(self) -> frozenset[str]:
+        return self._names
+
+    def render(self, variables: dict[str, Any]) -> str:
+        return self._template.safe_substitute(variables)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"path": self.path, "mtime": self.mtime, "meta": self.meta, "body": self.body}
+
+
+def _prompt_id(path: str) -> str:
+    stem = Path(path).stem
+    return stem[len(_ID_PREFIX) :] if stem.startswith(_ID_PREFIX) else stem
+
+
+class PromptRegistry:
+    """Index of prompt files with compiled templates and a render cache."""
+
+    def __init__(self, config: DefaultPrompts | None = None, max_rendered: int = 256) -> None:
+        self.config = config or DefaultPrompts()
+        self.cache_path = Path(self.config.cache_file)
+        self.max_rendered = max_rendered
+        self.prompts: Dict[str, Prompt] = {}
+        self._dirs: Dict[str, float] = {}
+        self._rendered: OrderedDict[str, Rendered] = OrderedDict()
+        self.scans = 0
+        if not self._load_index():
+            self.refresh()
+
+    # -- index -------------------------------------------------------------
+
+    def _config_key(self) -> str:
+        encoded = json.dumps([self.config.dirs, self.config.pattern, self.config.model])
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+    def _directories(self) -> List[str]:
+        found: List[str] = []
+        for pattern in self.config.dirs:
+            expanded = os.path.expanduser(pattern)
+            found.extend(p for p in glob.glob(expanded, recursive=True) if os.path.isdir(p))
+            if expanded.endswith("**"):  # glob("x/**") omits x itself when empty
+                root = expanded.rstrip("*").rstrip(os.sep)
+                if os.path.isdir(root):
+                    found.append(root)
+        return sorted(set(os.path.abspath(p) for p in found))
+
+    def _roots(self) -> List[str]:
+        """Fixed leading directory of every configured pattern."""
+
+        roots = []
+        for pattern in self.config.dirs:
+            parts = Path(os.path.expanduser(pattern)).parts
+            fixed = parts[: next((i for i, part in enumerate(parts) if glob.has_magic(part)), len(parts))]
+            roots.append(os.path.abspath(os.path.join(*fixed)) if fixed else os.path.abspath("."))
+        return roots
+
+    def _scan_dir(self, directory: str) -> None:
+        self.scans += 1
+        for prompt in [p for p in self.prompts.values() if os.path.dirname(p.path) == directory]:
+            del self.prompts[prompt.id]
+        for path in sorted(glob.glob(os.path.join(glob.escape(directory), self.config.pattern))):
+            if os.path.isfile(path):
+                prompt_id = _prompt_id(path)
+                if prompt_id not in self.prompts:  # first directory wins
+                    self.prompts[prompt_id] = Prompt.load(prompt_id, path)
+        try:
+            self._dirs[directory] = os.stat(directory).st_mtime
+        except OSError:
+            self._dirs.pop(directory, None)
+
+    def refresh(self) -> None:
+        """Re-glob the configured patterns and re-scan changed directories."""
+
+        directories = self._directories()
+        for gone in set(self._dirs) - set(directories):
+            self._dirs.pop(gone)
+            self.prompts = {k: p for k, p in self.prompts.items() if os.path.dirname(p.path) != gone}
+        for directory in directories:
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+            if self._dirs.get(directory) != mtime:
+                self._scan_dir(directory)
+        self._save_index()
+
+    def _load_index(self) -> bool:
+        try:
+            data = json.loads(self.cache_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return False
+        if data.get("key") != self._config_key():
+            return False
+        self.prompts = {
+            pid: Prompt(pid, entry["path"], entry["mtime"], entry["meta"], entry["body"])
+            for pid, entry in data.get("prompts", {}).items()
+        }
+        self._dirs = data.get("dirs", {})
+        self._rendered = OrderedDict(data.get("rendered", {}))
+        for directory, mtime in self._dirs.items():
+            try:
+                changed = os.stat(directory).st_mtime != mtime
+            except OSError:
+                changed = True
+            if changed:  # files or sub-directories were added, removed or renamed
+                self.refresh()
+                return True
+        for root in self._roots():
+            # a configured directory created after the index was written
+            if os.path.isdir(root) and not any(d == root or d.startswith(root + os.sep) for d in self._dirs):
+                self.refresh()
+                break
+        return True
+
+    def _save_index(self) -> None:
+        data = {
+            "key": self._config_key(),
+            "dirs": self._dirs,
+            "prompts": {pid: p.as_dict() for pid, p in self.prompts.items()},
+            "rendered": self._rendered,
+        }
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False))
+        os.replace(tmp, self.cache_path)
+
+    # -- lookup and rendering ----------------------------------------------
+
+    def ids(self) -> List[str]:
+        return sorted(self.prompts)
+
+    def get(self, prompt_id: str) -> Prompt:
+        """Return prompt *prompt_id*, reloading it if its file changed."""
+
+        prompt = self.prompts.get(prompt_id)
+        if prompt is None:
+            self.refresh()  # the file may be newer than the index
+            prompt = self.prompts.get(prompt_id)
+        if prompt is None:
+            raise KeyError(f"Unknown prompt: {prompt_id!r}")
+        try:
+            mtime = os.stat(prompt.path).st_mtime
+        except OSError:
+            del self.prompts[prompt_id]
+            self._save_index()
+            raise KeyError(f"Prompt file vanished: {prompt.path}") from None
+        if mtime != prompt.mtime:
+            prompt = self.prompts[prompt_id] = Prompt.load(prompt_id, prompt.path)
+            self._save_index()
+        return prompt
+
+    def render(self, prompt_id: str, variables: Optional[dict[str, Any]] = None) -> Rendered:
+        """Render *prompt_id* with *variables*; cached per file version and variables."""
+
+        prompt = self.get(prompt_id)
+        used = {k: str(v) for k, v in (variables or {}).items() if k in prompt.variables}
+        key = hashlib.sha256(
+            json.dumps([prompt_id, prompt.mtime, sorted(used.items())]).encode("utf-8")
+        ).hexdigest()
+        cached = self._rendered.get(key)
+        if cached is not None:
+            self._rendered.move_to_end(key)
+            return cached
+        text = prompt.render(used)
+        rendered = Rendered(id=prompt_id, text=text, tokens=count_tokens(text, self.config.model))
+        self._rendered[key] = rendered
+        while len(self._rendered) > self.max_rendered:
+            self._rendered.popitem(last=False)
+        self._save_index()
+        return rendered
+
+
+_REGISTRIES: dict[str, PromptRegistry] = {}
+
+
+def get_prompt_registry(config: DefaultPrompts | None = None) -> PromptRegistry:
+    """Process-wide registry per configuration."""
+
+    config = config or DefaultPrompts()
+    key = config.model_dump_json()
+    if key not in _REGISTRIES:
+        _REGISTRIES[key] = PromptRegistry(config)
+    return _REGISTRIES[key]
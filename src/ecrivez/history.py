@@ -0,0 +1,447 @@
+"""Conversation history with content-addressed storage of large tool outputs.
+
+Tool results (``!cmd`` or JSON ``shell`` invocations) are often several KB and
+nearly identical from one run to the next – think of ``pytest`` being re-run
+after every edit.  :class:`History` keeps each distinct large output exactly
+once, keyed by its SHA-256 digest, and stores only a compact rendering in the
+message that is sent to the provider:
+
+* the first run of a command gets a head/tail excerpt,
+* an identical re-run collapses to a one-line reference,
+* a changed re-run is rendered as a unified diff against the previous output
+  of the same command (when that diff is smaller than the excerpt).
+
+The message keeps the digest in its ``ref`` field so the full text can be
+recovered with :pymeth:`History.expand`, e.g. when persisting the session.
+
+Very long sessions are stored column-wise rather than as a list of dicts:
+roles are small ids into an interned table, contents live in one UTF-8
+buffer addressed by an ``array`` of end offsets, and token counts are cached
+per message.  Indexing and iteration still hand out ``Message`` dicts
+(built on the fly), so a :class:`History` reads like the ``list`` it used to
+be.  :pymeth:`History.request` returns a :class:`RequestView` – the
+:func:`~ecrivez.prefix.build_request` layout as a lazy sequence – so
+building a request no longer copies the conversation, and
+:class:`~ecrivez.prefix.PromptMeter` only counts the messages added since
+the previous one.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence, Sequence
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, overload
+
+from ecrivez.tokens import count_tokens
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ecrivez.chat import Message
+
+__all__ = ["History", "RequestView"]
+
+_ROLES: List[str] = ["system", "user", "assistant", "tool"]
+_ROLE_IDS = {role: i for i, role in enumerate(_ROLES)}
+_ROLES_LOCK = threading.Lock()
+_UNCOUNTED = -1
+
+
+def _role_id(role: str) -> int:
+    """Id of *role* in the process-wide interned role table."""
+
+    found = _ROLE_IDS.get(role)
+    if found is None:
+        with _ROLES_LOCK:
+            found = _ROLE_IDS.get(role)
+            if found is None:
+                if len(_ROLES) > 255:
+                    raise ValueError(f"too many distinct message roles (at {role!r})")
+                found = _ROLE_IDS[role] = len(_ROLES)
+                _ROLES.append(sys.intern(role))
+    return found
+
+
+def _excerpt(text: str, budget: int) -> str:
+    """Keep the first and last lines of *text* within roughly *budget* chars."""
+
+    if len(text) <= budget:
+        return text
+    lines = text.splitlines()
+    head: list[str] = []
+    tail: list[str] = []
+    used = 0
+    half = budget // 2
+    for line in lines:
+        if used + len(line) + 1 > half:
+            break
+        head.append(line)
+        used += len(line) + 1
+    used = 0
+    for line in reversed(lines[len(head) :]):
+        if used + len(line) + 1 > half:
+            break
+        tail.append(line)
+        used += len(line) + 1
+    tail.reverse()
+    if not head and not tail:  # one enormous line
+        return f"{text[:half]}\n… {len(text) - 2 * half} chars omitted …\n{text[-half:]}"
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join([*head, f"… {omitted} lines omitted …", *tail])
+
+
+class History(MutableSequence):
+    """A compact ``list[Message]`` that deduplicates large tool outputs by content hash.
+
+    *threshold* is the size (in characters) from which an output is stored by
+    reference; *budget* bounds the rendering sent to the provider, and
+    *max_bytes* caps the memory used by stored outputs (least recently used
+    outputs are dropped first – only the output just stored is always kept).
+    Token counts are cached for *model*.  Messages are stored by value:
+    changing a dict obtained from the history does not change the history.
+    """
+
+    __slots__ = (
+        "threshold",
+        "budget",
+        "max_bytes",
+        "model",
+        "_roles",
+        "_ends",
+        "_text",
+        "_tokens",
+        "_refs",
+        "_system",
+        "_generation",
+        "_splices",
+        "_outputs",
+        "_latest",
+        "_size",
+    )
+
+    def __init__(
+        self,
+        messages: Iterable[Message] = (),
+        threshold: int = 2048,
+        budget: int = 2048,
+        max_bytes: int = 32 * 1024 * 1024,
+        model: str = "gpt-4o",
+    ) -> None:
+        self.threshold = threshold
+        self.budget = budget
+        self.max_bytes = max_bytes
+        self.model = model
+        self._roles = array("B")
+        self._ends = array("Q")  # end offset of each message in ``_text``
+        self._text = bytearray()
+        self._tokens = array("l")  # ``_UNCOUNTED`` until first asked for
+        self._refs: dict[int, str] = {}  # index -> digest, for the few messages that have one
+        self._system = 0  # leading system messages
+        self._generation = 0  # bumped by every change other than an append
+        self._splices: List[tuple[int, int]] = []  # (generation, first index changed)
+        self._outputs: OrderedDict[str, str] = OrderedDict()
+        self._latest: dict[str, str] = {}  # command -> digest of its last output
+        self._size = 0
+        self.extend(messages)
+
+    # -- sequence protocol ---------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._roles)
+
+    def _message(self, index: int) -> Message:
+        message: Message = {"role": self.role(index), "content": self.content(index)}
+        ref = self._refs.get(index)
+        if ref is not None:
+            message["ref"] = ref
+        return message
+
+    @overload
+    def __getitem__(self, index: int) -> Message: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Message]: ...
+
+    def __getitem__(self, index: int | slice) -> Message | List[Message]:
+        if isinstance(index, slice):
+            return [self._message(i) for i in range(*index.indices(len(self)))]
+        return self._message(self._index(index))
+
+    def __iter__(self) -> Iterator[Message]:
+        for i in range(len(self)):
+            yield self._message(i)
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("History does not support extended slice assignment")
+            self._splice(start, max(start, stop), list(value))
+        else:
+            i = self._index(index)
+            self._splice(i, i + 1, [value])
+
+    def __delitem__(self, index: int | slice) -> None:
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            if indices.step != 1:
+                keep = [m for i, m in enumerate(self) if i not in indices]
+                self._splice(0, len(self), keep)
+            elif indices:
+                self._splice(indices.start, indices.stop, [])
+        else:
+            i = self._index(index)
+            self._splice(i, i + 1, [])
+
+    def insert(self, index: int, value: Message) -> None:
+        index = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        self._splice(index, index, [value])
+
+    def append(self, value: Message) -> None:
+        role = _role_id(value["role"])
+        if role == 0 and self._system == len(self):
+            self._system += 1
+        if value.get("ref"):
+            self._refs[len(self)] = value["ref"]  # type: ignore[typeddict-item]
+        self._text += value["content"].encode("utf-8", "surrogatepass")
+        self._roles.append(role)
+        self._ends.append(len(self._text))
+        self._tokens.append(_UNCOUNTED)
+
+    def extend(self, values: Iterable[Message]) -> None:
+        for value in values:
+            self.append(value)
+
+    def clear(self) -> None:
+        self._splice(0, len(self), [])
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (History, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"History({list(self)!r})"
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return index
+
+    def _splice(self, start: int, stop: int, values: List[Message]) -> None:
+        """Replace messages ``[start, stop)`` with *values* (rewrites the tail)."""
+
+        tail = self[stop:]
+        offset = self._ends[start - 1] if start else 0
+        del self._text[offset:]
+        del self._roles[start:], self._ends[start:], self._tokens[start:]
+        self._refs = {i: ref for i, ref in self._refs.items() if i < start}
+        self._system = min(self._system, start)
+        self._generation += 1
+        self._splices.append((self._generation, start))
+        self.extend(values)
+        self.extend(tail)
+
+    # -- compact accessors -----------------------------------------------------
+
+    def role(self, index: int) -> str:
+        return _ROLES[self._roles[index]]
+
+    def content(self, index: int) -> str:
+        end = self._ends[index]
+        start = self._ends[index - 1] if index else 0
+        return self._text[start:end].decode("utf-8", "surrogatepass")
+
+    def tokens(self, index: int, model: Optional[str] = None) -> int:
+        """Token count of message *index*; cached when *model* is the history's."""
+
+        if model is not None and model != self.model:
+            return count_tokens(self.content(index), model)
+        cached = self._tokens[index]
+        if cached == _UNCOUNTED:
+            cached = self._tokens[index] = count_tokens(self.content(index), self.model)
+        return cached
+
+    def unchanged_since(self, generation: int) -> int:
+        """Number of leading messages not rewritten since *generation* (appends aside)."""
+
+        return min((start for g, start in self._splices if g > generation), default=len(self))
+
+    @property
+    def text_bytes(self) -> int:
+        """Size of the message text buffer (UTF-8)."""
+
+        return len(self._text)
+
+    def request(self, context: Optional[str] = None) -> "RequestView":
+        """The messages to send, in :func:`~ecrivez.prefix.build_request` layout, without copying."""
+
+        return RequestView(self, context)
+
+    # -- tool outputs ------------------------------------------------------------
+
+    def add_tool_output(self, command: str, output: str) -> Message:
+        """Append the assistant message for *command*'s *output* and return it."""
+
+        if len(output) < self.threshold:
+            message: Message = {"role": "assistant", "content": output}
+            self.append(message)
+            return message
+
+        digest = hashlib.sha256(output.encode("utf-8")).hexdigest()
+        previous = self._latest.get(command)
+        content = self._render(command, output, digest, previous)
+        self._remember(command, digest, output)
+        message = {"role": "assistant", "content": content, "ref": digest}
+        self.append(message)
+        return message
+
+    def output(self, digest: str) -> str | None:
+        """Return the full stored output for *digest* (``None`` once evicted)."""
+
+        return self._outputs.get(digest)
+
+    def expand(self, message: Message) -> Message:
+        """Return *message* with its full tool output instead of the rendering."""
+
+        ref = message.get("ref")
+        full = self._outputs.get(ref) if ref else None
+        if full is None:
+            return message
+        return {"role": message["role"], "content": full}
+
+    @property
+    def stored_bytes(self) -> int:
+        return self._size
+
+    # ------------------------------------------------------------------
+
+    def _render(self, command: str, output: str, digest: str, previous: str | None) -> str:
+        n_lines = output.count("\n") + 1
+        header = f"[tool output sha256:{digest[:12]} · {len(output)} chars · {n_lines} lines]"
+        if previous == digest:
+            return f"{header} identical to the previous output of `{command}`"
+        old = self._outputs.get(previous) if previous else None
+        if old is not None:
+            diff = list(
+                difflib.unified_diff(old.splitlines(), output.splitlines(), lineterm="", n=1)
+            )[2:]  # drop the ---/+++ file headers
+            diff_text = "\n".join(diff)
+            if len(diff_text) <= self.budget:
+                return f"{header} changes since the previous output of `{command}` (sha256:{previous[:12]}):\n{diff_text}"
+        return f"{header}\n{_excerpt(output, self.budget)}"
+
+    def _remember(self, command: str, digest: str, output: str) -> None:
+        if digest in self._outputs:
+            self._outputs.move_to_end(digest)
+        else:
+            self._outputs[digest] = output
+            self._size += len(output)
+        self._latest[command] = digest
+
+        # Least recently stored first, the previous outputs of other commands
+        # included; only the output just stored is kept whatever its size.
+        evicted = set()
+        for old in list(self._outputs):
+            if self._size <= self.max_bytes or old == digest:
+                break
+            self._size -= len(self._outputs.pop(old))
+            evicted.add(old)
+        if evicted:  # their commands render in full next time
+            self._latest = {cmd: d for cmd, d in self._latest.items() if d not in evicted}
+
+
+class RequestView(Sequence):
+    """A provider request over a :class:`History`, frozen at its current length.
+
+    Items are ``{"role", "content"}`` dicts built on access: the leading
+    system messages, then *context* as a system message (if any), then the
+    remaining turns – the layout of :func:`~ecrivez.prefix.build_request`.
+    """
+
+    __slots__ = ("history", "context", "length", "system", "generation")
+
+    def __init__(self, history: History, context: Optional[str] = None) -> None:
+        self.history = history
+        self.context = context or None
+        self.length = len(history)
+        self.system = history._system
+        self.generation = history._generation
+
+    def __len__(self) -> int:
+        return self.length + (self.context is not None)
+
+    def _source(self, index: int) -> Optional[int]:
+        """Index into the history of item *index* (``None`` for the context)."""
+
+        if self.context is None or index < self.system:
+            return index
+        return None if index == self.system else index - 1
+
+    def _item(self, index: int) -> dict[str, str]:
+        source = self._source(index)
+        if source is None:
+            return {"role": "system", "content": self.context}  # type: ignore[dict-item]
+        return {"role": self.history.role(source), "content": self.history.content(source)}
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self._item(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("request index out of range")
+        return self._item(index)
+
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        for i in range(len(self)):
+            yield self._item(i)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (RequestView, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def tokens(self, index: int, model: Optional[str] = None) -> int:
+        """Token count of item *index* (cached by the history)."""
+
+        source = self._source(index)
+        if source is None:
+            return count_tokens(self.context or "", model or self.history.model)
+        return self.history.tokens(source, model)
+
+    def common_prefix(self, previous: "RequestView") -> int:
+        """Number of leading items shared with *previous*, a request over the same history."""
+
+        stable = self.history.unchanged_since(previous.generation)
+        shared = 0
+        for i in range(min(len(previous), len(self))):
+            old, new = previous._source(i), self._source(i)
+            if old is None or new is None:
+                if old is not new or previous.context != self.context:
+                    break
+            elif old != new or old >= stable:
+                break
+            shared += 1
+        return shared
+
+    def extends(self, previous: Any) -> bool:
+        """Whether *previous* is a prefix of this request (same history, only appends since)."""
+
+        return (
+            isinstance(previous, RequestView)
+            and previous.history is self.history
+            and previous.generation == self.generation
+            and previous.context == self.context
+            and previous.system == self.system
+            and previous.length <= self.length
+        )
@@ -33,15 +33,39 @@ def connect(project_name: str):  # noqa: D401 – small factory
 # ---------------------------------------------------------------------------
 
 
-def apply_diff(nvim, diff: str) -> None:  # noqa: ANN001 – nvim is dynamic
+def current_lines(nvim, mirror=None, timeout: float = 1.0) -> List[str]:  # noqa: ANN001
+    """Lines of the current buffer – from *mirror* when it has caught up.
+
+    Only the buffer handle and its ``changedtick`` are fetched; the mirrored
+    lines are used once the mirror has applied that tick (waiting up to
+    *timeout* seconds for in-flight events), otherwise the buffer is read
+    over RPC.
+    """
+
+    buffer = nvim.current.buffer  # type: ignore[attr-defined]
+    if mirror is not None:
+        number = int(getattr(buffer, "handle", getattr(buffer, "number", 0)))
+        mirrored = mirror.get(number)
+        if mirrored is not None and mirrored.loaded:
+            tick = nvim.api.buf_get_changedtick(buffer)
+            if mirrored.wait_for(tick, timeout):
+                tick_seen, lines = mirrored.snapshot()
+                if tick_seen == tick:  # not edited again meanwhile
+                    return lines
+    return list(buffer)
+
+
+def apply_diff(nvim, diff: str, mirror=None) -> None:  # noqa: ANN001 – nvim is dynamic
     """Apply a *simple* unified diff to the current buffer.
 
     Limitations: context lines are ignored; we only support top-level + / -
     prefixes and operate sequentially on the buffer.  Good enough for unit
-    tests and small demos.
+    tests and small demos.  With a :class:`~ecrivez.nvim_mirror.BufferMirror`
+    the buffer is read from the mirror instead of over RPC (see
+    :func:`current_lines`).
     """
 
-    buf: List[str] = list(nvim.current.buffer)  # type: ignore[attr-defined]
+    buf: List[str] = current_lines(nvim, mirror)
 
     for line in diff.splitlines():
         if not line:
@@ -0,0 +1,241 @@
+"""In-process mirror of Neovim buffers fed by ``nvim_buf_attach`` events.
+
+Reading ``list(nvim.current.buffer)`` ships the whole buffer over msgpack on
+every call.  :class:`BufferMirror` instead attaches to buffers once and
+applies the incremental ``nvim_buf_lines_event`` notifications to a local
+line store, tracking ``changedtick``:
+
+* readers (context building, diff validation, retrieval indexing) get the
+  current lines of any mirrored buffer without a single RPC;
+* every change also records a *dirty range*, and :pymeth:`MirroredBuffer.take_dirty`
+  returns the merged ranges touched since the last call, so indexers only
+  revisit changed regions – cost stays flat for very large files.
+
+The mirror needs a connection of its own (see :func:`start_mirror`): pynvim
+sessions are not thread-safe and the mirror runs the session's event loop
+on a background thread.  A ``BufEnter`` autocommand notifies the mirror so
+it attaches to each buffer the user opens and knows the current one.
+:func:`get_mirror` keeps one mirror per project; the REPL starts it with
+the session and ``/apply`` reads buffers through it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+__all__ = ["BufferMirror", "MirroredBuffer", "get_mirror", "start_mirror", "stop_mirrors"]
+
+_BUFENTER = "ecrivez_bufenter"
+
+
+def _handle(buf: Any) -> int:
+    """Buffer number of a pynvim ``Buffer`` (or an int in tests)."""
+
+    return int(getattr(buf, "handle", getattr(buf, "number", buf)))
+
+
+class MirroredBuffer:
+    """Local copy of one buffer, kept current by :class:`BufferMirror`."""
+
+    __slots__ = ("number", "name", "lines", "changedtick", "attached", "loaded", "_dirty", "_lock", "_changed")
+
+    def __init__(self, number: int, name: str = "") -> None:
+        self.number = number
+        self.name = name
+        self.lines: List[str] = []
+        self.changedtick = 0
+        self.attached = False
+        self.loaded = False  # set by the first full-buffer event; ``lines`` is empty until then
+        self._dirty: List[Tuple[int, int]] = []  # merged [start, end) line ranges
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    # -- updates (event-loop thread) ---------------------------------------
+
+    def apply(self, changedtick: Optional[int], first: int, last: int, data: List[str]) -> None:
+        """Replace lines ``[first, last)`` with *data* (``last == -1``: to the end)."""
+
+        with self._lock:
+            if last < 0:
+                if first == 0:
+                    self.loaded = True  # initial event: the whole buffer
+                last = len(self.lines)
+            self.lines[first:last] = data
+            self._mark(first, last, len(data))
+            if changedtick is not None:
+                self.changedtick = changedtick
+            self._changed.notify_all()
+
+    def tick(self, changedtick: int) -> None:
+        with self._lock:
+            self.changedtick = changedtick
+            self._changed.notify_all()
+
+    def _mark(self, first: int, last: int, count: int) -> None:
+        delta = count - (last - first)
+        ranges = []
+        for start, end in self._dirty:
+            if end < first:
+                ranges.append((start, end))
+            elif start > last:
+                ranges.append((start + delta, end + delta))
+            else:  # touches the edit: merge (old coordinates)
+                first, last = min(first, start), max(last, end)
+        ranges.append((first, last + delta))
+        self._dirty = sorted(ranges)
+
+    # -- reads (any thread, no RPC) ----------------------------------------
+
+    def snapshot(self) -> Tuple[int, List[str]]:
+        """``(changedtick, lines)`` at one consistent point in time."""
+
+        with self._lock:
+            return self.changedtick, list(self.lines)
+
+    def text(self) -> str:
+        return "\n".join(self.snapshot()[1])
+
+    def take_dirty(self) -> List[Tuple[int, int]]:
+        """Line ranges changed since the previous call (current coordinates)."""
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, []
+            return dirty
+
+    def wait_for(self, changedtick: int, timeout: float | None = None) -> bool:
+        """Block until the mirror has caught up with *changedtick*."""
+
+        with self._changed:
+            return self._changed.wait_for(lambda: self.changedtick >= changedtick, timeout)
+
+
+class BufferMirror:
+    """Mirror of the buffers of one Neovim instance, updated from change events."""
+
+    def __init__(self, nvim: Any) -> None:
+        self.nvim = nvim
+        self.buffers: Dict[int, MirroredBuffer] = {}
+        self.current: Optional[int] = None
+        self.events = 0
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[MirroredBuffer], None]] = []
+
+    # -- subscription ------------------------------------------------------
+
+    def attach(self, buf: Any) -> MirroredBuffer:
+        """Subscribe to *buf*; the first event carries its full content."""
+
+        number = _handle(buf)
+        mirrored = self.buffers.get(number)
+        if mirrored is None or not mirrored.attached:
+            mirrored = MirroredBuffer(number, getattr(buf, "name", "") or "")
+            self.buffers[number] = mirrored
+            mirrored.attached = bool(self.nvim.api.buf_attach(buf, True, {}))
+        return mirrored
+
+    def start(self) -> "BufferMirror":
+        """Attach to the current buffer, install the autocmd and run the event loop."""
+
+        current = self.nvim.current.buffer
+        self.attach(current)
+        self.current = _handle(current)
+        self.nvim.command(
+            f"augroup ecrivez_mirror | autocmd! | autocmd BufEnter * "
+            f"call rpcnotify({self.nvim.channel_id}, '{_BUFENTER}', bufnr()) | augroup END"
+        )
+        self._thread = threading.Thread(
+            target=self.nvim.run_loop, args=(None, self.on_notification), name="ecrivez-nvim-mirror", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.nvim.async_call(self.nvim.stop_loop)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def on_change(self, listener: Callable[[MirroredBuffer], None]) -> None:
+        """Call *listener* (on the event-loop thread) after each applied change."""
+
+        self._listeners.append(listener)
+
+    # -- events --------------------------------------------------------------
+
+    def on_notification(self, name: str, args: List[Any]) -> None:
+        self.events += 1
+        if name == "nvim_buf_lines_event":
+            buf, changedtick, first, last, data, _more = args
+            mirrored = self.buffers.get(_handle(buf))
+            if mirrored is None:
+                return
+            mirrored.apply(changedtick, first, last, list(data))
+            for listener in self._listeners:
+                listener(mirrored)
+        elif name == "nvim_buf_changedtick_event":
+            buf, changedtick = args
+            if (mirrored := self.buffers.get(_handle(buf))) is not None:
+                mirrored.tick(changedtick)
+        elif name == "nvim_buf_detach_event":
+            if (mirrored := self.buffers.get(_handle(args[0]))) is not None:
+                mirrored.attached = False  # re-attached on the next BufEnter
+        elif name == _BUFENTER:
+            number = int(args[0])
+            self.current = number
+            if number not in self.buffers or not self.buffers[number].attached:
+                self.attach(self.nvim.buffers[number])
+
+    # -- reads ---------------------------------------------------------------
+
+    def get(self, number: Optional[int] = None) -> Optional[MirroredBuffer]:
+        """The mirrored buffer *number* (default: the current one), if attached."""
+
+        number = self.current if number is None else number
+        return self.buffers.get(number) if number is not None else None
+
+    def lines(self, number: Optional[int] = None) -> Optional[List[str]]:
+        """Lines of the buffer, or ``None`` until its content has been received."""
+
+        mirrored = self.get(number)
+        if mirrored is None or not mirrored.loaded:
+            return None  # callers fall back to RPC rather than trust an empty copy
+        return mirrored.snapshot()[1]
+
+
+def start_mirror(project_name: str) -> BufferMirror:
+    """Open a dedicated connection to the project's Neovim and start mirroring."""
+
+    from ecrivez.nvim_api import connect
+
+    return BufferMirror(connect(project_name)).start()
+
+
+_MIRRORS: Dict[str, Optional[BufferMirror]] = {}
+_MIRRORS_LOCK = threading.Lock()
+
+
+def get_mirror(project_name: str) -> Optional[BufferMirror]:
+    """The running mirror of *project_name*'s Neovim, or None without an editor.
+
+    A failed attempt is remembered (``None``) so that a REPL without Neovim
+    does not retry on every ``/apply``; all mirrors are stopped at exit.
+    """
+
+    with _MIRRORS_LOCK:
+        if project_name not in _MIRRORS:
+            if not _MIRRORS:
+                atexit.register(stop_mirrors)
+            try:
+                _MIRRORS[project_name] = start_mirror(project_name)
+            except Exception:  # noqa: BLE001 – no socket, no pynvim: plain RPC reads
+                _MIRRORS[project_name] = None
+        return _MIRRORS[project_name]
+
+
+def stop_mirrors() -> None:
+    with _MIRRORS_LOCK:
+        for mirror in _MIRRORS.values():
+            if mirror is not None:
+                mirror.stop()
+        _MIRRORS.clear()
@@ -0,0 +1,488 @@
+"""Streaming pipeline language for chaining tools, converters and models.
+
+This is the executable core of the ``--pipeline`` aliases sketched in
+``config/config.py``.  Grammar::
+
+    pipeline := stage ("|" stage)*
+    stage    := "{" pipeline ("," pipeline)* "}"      # parallel branches
+              | NAME ARG*                              # see STAGES
+
+Example – triage a log while it is still being written::
+
+    journalctl -f | ecrivez pipeline 'grep -i error | { head 20 , llm -n 50 "Summarise these errors" }'
+
+Data flows as *chunks* (lines, without the trailing newline).  Every stage
+runs as its own asyncio task and stages are connected by bounded queues, so
+a slow stage applies backpressure upstream instead of buffering everything,
+and downstream stages start producing output as soon as the first chunks
+arrive.  Parallel branches each receive every chunk; their outputs are
+merged in arrival order.
+
+:pymeth:`Pipeline.stats` reports, per stage, chunks in/out, throughput, the
+time spent working and the time spent blocked on a full downstream queue
+(the backpressure signal).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import shlex
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List
+
+__all__ = ["STAGES", "Pipeline", "PipelineError", "parse", "read_lines", "register_stage"]
+
+Emit = Callable[[str], Awaitable[None]]
+StageFn = Callable[[AsyncIterator[str], Emit], Awaitable[None]]
+StageFactory = Callable[[List[str], "Pipeline"], StageFn]
+
+_EOF = object()
+
+
+class PipelineError(ValueError):
+    """Raised for syntax errors and unknown stages."""
+
+
+# ---------------------------------------------------------------------------
+# Syntax tree and parser
+# ---------------------------------------------------------------------------
+
+
+class _Stage:
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str, args: List[str]) -> None:
+        self.name = name
+        self.args = args
+
+
+class _Seq:
+    __slots__ = ("items",)
+
+    def __init__(self, items: List[Any]) -> None:
+        self.items = items
+
+
+class _Par:
+    __slots__ = ("branches",)
+
+    def __init__(self, branches: List[_Seq]) -> None:
+        self.branches = branches
+
+
+def _tokenize(text: str) -> List[str]:
+    lexer = shlex.shlex(text, posix=True, punctuation_chars="|{},")
+    lexer.whitespace_split = True
+    try:
+        return list(lexer)
+    except ValueError as exc:
+        raise PipelineError(str(exc)) from exc
+
+
+def parse(text: str) -> _Seq:
+    """Parse *text* into a syntax tree (raises :class:`PipelineError`)."""
+
+    tokens = _tokenize(text)
+    pos = 0
+
+    def seq(closers: set[str]) -> _Seq:
+        nonlocal pos
+        items = [stage()]
+        while pos < len(tokens) and tokens[pos] == "|":
+            pos += 1
+            items.append(stage())
+        if pos < len(tokens) and tokens[pos] not in closers:
+            raise PipelineError(f"Unexpected {tokens[pos]!r}")
+        return _Seq(items)
+
+    def stage() -> Any:
+        nonlocal pos
+        if pos >= len(tokens):
+            raise PipelineError("Missing stage")
+        if tokens[pos] == "{":
+            pos += 1
+            branches = [seq({",", "}"})]
+            while pos < len(tokens) and tokens[pos] == ",":
+                pos += 1
+                branches.append(seq({",", "}"}))
+            if pos >= len(tokens) or tokens[pos] != "}":
+                raise PipelineError("Unclosed '{'")
+            pos += 1
+            return _Par(branches)
+        if tokens[pos] in {"|", ",", "}"}:
+            raise PipelineError(f"Unexpected {tokens[pos]!r}")
+        name = tokens[pos]
+        pos += 1
+        args = []
+        while pos < len(tokens) and tokens[pos] not in {"|", ",", "}", "{"}:
+            args.append(tokens[pos])
+            pos += 1
+        if name not in STAGES:
+            raise PipelineError(f"Unknown stage {name!r}")
+        return _Stage(name, args)
+
+    tree = seq(set())
+    if pos != len(tokens):
+        raise PipelineError(f"Unexpected {tokens[pos]!r}")
+    return tree
+
+
+# ---------------------------------------------------------------------------
+# Built-in stages
+# ---------------------------------------------------------------------------
+
+
+STAGES: dict[str, StageFactory] = {}
+
+
+def register_stage(name: str) -> Callable[[StageFactory], StageFactory]:
+    """Decorator adding a stage factory ``factory(args, pipeline) -> stage fn``."""
+
+    def decorator(factory: StageFactory) -> StageFactory:
+        STAGES[name] = factory
+        return factory
+
+    return decorator
+
+
+@register_stage("cat")
+def _cat(args: List[str], pipeline: Pipeline) -> StageFn:
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        async for chunk in chunks:
+            await emit(chunk)
+
+    return run
+
+
+@register_stage("grep")
+def _grep(args: List[str], pipeline: Pipeline) -> StageFn:
+    flags = {a for a in args if a in {"-v", "-i"}}
+    patterns = [a for a in args if a not in flags]
+    if len(patterns) != 1:
+        raise PipelineError("usage: grep [-v] [-i] PATTERN")
+    regex = re.compile(patterns[0], re.IGNORECASE if "-i" in flags else 0)
+    invert = "-v" in flags
+
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        async for chunk in chunks:
+            if bool(regex.search(chunk)) != invert:
+                await emit(chunk)
+
+    return run
+
+
+def _count(args: List[str], usage: str) -> int:
+    try:
+        (value,) = args
+        return int(value)
+    except ValueError as exc:
+        raise PipelineError(f"usage: {usage}") from exc
+
+
+@register_stage("head")
+def _head(args: List[str], pipeline: Pipeline) -> StageFn:
+    n = _count(args, "head N")
+
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        if n <= 0:
+            return
+        seen = 0
+        async for chunk in chunks:
+            await emit(chunk)
+            seen += 1
+            if seen >= n:
+                return
+
+    return run
+
+
+@register_stage("tail")
+def _tail(args: List[str], pipeline: Pipeline) -> StageFn:
+    n = _count(args, "tail N")
+
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        window: deque[str] = deque(maxlen=n)
+        async for chunk in chunks:
+            window.append(chunk)
+        for chunk in window:
+            await emit(chunk)
+
+    return run
+
+
+@register_stage("upper")
+def _upper(args: List[str], pipeline: Pipeline) -> StageFn:
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        async for chunk in chunks:
+            await emit(chunk.upper())
+
+    return run
+
+
+@register_stage("json")
+def _json(args: List[str], pipeline: Pipeline) -> StageFn:
+    """Wrap each chunk as a JSON object ``{"text": chunk}`` (JSONL out)."""
+
+    key = args[0] if args else "text"
+
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        async for chunk in chunks:
+            await emit(json.dumps({key: chunk}, ensure_ascii=False))
+
+    return run
+
+
+@register_stage("sh")
+def _sh(args: List[str], pipeline: Pipeline) -> StageFn:
+    """Stream chunks through a shell command (stdin → stdout, line by line)."""
+
+    if not args:
+        raise PipelineError("usage: sh COMMAND")
+    command = " ".join(args)
+
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        proc = await asyncio.create_subprocess_shell(
+            command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+
+        async def feed() -> None:
+            try:
+                async for chunk in chunks:
+                    proc.stdin.write(chunk.encode("utf-8") + b"\n")
+                    await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                proc.stdin.close()
+
+        feeder = asyncio.create_task(feed())
+        async for line in proc.stdout:
+            await emit(line.decode("utf-8", "replace").rstrip("\n"))
+        await feeder
+        await proc.wait()
+
+    return run
+
+
+@register_stage("llm")
+def _llm(args: List[str], pipeline: Pipeline) -> StageFn:
+    """``llm [-n LINES] PROMPT`` – ask the provider about windows of input.
+
+    Without ``-n`` the whole input is sent once it ends; with ``-n`` every
+    window of LINES chunks is sent as soon as it is complete.
+    """
+
+    window = 0
+    if len(args) >= 2 and args[0] == "-n":
+        window = _count(args[1:2], "llm [-n LINES] PROMPT")
+        args = args[2:]
+    prompt = " ".join(args)
+    if pipeline.provider is None:
+        raise PipelineError("The llm stage needs a provider")
+    provider = pipeline.provider
+
+    async def ask(lines: List[str], emit: Emit) -> None:
+        content = f"{prompt}\n\n" + "\n".join(lines) if prompt else "\n".join(lines)
+        reply = await asyncio.to_thread(
+            provider.chat_completion, [{"role": "user", "content": content}]
+        )
+        for line in reply.splitlines():
+            await emit(line)
+
+    async def run(chunks: AsyncIterator[str], emit: Emit) -> None:
+        batch: List[str] = []
+        async for chunk in chunks:
+            batch.append(chunk)
+            if window and len(batch) >= window:
+                await ask(batch, emit)
+                batch = []
+        if batch:
+            await ask(batch, emit)
+
+    return run
+
+
+# ---------------------------------------------------------------------------
+# Runtime
+# ---------------------------------------------------------------------------
+
+
+class _Stats:
+    __slots__ = ("name", "chunks_in", "chunks_out", "busy", "blocked", "start", "end")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.chunks_in = 0
+        self.chunks_out = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.start = 0.0
+        self.end = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        elapsed = max(self.end - self.start, 1e-9)
+        return {
+            "stage": self.name,
+            "chunks_in": self.chunks_in,
+            "chunks_out": self.chunks_out,
+            "throughput": self.chunks_out / elapsed,
+            "busy": self.busy,
+            "blocked": self.blocked,
+        }
+
+
+class Pipeline:
+    """Compiled pipeline; call :pymeth:`run` (async) or :pymeth:`run_sync`."""
+
+    def __init__(self, text: str, provider: Any = None, queue_size: int = 64) -> None:
+        self.text = text
+        self.provider = provider
+        self.queue_size = queue_size
+        self.tree = parse(text)
+        self._stats: List[_Stats] = []
+        self._fns: dict[int, StageFn] = {}
+        self._compile(self.tree)  # fail fast on bad stage arguments
+
+    def _compile(self, node: Any) -> None:
+        if isinstance(node, _Seq):
+            for item in node.items:
+                self._compile(item)
+        elif isinstance(node, _Par):
+            for branch in node.branches:
+                self._compile(branch)
+        else:
+            self._fns[id(node)] = STAGES[node.name](node.args, self)
+
+    def stats(self) -> List[dict[str, Any]]:
+        return [s.as_dict() for s in self._stats]
+
+    # -- task graph --------------------------------------------------------
+
+    def _queue(self) -> asyncio.Queue[Any]:
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    def _build(self, node: Any, inq: asyncio.Queue[Any], outq: asyncio.Queue[Any], tasks: List[Awaitable[None]]) -> None:
+        if isinstance(node, _Seq):
+            current = inq
+            for i, item in enumerate(node.items):
+                nxt = outq if i == len(node.items) - 1 else self._queue()
+                self._build(item, current, nxt, tasks)
+                current = nxt
+        elif isinstance(node, _Par):
+            ins = [self._queue() for _ in node.branches]
+            merged = self._queue()
+            tasks.append(self._fan_out(inq, ins))
+            for branch, branch_in in zip(node.branches, ins):
+                self._build(branch, branch_in, merged, tasks)
+            tasks.append(self._merge(merged, outq, len(node.branches)))
+        else:
+            stats = _Stats(" ".join([node.name, *node.args]))
+            self._stats.append(stats)
+            tasks.append(self._run_stage(self._fns[id(node)], inq, outq, stats))
+
+    @staticmethod
+    async def _fan_out(inq: asyncio.Queue[Any], outs: List[asyncio.Queue[Any]]) -> None:
+        while True:
+            item = await inq.get()
+            for q in outs:
+                await q.put(item)
+            if item is _EOF:
+                return
+
+    @staticmethod
+    async def _merge(merged: asyncio.Queue[Any], outq: asyncio.Queue[Any], n: int) -> None:
+        while n:
+            item = await merged.get()
+            if item is _EOF:
+                n -= 1
+            else:
+                await outq.put(item)
+        await outq.put(_EOF)
+
+    @staticmethod
+    async def _run_stage(fn: StageFn, inq: asyncio.Queue[Any], outq: asyncio.Queue[Any], stats: _Stats) -> None:
+        finished = False
+
+        async def chunks() -> AsyncIterator[str]:
+            nonlocal finished
+            while True:
+                item = await inq.get()
+                if item is _EOF:
+                    finished = True
+                    return
+                stats.chunks_in += 1
+                yield item
+
+        async def emit(chunk: str) -> None:
+            t = time.perf_counter()
+            await outq.put(chunk)
+            stats.blocked += time.perf_counter() - t
+            stats.chunks_out += 1
+
+        stats.start = time.perf_counter()
+        try:
+            await fn(chunks(), emit)
+        finally:
+            stats.end = time.perf_counter()
+            stats.busy = stats.end - stats.start - stats.blocked
+        await outq.put(_EOF)
+        # A stage that stopped early (e.g. head) keeps draining its input so
+        # upstream stages are never left blocked on a full queue.
+        while not finished:
+            if await inq.get() is _EOF:
+                finished = True
+
+    async def run(self, source: AsyncIterator[str] | Iterable[str], sink: Callable[[str], Any]) -> None:
+        """Feed *source* chunks through the pipeline, calling *sink* per output chunk."""
+
+        self._stats = []
+        inq, outq = self._queue(), self._queue()
+        tasks: List[Awaitable[None]] = []
+        self._build(self.tree, inq, outq, tasks)
+
+        async def produce() -> None:
+            if hasattr(source, "__aiter__"):
+                async for chunk in source:  # type: ignore[union-attr]
+                    await inq.put(chunk)
+            else:
+                for chunk in source:  # type: ignore[union-attr]
+                    await inq.put(chunk)
+            await inq.put(_EOF)
+
+        async def consume() -> None:
+            while (item := await outq.get()) is not _EOF:
+                result = sink(item)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        await asyncio.gather(produce(), consume(), *tasks)
+
+    def run_sync(self, source: Iterable[str]) -> List[str]:
+        out: List[str] = []
+        asyncio.run(self.run(source, out.append))
+        return out
+
+
+async def read_lines(fh: Any) -> AsyncIterator[str]:
+    """Yield lines of the binary-capable file *fh* (e.g. ``sys.stdin``) without blocking the loop.
+
+    Pipes are read through the event loop; regular files and terminals fall
+    back to a worker thread reading batches of lines.
+    """
+
+    loop = asyncio.get_running_loop()
+    raw = getattr(fh, "buffer", fh)
+    reader = asyncio.StreamReader(limit=2**20)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), raw)
+    except (ValueError, OSError):
+        while batch := await asyncio.to_thread(raw.readlines, 1 << 16):
+            for line in batch:
+                yield line.decode("utf-8", "replace").rstrip("\n")
+        return
+    async for line in reader:
+        yield line.decode("utf-8", "replace").rstrip("\n")
@@ -0,0 +1,185 @@
+"""Stable request prefixes and prompt-cache accounting.
+
+Providers that cache prompt prefixes (OpenAI does so automatically above
+1024 tokens; Anthropic and local servers such as Ollama keep the KV cache of
+the previous request) only help when consecutive requests share a
+byte-identical prefix.  :func:`build_request` therefore lays every request
+out the same way:
+
+1. the system prompt(s),
+2. the project context (if any),
+3. the conversation turns, append-only,
+
+with each message reduced to exactly ``{"role", "content"}`` – no
+timestamps, references or other per-turn data that would break the prefix.
+
+:class:`PromptMeter` compares each request with the previous one and
+accounts cached vs. uncached prompt tokens per turn.  When the provider
+reports real numbers (``provider.last_usage``) those are used, otherwise the
+shared prefix is estimated locally with :func:`~ecrivez.tokens.count_tokens`
+(memoised per message, so metering is O(new messages)).  For a
+:class:`~ecrivez.history.History` the request is a lazy
+:class:`~ecrivez.history.RequestView`: nothing is copied, and when it only
+extends the previous request the meter reads the cached token counts of the
+new messages instead of hashing the whole conversation again.  Turns are appended
+to ``.ecrivez/telemetry.jsonl`` by :class:`Telemetry`; ``ecrivez sessions
+usage`` shows the cached ratio.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Iterable, List, Mapping, Optional, TypedDict
+
+from ecrivez.history import History, RequestView
+from ecrivez.tokens import count_tokens
+
+__all__ = ["PromptMeter", "Telemetry", "TurnUsage", "build_request"]
+
+TELEMETRY_PATH = Path(".ecrivez") / "telemetry.jsonl"
+
+
+class TurnUsage(TypedDict):
+    prompt_tokens: int
+    cached_tokens: int
+    uncached_tokens: int
+    prefix_messages: int  # messages shared with the previous request
+    source: str  # "provider" | "local"
+
+
+def build_request(
+    history: Iterable[Mapping[str, Any]], context: Optional[str] = None
+) -> List[dict[str, str]] | RequestView:
+    """Return the messages to send, in the stable prefix-friendly layout."""
+
+    if isinstance(history, History):
+        return history.request(context)
+    system: List[dict[str, str]] = []
+    turns: List[dict[str, str]] = []
+    for message in history:
+        entry = {"role": message["role"], "content": message["content"]}
+        (system if message["role"] == "system" and not turns else turns).append(entry)
+    if context:
+        system.append({"role": "system", "content": context})
+    return system + turns
+
+
+def _digest(message: Mapping[str, Any]) -> str:
+    encoded = json.dumps([message["role"], message["content"]], ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _common_prefix(old: List[str], new: List[str]) -> int:
+    shared = 0
+    for a, b in zip(old, new):
+        if a != b:
+            break
+        shared += 1
+    return shared
+
+
+class PromptMeter:
+    """Per-conversation cached/uncached prompt-token accounting."""
+
+    def __init__(self, model: str = "gpt-4o", max_tokens_cache: int = 4096) -> None:
+        self.model = model
+        self.turns: List[TurnUsage] = []
+        self._previous: List[str] = []
+        self._previous_view: Optional[RequestView] = None  # set instead of _previous when possible
+        self._previous_tokens = 0
+        self._tokens: dict[str, int] = {}
+        self._max = max_tokens_cache
+
+    def _count(self, digest: str, message: Mapping[str, Any]) -> int:
+        tokens = self._tokens.get(digest)
+        if tokens is None:
+            tokens = count_tokens(message["content"], self.model) + 4  # role/framing overhead
+            if len(self._tokens) >= self._max:
+                self._tokens.pop(next(iter(self._tokens)))
+            self._tokens[digest] = tokens
+        return tokens
+
+    def _shared(self, request: Any) -> tuple[int, int, int]:
+        """``(shared messages, shared tokens, total tokens)`` of *request*."""
+
+        previous = self._previous_view
+        if isinstance(request, RequestView):
+            if request.extends(previous):
+                shared = len(previous)  # type: ignore[arg-type]
+                new = sum(request.tokens(i, self.model) + 4 for i in range(shared, len(request)))
+                self._previous_view = request
+                self._previous_tokens, cached = self._previous_tokens + new, self._previous_tokens
+                return shared, cached, self._previous_tokens
+            if previous is not None and previous.history is request.history:
+                shared = request.common_prefix(previous)
+            else:
+                shared = _common_prefix(self._previous, [_digest(m) for m in request])
+            counts = [request.tokens(i, self.model) + 4 for i in range(len(request))]
+            self._previous_view, self._previous = request, []
+        else:
+            if previous is not None:  # best effort: the view reads the history as it is now
+                self._previous = [_digest(m) for m in previous]
+            digests = [_digest(m) for m in request]
+            shared = _common_prefix(self._previous, digests)
+            counts = [self._count(d, m) for d, m in zip(digests, request)]
+            self._previous_view, self._previous = None, digests
+        self._previous_tokens = sum(counts)
+        return shared, sum(counts[:shared]), self._previous_tokens
+
+    def measure(self, request: List[Mapping[str, Any]] | RequestView, provider: Any = None) -> TurnUsage:
+        """Account one request; call after the provider answered it."""
+
+        shared, local_cached, local_prompt = self._shared(request)
+        reported = getattr(provider, "last_usage", None)
+        if reported and reported.get("prompt_tokens") is not None:
+            prompt = int(reported["prompt_tokens"])
+            cached = int(reported.get("cached_tokens") or 0)
+            source = "provider"
+        else:
+            prompt = local_prompt
+            cached = local_cached
+            source = "local"
+        usage = TurnUsage(
+            prompt_tokens=prompt,
+            cached_tokens=cached,
+            uncached_tokens=prompt - cached,
+            prefix_messages=shared,
+            source=source,
+        )
+        self.turns.append(usage)
+        return usage
+
+    @property
+    def cached_ratio(self) -> float:
+        prompt = sum(t["prompt_tokens"] for t in self.turns)
+        return sum(t["cached_tokens"] for t in self.turns) / prompt if prompt else 0.0
+
+
+class Telemetry:
+    """Append-only JSONL log of per-turn prompt usage."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path is not None else TELEMETRY_PATH
+
+    def record(self, session_id: str, provider: str, usage: TurnUsage) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"ts": time.time(), "session": session_id, "provider": provider, **usage}
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry) + "\n")
+
+    def entries(self, session_id: Optional[str] = None) -> List[dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        found = []
+        with self.path.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if session_id is None or entry.get("session") == session_id:
+                    found.append(entry)
+        return found
@@ -0,0 +1,422 @@
+"""Multi-session server: many REPL clients, one asyncio process.
+
+The server listens on a local Unix socket and speaks newline-delimited JSON.
+Every request carries an ``id`` that is echoed back, so a single connection
+can multiplex many sessions and requests:
+
+    → {"id": 1, "op": "open"}                       ← {"id": 1, "ok": true, "session": "…"}
+    → {"id": 2, "op": "input", "session": "…", "text": "hi"}
+    ← {"id": 2, "ok": true, "session": "…", "reply": "(echo) hi"}
+    → {"id": 3, "op": "close", "session": "…"}      → {"id": 4, "op": "stats"}
+
+All sessions share one provider (optionally wrapped in a
+:class:`~ecrivez.chat.CachedProvider`), one bounded worker pool and one
+request-rate limiter; each session keeps its own
+:class:`~ecrivez.history.History` and its own ``session_id`` in the config
+its turns see (so ``!cmd`` runs in that session's persistent shell), and turns of the same session are
+serialised.  ``_process_input`` is synchronous, so turns run on the worker
+pool and journal writes on a single I/O thread; neither blocks the event
+loop.  A session is closed – history, shell and kernel – on ``close`` or
+when the last connection that opened it goes away.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, List
+
+from ecrivez.chat import BaseProvider, Message, _process_input
+from ecrivez.history import History
+from ecrivez.session import SessionStore
+
+__all__ = ["SOCKET_TEMPLATE", "Client", "SessionServer", "load_test", "run_client_repl"]
+
+SOCKET_TEMPLATE = "/tmp/ecrivez-{name}.sock"
+_LINE_LIMIT = 64 * 1024 * 1024
+
+
+class _Throttled(BaseProvider):
+    """Token-bucket limit (*rate* calls/s, bursts of *burst*) shared by all threads."""
+
+    def __init__(self, inner: BaseProvider, rate: float, burst: int) -> None:
+        self._inner = inner
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:  # noqa: D401
+        return self._inner.name
+
+    @property
+    def last_usage(self) -> Any:  # noqa: D401
+        return getattr(self._inner, "last_usage", None)
+
+    def _acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self._rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
+        self._acquire()
+        return self._inner.chat_completion(messages)
+
+    def stream_completion(self, messages: List[Message]) -> Iterator[str]:
+        self._acquire()  # one token per request, however many deltas it yields
+        stream = getattr(self._inner, "stream_completion", None)
+        if stream is None:
+            yield self._inner.chat_completion(messages)
+        else:
+            yield from stream(messages)
+
+
+class _Session:
+    __slots__ = ("history", "cfg", "lock", "turns", "clients")
+
+    def __init__(self, history: History, cfg: dict[str, Any]) -> None:
+        self.history = history
+        self.cfg = cfg  # the server config plus this session's ``session_id``
+        self.lock = asyncio.Lock()
+        self.turns = 0
+        self.clients = 0  # connections that opened it
+
+
+class SessionServer:
+    """Host many chat sessions on a shared provider."""
+
+    def __init__(
+        self,
+        provider: BaseProvider,
+        cfg: dict[str, Any] | None = None,
+        store: SessionStore | None = None,
+        max_concurrency: int = 16,
+        rate: float | None = None,
+        burst: int = 10,
+    ) -> None:
+        self.provider = _Throttled(provider, rate, burst) if rate else provider
+        self.cfg = cfg or {}
+        self.store = store
+        self.sessions: dict[str, _Session] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ecrivez-turn")
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ecrivez-store")  # store access, in order
+        self._turns = 0
+        self._started = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+
+    async def handle(self, request: dict[str, Any], owned: set[str] | None = None) -> dict[str, Any]:
+        """Answer one request; *owned* collects the sessions a connection opened."""
+
+        op = request.get("op")
+        try:
+            if op == "open":
+                result = await self._open(request.get("session"))
+                if owned is not None and result["session"] not in owned:
+                    owned.add(result["session"])
+                    self.sessions[result["session"]].clients += 1
+            elif op == "input":
+                result = await self._input(request["session"], str(request["text"]))
+            elif op == "close":
+                if owned is not None:
+                    owned.discard(request["session"])
+                self._close(request["session"])
+                result = {"session": request["session"]}
+            elif op == "stats":
+                result = self.stats()
+            else:
+                raise ValueError(f"Unknown op: {op!r}")
+        except KeyError as exc:
+            return {"id": request.get("id"), "ok": False, "error": f"Missing or unknown {exc.args[0]!r}"}
+        except Exception as exc:  # noqa: BLE001 – reported to the client
+            return {"id": request.get("id"), "ok": False, "error": str(exc)}
+        return {"id": request.get("id"), "ok": True, **result}
+
+    async def _open(self, session_id: str | None) -> dict[str, Any]:
+        session_id = session_id or uuid.uuid4().hex
+        if session_id not in self.sessions:
+            messages: List[Message] = []
+            if self.store is not None:
+                messages = await asyncio.get_running_loop().run_in_executor(self._io, self._load, session_id)
+            if session_id not in self.sessions:  # opened meanwhile by another client
+                self.sessions[session_id] = _Session(History(messages), {**self.cfg, "session_id": session_id})
+        return {"session": session_id}
+
+    def _load(self, session_id: str) -> List[Message]:
+        assert self.store is not None
+        self.store.open_session(session_id, model=self.cfg.get("model", ""), provider=self.provider.name)
+        return self.store.load(session_id)
+
+    def _close(self, session_id: str) -> None:
+        from ecrivez.tools.kernel import close_kernel
+        from ecrivez.tools.shell import close_shell
+
+        if self.sessions.pop(session_id, None) is not None:
+            close_shell(session_id)
+            close_kernel(session_id)
+
+    def _release(self, session_id: str) -> None:
+        """A connection that opened *session_id* went away; close it if it was the last."""
+
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.clients -= 1
+            if session.clients <= 0:
+                self._close(session_id)
+
+    async def _input(self, session_id: str, text: str) -> dict[str, Any]:
+        session = self.sessions[session_id]
+        async with session.lock:
+            start = len(session.history)
+            loop = asyncio.get_running_loop()
+            reply = await loop.run_in_executor(
+                self._pool, _process_input, text, session.cfg, self.provider, session.history
+            )
+            session.turns += 1
+            self._turns += 1
+            if self.store is not None:
+                messages = [session.history.expand(m) for m in session.history[start:]]
+                await loop.run_in_executor(self._io, self.store.append, session_id, messages)
+        return {"session": session_id, "reply": reply}
+
+    def stats(self) -> dict[str, Any]:
+        elapsed = time.monotonic() - self._started
+        return {
+            "sessions": len(self.sessions),
+            "turns": self._turns,
+            "uptime": elapsed,
+            "turns_per_second": self._turns / elapsed if elapsed > 0 else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        tasks: set[asyncio.Task[None]] = set()
+        owned: set[str] = set()
+
+        async def respond(request: dict[str, Any]) -> None:
+            response = await self.handle(request, owned)
+            async with write_lock:
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = {"op": None}
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for session_id in owned:  # the client is gone: free its shells and kernels
+                self._release(session_id)
+            writer.close()
+
+    async def start(self, path: str | Path) -> asyncio.AbstractServer:
+        if Path(path).exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(path))
+            except OSError:
+                Path(path).unlink()  # stale socket from a dead server
+            else:
+                raise RuntimeError(f"An ecrivez server is already listening at {path}")
+            finally:
+                probe.close()
+        return await asyncio.start_unix_server(
+            self._serve_client, path=str(path), limit=_LINE_LIMIT, backlog=1024
+        )
+
+    async def serve_forever(self, path: str | Path) -> None:
+        server = await self.start(path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._io.shutdown(wait=True)  # let pending journal writes finish
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+
+class Client:
+    """Blocking client used by ``ecrivez repl --server``."""
+
+    def __init__(self, path: str | Path) -> None:
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(str(path))
+        self._file = self._sock.makefile("rwb")
+        self._next_id = 0
+
+    def request(self, op: str, **fields: Any) -> dict[str, Any]:
+        self._next_id += 1
+        payload = {"id": self._next_id, "op": op, **fields}
+        self._file.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        response = json.loads(self._file.readline())
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "server error"))
+        return response
+
+    def open(self, session_id: str | None = None) -> str:
+        return self.request("open", session=session_id)["session"]
+
+    def send(self, session_id: str, text: str) -> str:
+        return self.request("input", session=session_id, text=text)["reply"]
+
+    def end(self, session_id: str) -> None:
+        """Close *session_id* on the server (its shell and kernel go with it)."""
+
+        self.request("close", session=session_id)
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+
+def run_client_repl(path: str | Path, session_id: str | None = None) -> None:
+    """Interactive REPL whose turns are processed by a running server."""
+
+    try:
+        client = Client(path)
+    except OSError as exc:
+        raise RuntimeError(f"No ecrivez server listening at {path}") from exc
+    session_id = client.open(session_id)
+    print(f"🖋  Ecrivez REPL – server = {path}, session = {session_id}  (Ctrl-D to quit)\n")
+    try:
+        while True:
+            try:
+                user_input = input("you › ")
+            except EOFError:
+                print()
+                break
+            if not user_input.strip():
+                continue
+            print("llm › " + client.send(session_id, user_input))
+    except KeyboardInterrupt:
+        print("\nInterrupted – goodbye!")
+    finally:
+        try:
+            client.end(session_id)
+        except (OSError, RuntimeError, ValueError):
+            pass  # the server went away first
+        client.close()
+
+
+# ---------------------------------------------------------------------------
+# Load test
+# ---------------------------------------------------------------------------
+
+
+async def _simulated_client(path: str, turns: int, latencies: List[float], barrier: asyncio.Barrier) -> None:
+    reader, writer = await asyncio.open_unix_connection(path, limit=_LINE_LIMIT)
+
+    async def call(payload: dict[str, Any]) -> dict[str, Any]:
+        writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response
+
+    try:
+        session = (await call({"id": 0, "op": "open"}))["session"]
+        for i in range(turns):
+            start = time.perf_counter()
+            await call({"id": i + 1, "op": "input", "session": session, "text": f"turn {i} of {session}"})
+            latencies.append(time.perf_counter() - start)
+        await barrier.wait()  # all done: memory is measured while every session is open
+        await barrier.wait()
+    except BaseException:
+        await barrier.abort()  # don't leave the others waiting
+        raise
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def _load_test(server: SessionServer, clients: int, turns: int, path: str) -> dict[str, Any]:
+    import tracemalloc
+
+    listener = await server.start(path)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    latencies: List[float] = []
+    start = time.perf_counter()
+    try:
+        async with listener:
+            barrier = asyncio.Barrier(clients + 1)
+            users = asyncio.gather(*(_simulated_client(path, turns, latencies, barrier) for _ in range(clients)))
+            await barrier.wait()
+            elapsed = time.perf_counter() - start
+            current, _ = tracemalloc.get_traced_memory()
+            sessions = len(server.sessions)
+            await barrier.wait()
+            await users
+    finally:
+        tracemalloc.stop()
+        Path(path).unlink(missing_ok=True)
+
+    latencies.sort()
+    total = clients * turns
+    return {
+        "clients": clients,
+        "turns": total,
+        "elapsed": elapsed,
+        "turns_per_second": total / elapsed if elapsed > 0 else 0.0,
+        "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "memory_per_session": (current - baseline) / max(1, sessions),
+    }
+
+
+def load_test(
+    provider: BaseProvider,
+    clients: int = 200,
+    turns: int = 10,
+    max_concurrency: int = 16,
+    path: str | Path | None = None,
+) -> dict[str, Any]:
+    """Run *clients* simulated REPL clients against an in-process server.
+
+    Returns throughput, latency and the memory retained per session (measured
+    with :pymod:`tracemalloc`, so absolute timings are somewhat pessimistic).
+    """
+
+    path = str(path or SOCKET_TEMPLATE.format(name=f"loadtest-{uuid.uuid4().hex[:8]}"))
+    server = SessionServer(provider, max_concurrency=max_concurrency)
+    try:
+        return asyncio.run(_load_test(server, clients, turns, path))
+    finally:
+        server.close()
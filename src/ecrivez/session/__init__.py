@@ -0,0 +1,5 @@
+"""Session persistence: journals on disk and the index used to search them."""
+
+from ecrivez.session.store import SESSIONS_DIR, SearchHit, SessionInfo, SessionStore
+
+__all__ = ["SESSIONS_DIR", "SearchHit", "SessionInfo", "SessionStore"]
@@ -0,0 +1,208 @@
+"""Compact binary session journals (``<session_id>.ecz``).
+
+Layout::
+
+    header   b"ECZS" u8 version 3×pad
+    record*  u32 length | f64 ts | u32 tokens | u8 flags | u8 role_len | role | body
+    index    u64 offset × count
+    trailer  u64 index_offset | u64 count | b"ECZI"
+
+``body`` is the UTF-8 message content, or – when ``FLAG_BLOB`` is set – the
+32-byte SHA-256 digest of the content followed by its u64 size; the content
+itself then lives in a :class:`~ecrivez.session.blobs.BlobStore`.
+
+Appending truncates the old index, writes the new records and a fresh
+index/trailer.  A file whose trailer is missing (crash mid-append) is
+recovered by scanning the length prefixes from the header.
+
+:class:`BinarySession` reads through :pymod:`mmap`: opening a session only
+touches the trailer and index, and message bodies (or blobs) are decoded only
+when a record's content is actually requested.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, TypedDict
+
+from ecrivez.session.blobs import BlobStore
+
+__all__ = ["BinaryJournal", "BinarySession", "RecordMeta", "BLOB_THRESHOLD"]
+
+MAGIC = b"ECZS"
+INDEX_MAGIC = b"ECZI"
+VERSION = 1
+FLAG_BLOB = 0x01
+BLOB_THRESHOLD = 4096
+
+_HEADER = struct.Struct("<4sB3x")
+_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<dIBB")
+_BLOB_REF = struct.Struct("<32sQ")
+_TRAILER = struct.Struct("<QQ4s")
+
+
+class RecordMeta(TypedDict):
+    role: str
+    ts: float
+    tokens: int
+    size: int  # content size in bytes
+    blob: bool
+
+
+def _scan(buf: Any, start: int, end: int) -> array:
+    """Rebuild the offset index by walking length prefixes in ``buf[start:end]``."""
+
+    offsets = array("Q")
+    pos = start
+    while pos + _LENGTH.size <= end:
+        (length,) = _LENGTH.unpack_from(buf, pos)
+        if length < _RECORD.size or pos + _LENGTH.size + length > end:
+            break
+        offsets.append(pos)
+        pos += _LENGTH.size + length
+    return offsets
+
+
+def _read_index(buf: Any, size: int) -> tuple[array, int]:
+    """Return ``(offsets, data_end)`` for a journal mapped in *buf*."""
+
+    if size < _HEADER.size:
+        return array("Q"), _HEADER.size
+    magic, version = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an ecrivez binary session")
+    if size >= _HEADER.size + _TRAILER.size:
+        index_offset, count, tag = _TRAILER.unpack_from(buf, size - _TRAILER.size)
+        if tag == INDEX_MAGIC and index_offset + 8 * count + _TRAILER.size == size:
+            offsets = array("Q")
+            offsets.frombytes(bytes(buf[index_offset : index_offset + 8 * count]))
+            return offsets, index_offset
+    offsets = _scan(buf, _HEADER.size, size)
+    if offsets:
+        last = offsets[-1]
+        (length,) = _LENGTH.unpack_from(buf, last)
+        return offsets, last + _LENGTH.size + length
+    return offsets, _HEADER.size
+
+
+class BinaryJournal:
+    """Append-side of a binary session file."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        blobs: BlobStore | None = None,
+        blob_threshold: int = BLOB_THRESHOLD,
+    ) -> None:
+        self.path = Path(path)
+        self.blobs = blobs if blobs is not None else BlobStore(self.path.parent / "blobs")
+        self.blob_threshold = blob_threshold
+
+    def _encode(self, record: dict[str, Any]) -> bytes:
+        role = record["role"].encode("utf-8")
+        body = record["content"].encode("utf-8")
+        flags = 0
+        if len(body) >= self.blob_threshold:
+            body = _BLOB_REF.pack(self.blobs.put(body), len(body))
+            flags |= FLAG_BLOB
+        head = _RECORD.pack(float(record["ts"]), int(record["tokens"]), flags, len(role))
+        length = len(head) + len(role) + len(body)
+        return b"".join((_LENGTH.pack(length), head, role, body))
+
+    def append(self, records: Iterable[dict[str, Any]]) -> int:
+        """Append *records* (``role``/``content``/``ts``/``tokens``); return new count."""
+
+        encoded = [self._encode(r) for r in records]
+        mode = "r+b" if self.path.exists() else "w+b"
+        with open(self.path, mode) as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size == 0:
+                fh.write(_HEADER.pack(MAGIC, VERSION))
+                offsets, data_end = array("Q"), _HEADER.size
+            else:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    offsets, data_end = _read_index(mm, size)
+            fh.seek(data_end)
+            pos = data_end
+            for chunk in encoded:
+                offsets.append(pos)
+                fh.write(chunk)
+                pos += len(chunk)
+            fh.write(offsets.tobytes())
+            fh.write(_TRAILER.pack(pos, len(offsets), INDEX_MAGIC))
+            fh.truncate()
+        return len(offsets)
+
+
+class BinarySession:
+    """Random-access, lazily decoded view of a binary session file."""
+
+    def __init__(self, path: str | Path, blobs: BlobStore | None = None) -> None:
+        self.path = Path(path)
+        self.blobs = blobs if blobs is not None else BlobStore(self.path.parent / "blobs")
+        self._fh = open(self.path, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        self._mm: mmap.mmap | bytes
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets, _ = _read_index(self._mm, size)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _locate(self, i: int) -> tuple[float, int, int, str, int, int]:
+        if i < 0:
+            i += len(self._offsets)
+        pos = self._offsets[i]
+        (length,) = _LENGTH.unpack_from(self._mm, pos)
+        ts, tokens, flags, role_len = _RECORD.unpack_from(self._mm, pos + _LENGTH.size)
+        role_start = pos + _LENGTH.size + _RECORD.size
+        role = self._mm[role_start : role_start + role_len].decode("utf-8")
+        body_start = role_start + role_len
+        body_end = pos + _LENGTH.size + length
+        return ts, tokens, flags, role, body_start, body_end
+
+    def meta(self, i: int) -> RecordMeta:
+        """Decode the fixed-size header of record *i* without touching its body."""
+
+        ts, tokens, flags, role, start, end = self._locate(i)
+        if flags & FLAG_BLOB:
+            _, size = _BLOB_REF.unpack_from(self._mm, start)
+        else:
+            size = end - start
+        return RecordMeta(role=role, ts=ts, tokens=tokens, size=size, blob=bool(flags & FLAG_BLOB))
+
+    def content(self, i: int) -> str:
+        _, _, flags, _, start, end = self._locate(i)
+        if flags & FLAG_BLOB:
+            digest, _ = _BLOB_REF.unpack_from(self._mm, start)
+            return self.blobs.get(digest).decode("utf-8")
+        return self._mm[start:end].decode("utf-8")
+
+    def __getitem__(self, i: int) -> dict[str, Any]:
+        meta = self.meta(i)
+        return {"role": meta["role"], "content": self.content(i), "ts": meta["ts"], "tokens": meta["tokens"]}
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return (self[i] for i in range(len(self)))
+
+    def iter_meta(self) -> Iterator[RecordMeta]:
+        return (self.meta(i) for i in range(len(self)))
+
+    def tail(self, n: int) -> List[dict[str, Any]]:
+        return [self[i] for i in range(max(0, len(self) - n), len(self))]
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fh.close()
+
+    def __enter__(self) -> BinarySession:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,55 @@
+"""Content-addressed, compressed blob storage for large message payloads.
+
+Blobs live under ``<root>/<hh>/<rest-of-sha256>`` and are zlib-compressed.
+Writing the same payload twice is a no-op, so repeated tool outputs are only
+stored once no matter how many sessions reference them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import zlib
+from pathlib import Path
+
+__all__ = ["BlobStore"]
+
+
+class BlobStore:
+    """Immutable blobs keyed by the SHA-256 digest of their *uncompressed* bytes."""
+
+    def __init__(self, root: str | Path, level: int = 6) -> None:
+        self.root = Path(root)
+        self.level = level
+
+    def path(self, digest: bytes) -> Path:
+        hexdigest = digest.hex()
+        return self.root / hexdigest[:2] / hexdigest[2:]
+
+    def put(self, data: bytes) -> bytes:
+        """Store *data* (if not already present) and return its digest."""
+
+        digest = hashlib.sha256(data).digest()
+        target = self.path(digest)
+        if target.exists():
+            return digest
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(zlib.compress(data, self.level))
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return digest
+
+    def get(self, digest: bytes) -> bytes:
+        try:
+            return zlib.decompress(self.path(digest).read_bytes())
+        except FileNotFoundError as exc:
+            raise KeyError(f"Missing blob {digest.hex()}") from exc
+
+    def __contains__(self, digest: bytes) -> bool:
+        return self.path(digest).exists()
@@ -0,0 +1,382 @@
+"""Streaming conversion between session formats (``ecrivez convert``).
+
+Three formats are understood, in both directions:
+
+``jsonl``
+    the session journal, one ``{"role", "content", "ts", "tokens"}`` record
+    per line (``json`` is accepted as an alias);
+``jsonld``
+    the layout of ``resources/templates/session-template.jsonld``, written by
+    :func:`ecrivez.session.jsonld.write_jsonld`;
+``md``
+    a Markdown transcript – ``# Session <id>`` followed by one
+    ``### <role> · <timestamp>`` section per message (``markdown`` alias).
+    Content lines that would read as such a heading are escaped with a
+    backslash; surrounding blank lines and token counts are not kept.
+
+Records flow through one at a time: JSONL and Markdown are read line by line,
+and the JSON-LD document is parsed incrementally – :class:`_JsonStream`
+decodes one array element at a time with :meth:`json.JSONDecoder.raw_decode`
+over a sliding buffer, skipping values it does not need without building
+them.  Memory therefore stays flat however large the archive is, and the
+converter can sit in the middle of a shell pipeline.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+from ecrivez.session.jsonld import write_jsonld
+
+__all__ = ["FORMATS", "ConvertError", "convert", "normalize_format", "read_records", "write_records"]
+
+FORMATS = ("jsonl", "jsonld", "md")
+_ALIASES = {"json": "jsonl", "markdown": "md"}
+
+_DECODER = json.JSONDecoder()
+_WS = re.compile(r"[ \t\r\n]*")
+_PARTIAL = 16  # longest token tail a decode error can point into ("\ud83d\ude0", "-1.5e+", "fals")
+_ROLES = "system|user|assistant|tool"
+_HEADING = re.compile(rf"^#{{2,3}} +({_ROLES})(?: +· +(\S.*?))?\s*$", re.IGNORECASE)
+_ESCAPED = re.compile(rf"^\\+#{{2,3}} +(?:{_ROLES})\b", re.IGNORECASE)
+_TITLE = re.compile(r"^# +Session +(\S+)\s*$")
+
+
+class ConvertError(ValueError):
+    """Malformed input for the declared format."""
+
+
+def normalize_format(name: str) -> str:
+    fmt = _ALIASES.get(name.lower(), name.lower())
+    if fmt not in FORMATS:
+        raise ConvertError(f"unknown format {name!r} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
+
+# ---------------------------------------------------------------------------
+# Incremental JSON
+# ---------------------------------------------------------------------------
+
+
+class _JsonStream:
+    """Pull parser over a text stream, decoding one value at a time."""
+
+    __slots__ = ("_fh", "_buf", "_pos", "_eof", "_chunk")
+
+    def __init__(self, fh: TextIO, chunk: int = 1 << 16) -> None:
+        self._fh = fh
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._chunk = chunk
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        if self._eof:
+            return False
+        data = self._fh.read(size or self._chunk)
+        if not data:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + data  # drop what was consumed
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next significant character (``""`` at end of input)."""
+
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()  # type: ignore[union-attr]
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str) -> None:
+        found = self.peek()
+        if found != expected:
+            raise ConvertError(f"expected {expected!r}, found {found or 'end of input'!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode the next value; reads more input until it is complete."""
+
+        self.peek()
+        size = self._chunk
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as exc:
+                # Only an error at the end of the buffer may be a value cut by the
+                # read; anything else is malformed and reading on won't fix it.
+                truncated = exc.msg.startswith("Unterminated string") or len(self._buf) - exc.pos <= _PARTIAL
+                if not truncated or not self._fill(size):
+                    raise ConvertError(f"invalid JSON: {exc.msg}") from exc
+                size *= 2  # a large value: grow the reads so retries stay linear
+                continue
+            # A number at the very end of the buffer may continue in the next read.
+            if end < len(self._buf) or not self._fill(size):
+                self._pos = end
+                return value
+
+    def skip(self) -> None:
+        """Consume the next value without materialising containers."""
+
+        ch = self.peek()
+        if ch == "[":
+            for _ in self.items():
+                self.skip()
+        elif ch == "{":
+            for _ in self.members():
+                self.skip()
+        else:
+            self.value()
+
+    def items(self) -> Iterator[None]:
+        """Enter an array; the caller consumes one element per iteration."""
+
+        self.take("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield None
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.take("]")
+            return
+
+    def members(self) -> Iterator[str]:
+        """Enter an object, yielding its keys; the caller consumes each value."""
+
+        self.take("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ConvertError("object keys must be strings")
+            self.take(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.take("}")
+            return
+
+
+# ---------------------------------------------------------------------------
+# Readers
+# ---------------------------------------------------------------------------
+
+
+def _record(role: Any, content: Any, ts: Any = None, tokens: Any = None) -> Dict[str, Any]:
+    if not isinstance(role, str) or not isinstance(content, str):
+        raise ConvertError("a message needs a string 'role' and 'content'")
+    record: Dict[str, Any] = {"role": role, "content": content}
+    try:
+        if ts is not None:
+            record["ts"] = float(ts)
+        if tokens is not None:
+            record["tokens"] = int(tokens)
+    except (TypeError, ValueError) as exc:
+        raise ConvertError(f"bad 'ts' or 'tokens' in a {role} message") from exc
+    return record
+
+
+def _timestamp(text: str) -> Optional[float]:
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _read_jsonl(fh: TextIO, meta: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for lineno, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+            record = _record(raw["role"], raw["content"], raw.get("ts"), raw.get("tokens"))
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as exc:
+            raise ConvertError(f"line {lineno}: not a session record ({exc})") from exc
+        yield record
+
+
+def _read_jsonld(fh: TextIO, meta: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    stream = _JsonStream(fh)
+    for key in stream.members():
+        if key == "messages":
+            for _ in stream.items():
+                raw = stream.value()
+                if not isinstance(raw, dict):
+                    raise ConvertError("'messages' must hold objects")
+                created = raw.get("dateCreated")
+                ts = _timestamp(created) if isinstance(created, str) else None
+                yield _record(raw.get("role"), raw.get("content"), ts, raw.get("tokens"))
+        elif key == "session":
+            session = stream.value()
+            if isinstance(session, dict) and session.get("uuid"):
+                meta.setdefault("session", session["uuid"])
+        elif key == "model" and stream.peek() == "[":
+            for _ in stream.items():
+                for field in stream.members():
+                    if field in ("name", "provider"):
+                        value = stream.value()
+                        if field == "provider" and isinstance(value, dict):
+                            value = value.get("name")
+                        if value:
+                            meta.setdefault(field if field == "provider" else "model", value)
+                    else:
+                        stream.skip()  # message_ids grows with the session
+        else:
+            stream.skip()
+    if stream.peek():
+        raise ConvertError("trailing data after the JSON-LD document")
+
+
+def _read_markdown(fh: TextIO, meta: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    role: Optional[str] = None
+    ts: Optional[float] = None
+    lines: list[str] = []
+
+    def flush() -> Optional[Dict[str, Any]]:
+        if role is None:
+            return None
+        return _record(role, "\n".join(lines).strip("\n"), ts)
+
+    for line in fh:
+        line = line.rstrip("\r\n")
+        heading = _HEADING.match(line)
+        if heading:
+            if (done := flush()) is not None:
+                yield done
+            role, ts, lines = heading.group(1).lower(), None, []
+            if heading.group(2):
+                ts = _timestamp(heading.group(2))
+            continue
+        if role is None:
+            if (title := _TITLE.match(line)) is not None:
+                meta.setdefault("session", title.group(1))
+            continue  # preamble
+        lines.append(line[1:] if _ESCAPED.match(line) else line)
+    if (done := flush()) is not None:
+        yield done
+
+
+_READERS = {"jsonl": _read_jsonl, "jsonld": _read_jsonld, "md": _read_markdown}
+
+
+def read_records(fh: TextIO, fmt: str, meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the records of *fh* in format *fmt*, one at a time.
+
+    *meta* is filled with ``session``/``model``/``provider`` as they are
+    found in the input (before the first record where the format allows).
+    """
+
+    return _READERS[normalize_format(fmt)](fh, meta if meta is not None else {})
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+
+def _write_jsonl(fh: TextIO, records: Iterator[Dict[str, Any]]) -> int:
+    count = 0
+    for record in records:
+        fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def _write_markdown(fh: TextIO, records: Iterator[Dict[str, Any]], session_id: str) -> int:
+    if session_id:
+        fh.write(f"# Session {session_id}\n")
+    count = 0
+    for record in records:
+        heading = f"### {record['role']}"
+        if "ts" in record:
+            stamp = datetime.fromtimestamp(record["ts"], tz=timezone.utc).isoformat()
+            heading += f" · {stamp}"
+        body = "\n".join(
+            "\\" + line if _HEADING.match(line) or _ESCAPED.match(line) else line
+            for line in record["content"].split("\n")
+        )
+        fh.write(f"\n{heading}\n\n{body}\n")
+        count += 1
+    return count
+
+
+def write_records(
+    fh: TextIO,
+    fmt: str,
+    records: Iterator[Dict[str, Any]],
+    session_id: str = "",
+    model: str = "",
+    provider: str = "",
+) -> int:
+    """Write *records* to *fh* in format *fmt*; return how many were written."""
+
+    fmt = normalize_format(fmt)
+    if fmt == "jsonld":
+        return write_jsonld(fh, session_id, records, model=model, provider=provider)
+    if fmt == "md":
+        return _write_markdown(fh, records, session_id)
+    return _write_jsonl(fh, records)
+
+
+class _Tee:
+    """Minimal text sink writing to several streams."""
+
+    __slots__ = ("_streams",)
+
+    def __init__(self, *streams: TextIO) -> None:
+        self._streams = streams
+
+    def write(self, text: str) -> int:
+        for stream in self._streams:
+            stream.write(text)
+        return len(text)
+
+
+def convert(
+    src: TextIO,
+    dst: TextIO,
+    from_fmt: str,
+    to_fmt: str,
+    session_id: Optional[str] = None,
+    model: Optional[str] = None,
+    provider: Optional[str] = None,
+    tee: Optional[TextIO] = None,
+) -> int:
+    """Stream the session in *src* to *dst*; return the number of records.
+
+    Unset *session_id*/*model*/*provider* are taken from the input when it
+    declares them before its first message.  With *tee* the output is
+    written there as well.
+    """
+
+    if tee is not None:
+        dst = _Tee(dst, tee)  # type: ignore[assignment]
+
+    meta: Dict[str, Any] = {}
+    records = read_records(src, from_fmt, meta)
+    first = next(records, None)  # readers fill *meta* from the preamble
+    stream = chain([first], records) if first is not None else iter(())
+    return write_records(
+        dst,
+        to_fmt,
+        stream,
+        session_id=session_id or meta.get("session", ""),
+        model=model or meta.get("model", ""),
+        provider=provider or meta.get("provider", ""),
+    )
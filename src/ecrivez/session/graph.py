@@ -0,0 +1,213 @@
+"""Incremental session graphs for :mod:`ecrivez.ui.generate_graph`.
+
+:class:`SessionGraph` turns session journals into vis-network nodes and
+edges:
+
+* a ``session`` node per session, then one node per message – ``user``,
+  ``assistant``, ``tool`` (output of ``!cmd`` and JSON tool calls, labelled
+  with the command), ``edit`` (``/apply`` results) and ``agent`` (records
+  with another role or carrying a ``step`` field, e.g. workflow steps);
+* a ``file`` node per path touched by an applied diff, shared by every
+  session that edits it;
+* sequential edges weighted with the time between the two records and the
+  tokens of the target (``value``), so vis scales edge widths by tokens and
+  edges slower than ``slow`` seconds are drawn in red.
+
+Per session the derived items are appended to
+``.ecrivez/sessions/graphs/<id>.ndjson`` and the builder state (journal
+position, last node, open turn) to ``<id>.state.json``.  :pymeth:`update`
+only parses journal records written since the last call, so regenerating the
+graph of a long agent run costs O(new turns).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Tuple
+
+from ecrivez.session.binary import BinarySession
+from ecrivez.session.store import SUFFIXES, SessionStore
+
+__all__ = ["SessionGraph"]
+
+Item = Tuple[str, dict]
+
+_DIFF_FILE = re.compile(r"^\+\+\+ (?:b/)?(\S+)", re.MULTILINE)
+_LABEL_CHARS = 40
+
+
+def _short(text: str, limit: int = _LABEL_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _classify(content: str) -> tuple[str, str]:
+    """Kind of reply a user input asks for, and its label."""
+
+    if content.startswith("!"):
+        return "tool", content[1:]
+    if content.startswith("/apply"):
+        return "edit", "apply diff"
+    if content.lstrip().startswith("{"):
+        try:
+            payload = json.loads(content)
+        except json.JSONDecodeError:
+            return "assistant", "assistant"
+        if isinstance(payload, dict) and payload.get("type") == "tool":
+            tool = str(payload.get("tool", "tool"))
+            detail = payload.get("cmd") or payload.get("name") or " ".join(map(str, payload.get("args", [])))
+            return "tool", f"{tool} {detail}".strip()
+    return "assistant", "assistant"
+
+
+class SessionGraph:
+    """Build and cache the node/edge graph of sessions, one journal delta at a time."""
+
+    def __init__(self, store: SessionStore, cache_dir: str | Path | None = None, slow: float = 30.0) -> None:
+        self.store = store
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else store.root / "graphs"
+        self.slow = slow
+
+    # -- cache files -------------------------------------------------------
+
+    def _paths(self, session_id: str) -> tuple[Path, Path]:
+        return self.cache_dir / f"{session_id}.ndjson", self.cache_dir / f"{session_id}.state.json"
+
+    def _load_state(self, session_id: str) -> dict[str, Any]:
+        items_path, state_path = self._paths(session_id)
+        try:
+            state = json.loads(state_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            state = None
+        if state is None or not items_path.exists() or items_path.stat().st_size != state.get("items_bytes"):
+            items_path.unlink(missing_ok=True)  # torn or missing cache: rebuild
+            state = {"position": 0, "seq": 0, "last": None, "last_ts": None, "pending": None, "diff": None, "files": []}
+        return state
+
+    # -- journal deltas ----------------------------------------------------
+
+    def _new_records(self, session_id: str, state: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        path = self.store.journal_path(session_id)
+        if not path.exists():
+            return
+        if path.suffix == SUFFIXES["binary"]:
+            with BinarySession(path, self.store.blobs) as binary:
+                for i in range(state["position"], len(binary)):
+                    state["position"] = i + 1
+                    yield binary[i]
+            return
+        with path.open("rb") as fh:
+            fh.seek(state["position"])
+            for raw_line in fh:
+                if not raw_line.endswith(b"\n"):
+                    break  # partially written line – next time
+                state["position"] += len(raw_line)
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and "content" in record:
+                    yield record
+
+    def _journal_shrank(self, session_id: str, state: dict[str, Any]) -> bool:
+        path = self.store.journal_path(session_id)
+        if not path.exists():
+            return state["position"] > 0
+        if path.suffix == SUFFIXES["binary"]:
+            return False
+        return path.stat().st_size < state["position"]
+
+    def _derive(self, session_id: str, record: dict[str, Any], state: dict[str, Any]) -> List[Item]:
+        items: List[Item] = []
+        if state["last"] is None:
+            state["last"] = f"session:{session_id}"
+            items.append(("node", {"id": state["last"], "label": session_id[:12], "group": "session"}))
+
+        role = str(record.get("role", ""))
+        content = str(record.get("content", ""))
+        ts = float(record.get("ts", 0.0))
+        tokens = int(record.get("tokens") or 0)
+        node_id = f"{session_id}#{state['seq']}"
+        state["seq"] += 1
+
+        if role == "user":
+            kind, label = "user", _short(content)
+            state["pending"] = _classify(content)
+        elif role == "assistant" and state["pending"]:
+            kind, label = state["pending"]
+            label = _short(label)
+            state["pending"] = None
+        elif role in {"assistant", "system"} and "step" not in record:
+            kind, label = role, role
+        else:
+            kind, label = "agent", _short(str(record.get("step") or role))
+
+        items.append(
+            ("node", {"id": node_id, "label": label, "group": kind, "value": tokens, "title": _short(content, 200), "ts": ts})
+        )
+        dt = ts - state["last_ts"] if state["last_ts"] is not None else 0.0
+        edge = {
+            "from": state["last"],
+            "to": node_id,
+            "value": tokens,
+            "dt": round(dt, 3),
+            "title": f"{dt:.2f}s, {tokens} tokens",
+        }
+        if dt >= self.slow:
+            edge["color"] = {"color": "red"}
+        items.append(("edge", edge))
+
+        if kind == "edit" and not content.startswith("Error"):
+            for path in _DIFF_FILE.findall(state["diff"] or ""):
+                file_id = f"file:{path}"
+                if path not in state["files"]:
+                    state["files"].append(path)
+                    items.append(("node", {"id": file_id, "label": path, "group": "file"}))
+                items.append(("edge", {"from": node_id, "to": file_id, "label": "edit", "dashes": True}))
+        state["diff"] = content if role == "user" and content.startswith("/apply") else None
+        state["last"], state["last_ts"] = node_id, ts
+        return items
+
+    # -- public API --------------------------------------------------------
+
+    def update(self, session_id: str) -> int:
+        """Process journal records added since the last call; return how many."""
+
+        state = self._load_state(session_id)
+        items_path, state_path = self._paths(session_id)
+        if self._journal_shrank(session_id, state):
+            items_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            state = self._load_state(session_id)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        processed = 0
+        with items_path.open("a", encoding="utf-8") as fh:
+            for record in self._new_records(session_id, state):
+                for kind, item in self._derive(session_id, record, state):
+                    fh.write(json.dumps([kind, item], ensure_ascii=False) + "\n")
+                processed += 1
+        state["items_bytes"] = items_path.stat().st_size
+        tmp = state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, state_path)
+        return processed
+
+    def items(self, session_ids: Iterable[str]) -> Iterator[Item]:
+        """Cached items of *session_ids* (call :pymeth:`update` first); shared file nodes once."""
+
+        files: set[str] = set()
+        for session_id in session_ids:
+            items_path, _ = self._paths(session_id)
+            if not items_path.exists():
+                continue
+            with items_path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    kind, item = json.loads(line)
+                    if kind == "node" and item.get("group") == "file":
+                        if item["id"] in files:
+                            continue
+                        files.add(item["id"])
+                    yield kind, item
@@ -0,0 +1,95 @@
+"""Export sessions to the JSON-LD layout of ``resources/templates/session-template.jsonld``.
+
+The document is written incrementally – one message per line – so exporting
+never needs the whole conversation in memory.  ``messages`` is emitted before
+``model`` because the model's ``message_ids`` are only known once every
+message has been seen; until then they are spooled to a temporary file.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import tempfile
+from datetime import datetime, timezone
+from functools import lru_cache
+from importlib.resources import files
+from typing import Any, Iterable, TextIO
+
+__all__ = ["load_template", "write_jsonld"]
+
+_IDS = "\x00message_ids"  # placeholder replaced by the spooled ids
+
+
+@lru_cache(maxsize=1)
+def _template() -> dict[str, Any]:
+    resource = files("ecrivez") / "resources" / "templates" / "session-template.jsonld"
+    return json.loads(resource.read_text(encoding="utf-8"))
+
+
+def load_template() -> dict[str, Any]:
+    """Return a fresh copy of the bundled JSON-LD session template."""
+
+    return copy.deepcopy(_template())
+
+
+def _isoformat(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def write_jsonld(
+    fh: TextIO,
+    session_id: str,
+    records: Iterable[dict[str, Any]],
+    model: str = "",
+    provider: str = "",
+) -> int:
+    """Write *records* as a JSON-LD ``Session`` document to *fh*.
+
+    Returns the number of messages written.
+    """
+
+    doc = load_template()
+    doc["session"]["uuid"] = session_id
+    model_entry = doc["model"][0]
+    model_entry.update(
+        {
+            "name": model,
+            "fullName": model,
+            "provider": {"@type": "Provider", "name": provider},
+            "message_ids": _IDS,
+        }
+    )
+    model_entry.pop("description", None)
+    model_entry.pop("settings", None)
+
+    fh.write("{\n")
+    for key in ("@context", "@type", "session"):
+        fh.write(f"{json.dumps(key)}: {json.dumps(doc[key], ensure_ascii=False)},\n")
+    fh.write('"messages": [\n')
+    count = 0
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as ids:
+        for seq, record in enumerate(records):
+            message_id = f"{session_id}#{seq}"
+            message: dict[str, Any] = {
+                "@type": "Message",
+                "@id": message_id,
+                "role": record["role"],
+                "content": record["content"],
+            }
+            if "ts" in record:
+                message["dateCreated"] = _isoformat(record["ts"])
+            if "tokens" in record:
+                message["tokens"] = record["tokens"]
+            if record["role"] == "assistant":
+                ids.write(json.dumps(message_id, ensure_ascii=False) + "\n")
+            fh.write(("," if count else "") + json.dumps(message, ensure_ascii=False) + "\n")
+            count += 1
+        fh.write("],\n")
+        head, tail = json.dumps(doc["model"], ensure_ascii=False).split(json.dumps(_IDS), 1)
+        fh.write(f'"model": {head}[')
+        ids.seek(0)
+        for index, line in enumerate(ids):
+            fh.write((", " if index else "") + line.rstrip("\n"))
+        fh.write(f"]{tail}\n}}\n")
+    return count
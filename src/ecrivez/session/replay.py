@@ -0,0 +1,210 @@
+"""Deterministic replay of recorded sessions through ``_process_input``.
+
+Each persisted session is split into its leading system messages and its
+turns – a user message and the assistant reply recorded for it.  Replaying re-issues every user turn through
+the regular :func:`ecrivez.chat._process_input` pipeline against a provider of
+choice, while shell commands, JSON tool calls (``python``, ``pytest``,
+``mcp``…) and ``/apply`` are stubbed with what was recorded, so nothing
+touches the machine, an MCP server or a running Neovim.
+
+Sessions are replayed concurrently on a thread pool (turns inside a session
+stay sequential since each depends on the history before it).  The report
+gives throughput, a latency distribution and a diff for every reply that no
+longer matches the recording.
+"""
+
+from __future__ import annotations
+
+import difflib
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Sequence, TypedDict
+
+from ecrivez.chat import BaseProvider, Message, _process_input, _tool_label
+from ecrivez.history import History
+
+__all__ = [
+    "RecordedProvider",
+    "ReplayReport",
+    "TurnResult",
+    "diff_turn",
+    "replay_session",
+    "replay_sessions",
+    "split_session",
+    "split_turns",
+]
+
+_APPLY_ERROR = "Error applying diff: "
+
+
+class TurnResult(TypedDict):
+    session_id: str
+    turn: int
+    user: str
+    recorded: str
+    reply: str
+    latency: float
+
+
+class ReplayReport(TypedDict):
+    sessions: int
+    turns: int
+    elapsed: float
+    turns_per_second: float
+    latency: dict[str, float]
+    mismatches: List[TurnResult]
+
+
+class RecordedProvider(BaseProvider):
+    """Answer every turn with the reply that was recorded for it.
+
+    Replaying with this provider must reproduce the recording exactly, which
+    makes it the baseline for checking the pipeline itself.  It holds the
+    current turn's reply, so use one instance per replayed session.
+    """
+
+    name = "recorded"
+
+    def __init__(self) -> None:
+        self.reply = ""
+
+    def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
+        return self.reply
+
+
+def split_session(records: Iterable[dict[str, Any]]) -> tuple[List[Message], List[tuple[str, str]]]:
+    """``(system, turns)``: the system messages before the first user message,
+    and each user message paired with the assistant reply recorded after it."""
+
+    system: List[Message] = []
+    turns: List[tuple[str, str]] = []
+    for record in records:
+        if record["role"] == "system" and not turns:
+            system.append({"role": "system", "content": record["content"]})
+        elif record["role"] == "user":
+            turns.append((record["content"], ""))
+        elif record["role"] == "assistant" and turns and not turns[-1][1]:
+            turns[-1] = (turns[-1][0], record["content"])
+    return system, turns
+
+
+def split_turns(records: Iterable[dict[str, Any]]) -> List[tuple[str, str]]:
+    """Pair each user message with the assistant reply recorded after it."""
+
+    return split_session(records)[1]
+
+
+def replay_session(
+    session_id: str,
+    turns: List[tuple[str, str]],
+    provider: BaseProvider | None,
+    cfg: dict[str, Any] | None = None,
+    system: Sequence[Message] = (),
+) -> List[TurnResult]:
+    """Replay *turns* sequentially; ``provider=None`` answers from the recording.
+
+    The history starts with the session's *system* messages, so the provider
+    sees the same system prompt as during the recording.
+    """
+
+    if provider is None:
+        provider = RecordedProvider()
+    history = History(system)
+    results: List[TurnResult] = []
+    for i, (user_input, recorded) in enumerate(turns):
+
+        def shell(_cmd: str, _recorded: str = recorded) -> str:
+            return _recorded
+
+        def apply(_project: str, _diff: str, _recorded: str = recorded) -> None:
+            if _recorded.startswith(_APPLY_ERROR):
+                raise RuntimeError(_recorded[len(_APPLY_ERROR) :])
+
+        def run_tool(payload: dict[str, Any], _cfg: Any, _shell: Any, _recorded: str = recorded) -> tuple[str | None, str]:
+            return _tool_label(payload), _recorded
+
+        if isinstance(provider, RecordedProvider):
+            provider.reply = recorded
+        start = time.perf_counter()
+        reply = _process_input(
+            user_input, cfg or {}, provider, history, shell=shell, apply=apply, run_tool=run_tool
+        )
+        results.append(
+            TurnResult(
+                session_id=session_id,
+                turn=i,
+                user=user_input,
+                recorded=recorded,
+                reply=reply,
+                latency=time.perf_counter() - start,
+            )
+        )
+    return results
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted *values*."""
+
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def replay_sessions(
+    sessions: Iterable[tuple[Any, ...]],
+    provider_factory: Callable[[], BaseProvider | None],
+    concurrency: int = 8,
+    repeat: int = 1,
+    cfg: dict[str, Any] | None = None,
+) -> ReplayReport:
+    """Replay *sessions* *repeat* times each.
+
+    Each session is ``(session_id, turns)`` or ``(session_id, turns, system)``
+    with the leading system messages from :func:`split_session`.
+
+    *provider_factory* is called once per replayed session; return a shared
+    instance to exercise one provider from many threads, or ``None`` to
+    answer from the recording.
+    """
+
+    jobs = [(sid, turns, system[0] if system else ()) for sid, turns, *system in sessions for _ in range(repeat)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [
+            pool.submit(replay_session, sid, turns, provider_factory(), cfg, system)
+            for sid, turns, system in jobs
+        ]
+        results = [turn for fut in futures for turn in fut.result()]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r["latency"] for r in results)
+    return ReplayReport(
+        sessions=len(jobs),
+        turns=len(results),
+        elapsed=elapsed,
+        turns_per_second=len(results) / elapsed if elapsed > 0 else 0.0,
+        latency={
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        mismatches=[r for r in results if r["reply"] != r["recorded"]],
+    )
+
+
+def diff_turn(result: TurnResult, context: int = 2) -> str:
+    """Unified diff between the recorded and the replayed reply of a turn."""
+
+    return "\n".join(
+        difflib.unified_diff(
+            result["recorded"].splitlines(),
+            result["reply"].splitlines(),
+            fromfile=f"{result['session_id']}#{result['turn']} recorded",
+            tofile=f"{result['session_id']}#{result['turn']} replayed",
+            lineterm="",
+            n=context,
+        )
+    )
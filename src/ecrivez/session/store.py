@@ -0,0 +1,397 @@
+"""Persistent session journals plus a SQLite/FTS5 index over their messages.
+
+Every REPL session is appended, one JSON object per line, to
+``.ecrivez/sessions/<session_id>.jsonl``.  Each record carries the usual
+``role`` / ``content`` pair plus a ``ts`` (epoch seconds) and ``tokens``
+field.  With ``fmt="binary"`` new sessions are written as
+``<session_id>.ecz`` instead (see :pymod:`ecrivez.session.binary`); both
+formats can coexist in the same directory.
+
+The journals stay the source of truth; ``index.sqlite`` next to them is a
+disposable index that can always be rebuilt with :pymeth:`SessionStore.sync`.
+The index remembers how much of each journal it has already consumed (bytes
+for JSONL, records for binary files), so syncing only parses new entries.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, TypedDict
+
+from ecrivez.session.binary import BinaryJournal, BinarySession
+from ecrivez.session.blobs import BlobStore
+from ecrivez.tokens import count_tokens
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ecrivez.chat import Message
+
+__all__ = ["SESSIONS_DIR", "SearchHit", "SessionInfo", "SessionStore"]
+
+SESSIONS_DIR = Path(".ecrivez") / "sessions"
+INDEX_NAME = "index.sqlite"
+SUFFIXES = {"jsonl": ".jsonl", "binary": ".ecz"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id            TEXT PRIMARY KEY,
+    model         TEXT NOT NULL DEFAULT '',
+    provider      TEXT NOT NULL DEFAULT '',
+    started_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    n_messages    INTEGER NOT NULL DEFAULT 0,
+    tokens        INTEGER NOT NULL DEFAULT 0,
+    indexed_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id         INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    seq        INTEGER NOT NULL,
+    role       TEXT NOT NULL,
+    ts         REAL NOT NULL,
+    tokens     INTEGER NOT NULL,
+    content    TEXT NOT NULL,
+    UNIQUE (session_id, seq)
+);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages(ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+class SessionInfo(TypedDict):
+    id: str
+    model: str
+    provider: str
+    started_at: float
+    updated_at: float
+    n_messages: int
+    tokens: int
+
+
+class SearchHit(TypedDict):
+    session_id: str
+    seq: int
+    role: str
+    ts: float
+    snippet: str
+
+
+def _fts_query(query: str) -> str:
+    """Quote every whitespace-separated term so user input is never FTS syntax."""
+
+    terms = [t.replace('"', '""') for t in query.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+
+class SessionStore:
+    """Append-only session journals with a full-text index."""
+
+    def __init__(self, root: str | Path | None = None, fmt: str = "jsonl") -> None:
+        if fmt not in SUFFIXES:
+            raise ValueError(f"Unknown session format: {fmt!r}")
+        self.root = Path(root) if root is not None else SESSIONS_DIR
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.blobs = BlobStore(self.root / "blobs")
+        # not bound to the creating thread: the session server writes from its
+        # I/O worker (callers serialise access)
+        self._db = sqlite3.connect(self.root / INDEX_NAME, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def journal_path(self, session_id: str) -> Path:
+        """Existing journal of *session_id*, or where a new one would go."""
+
+        for suffix in SUFFIXES.values():
+            path = self.root / f"{session_id}{suffix}"
+            if path.exists():
+                return path
+        return self.root / f"{session_id}{SUFFIXES[self.fmt]}"
+
+    def open_session(self, session_id: str, model: str = "", provider: str = "") -> None:
+        """Register *session_id* (or refresh its model / provider if known)."""
+
+        now = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT INTO sessions (id, model, provider, started_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                "model = excluded.model, provider = excluded.provider",
+                (session_id, model, provider, now, now),
+            )
+
+    def append(self, session_id: str, messages: Iterable[Message]) -> None:
+        """Append *messages* to the session journal and index them."""
+
+        now = time.time()
+        records = [
+            {
+                "role": m["role"],
+                "content": m["content"],
+                "ts": m.get("ts", now),  # type: ignore[typeddict-item]
+                "tokens": m.get("tokens") or count_tokens(m["content"]),  # type: ignore[typeddict-item]
+            }
+            for m in messages
+        ]
+        if not records:
+            return
+        path = self.journal_path(session_id)
+        # Index whatever an external writer may have added before our lines.
+        self._sync_journal(session_id, path)
+        if path.suffix == SUFFIXES["binary"]:
+            BinaryJournal(path, self.blobs).append(records)
+            position = 0
+        else:
+            with path.open("a", encoding="utf-8") as fh:
+                for record in records:
+                    fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+            position = path.stat().st_size
+        with self._db:
+            self._index_records(session_id, records, position)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def iter_records(self, session_id: str) -> Iterator[dict[str, Any]]:
+        """Yield the raw journal records of *session_id* (skipping bad lines)."""
+
+        path = self.journal_path(session_id)
+        if not path.exists():
+            return
+        if path.suffix == SUFFIXES["binary"]:
+            with BinarySession(path, self.blobs) as binary:
+                yield from binary
+            return
+        with path.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and "role" in record and "content" in record:
+                    yield record
+
+    def load(self, session_id: str) -> List[Message]:
+        """Return the conversation of *session_id* as plain ``Message`` dicts."""
+
+        return [
+            {"role": r["role"], "content": r["content"]}
+            for r in self.iter_records(session_id)
+        ]
+
+    def tail(self, session_id: str, n: int) -> List[dict[str, Any]]:
+        """Return the last *n* records; binary journals decode only those."""
+
+        path = self.journal_path(session_id)
+        if path.suffix == SUFFIXES["binary"] and path.exists():
+            with BinarySession(path, self.blobs) as binary:
+                return binary.tail(n)
+        return list(deque(self.iter_records(session_id), maxlen=n)) if n > 0 else []
+
+    def open_binary(self, session_id: str) -> BinarySession:
+        """Memory-map a binary session for lazy, random access (caller closes)."""
+
+        path = self.journal_path(session_id)
+        if path.suffix != SUFFIXES["binary"]:
+            raise ValueError(f"Session {session_id} is not stored in binary format")
+        return BinarySession(path, self.blobs)
+
+    def session_info(self, session_id: str) -> SessionInfo:
+        row = self._db.execute(
+            "SELECT id, model, provider, started_at, updated_at, n_messages, tokens "
+            "FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No session {session_id!r}")
+        return SessionInfo(**dict(row))  # type: ignore[typeddict-item]
+
+    def resolve(self, prefix: str) -> str:
+        """Expand a (unique) session id prefix to the full id."""
+
+        rows = self._db.execute(
+            "SELECT id FROM sessions WHERE id LIKE ? ESCAPE '\\' LIMIT 2",
+            (prefix.replace("%", r"\%").replace("_", r"\_") + "%",),
+        ).fetchall()
+        if not rows:
+            raise KeyError(f"No session matching {prefix!r}")
+        if len(rows) > 1:
+            raise KeyError(f"Session prefix {prefix!r} is ambiguous")
+        return rows[0]["id"]
+
+    def list_sessions(self, limit: int = 50) -> List[SessionInfo]:
+        rows = self._db.execute(
+            "SELECT id, model, provider, started_at, updated_at, n_messages, tokens "
+            "FROM sessions ORDER BY updated_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [SessionInfo(**dict(row)) for row in rows]  # type: ignore[typeddict-item]
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        role: str | None = None,
+        session_id: str | None = None,
+        since: float | None = None,
+        raw: bool = False,
+    ) -> List[SearchHit]:
+        """Full-text search over every indexed message, best matches first.
+
+        Unless *raw* is true the query terms are quoted, so input such as
+        ``git push --force`` is matched literally instead of being parsed as
+        FTS5 syntax.
+        """
+
+        sql = [
+            "SELECT m.session_id, m.seq, m.role, m.ts, "
+            "snippet(messages_fts, 0, '[', ']', '…', 16) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ?"
+        ]
+        params: list[Any] = [query if raw else _fts_query(query)]
+        if role is not None:
+            sql.append("AND m.role = ?")
+            params.append(role)
+        if session_id is not None:
+            sql.append("AND m.session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            sql.append("AND m.ts >= ?")
+            params.append(since)
+        sql.append("ORDER BY rank LIMIT ?")
+        params.append(limit)
+        rows = self._db.execute(" ".join(sql), params).fetchall()
+        return [SearchHit(**dict(row)) for row in rows]  # type: ignore[typeddict-item]
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def sync(self) -> int:
+        """Index journals written or extended outside this store.
+
+        Returns the number of newly indexed messages.
+        """
+
+        added = 0
+        for suffix in SUFFIXES.values():
+            for path in sorted(self.root.glob(f"*{suffix}")):
+                added += self._sync_journal(path.stem, path)
+        return added
+
+    def _sync_journal(self, session_id: str, path: Path) -> int:
+        if not path.exists():
+            return 0
+        if path.suffix == SUFFIXES["binary"]:
+            return self._sync_binary(session_id, path)
+        row = self._db.execute(
+            "SELECT indexed_bytes FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        offset = row["indexed_bytes"] if row else 0
+        stat = path.stat()
+        if stat.st_size <= offset:
+            return 0
+
+        records = []
+        with path.open("rb") as fh:
+            fh.seek(offset)
+            for raw_line in fh:
+                if not raw_line.endswith(b"\n"):
+                    break  # partially written line – pick it up next time
+                offset += len(raw_line)
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(record, dict) or "content" not in record:
+                    continue
+                content = str(record["content"])
+                records.append(
+                    {
+                        "role": str(record.get("role", "")),
+                        "content": content,
+                        "ts": float(record.get("ts", stat.st_mtime)),
+                        "tokens": int(record.get("tokens") or count_tokens(content)),
+                    }
+                )
+
+        with self._db:
+            self._index_records(session_id, records, offset)
+        return len(records)
+
+    def _sync_binary(self, session_id: str, path: Path) -> int:
+        row = self._db.execute(
+            "SELECT n_messages FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        done = row["n_messages"] if row else 0
+        with BinarySession(path, self.blobs) as binary:
+            if len(binary) <= done:
+                return 0
+            records = [binary[i] for i in range(done, len(binary))]
+        with self._db:
+            self._index_records(session_id, records, 0)
+        return len(records)
+
+    def _index_records(
+        self, session_id: str, records: List[dict[str, Any]], indexed_bytes: int
+    ) -> None:
+        """Insert *records* for *session_id*; caller owns the transaction."""
+
+        (seq,) = self._db.execute(
+            "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        self._db.executemany(
+            "INSERT INTO messages (session_id, seq, role, ts, tokens, content) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (session_id, seq + i, r["role"], r["ts"], r["tokens"], r["content"])
+                for i, r in enumerate(records)
+            ],
+        )
+        last_ts = max((r["ts"] for r in records), default=None)
+        self._db.execute(
+            "INSERT INTO sessions (id, started_at, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO NOTHING",
+            (session_id, last_ts or time.time(), last_ts or time.time()),
+        )
+        self._db.execute(
+            "UPDATE sessions SET n_messages = n_messages + ?, tokens = tokens + ?, "
+            "updated_at = MAX(updated_at, COALESCE(?, updated_at)), indexed_bytes = ? "
+            "WHERE id = ?",
+            (
+                len(records),
+                sum(r["tokens"] for r in records),
+                last_ts,
+                indexed_bytes,
+                session_id,
+            ),
+        )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> SessionStore:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,37 @@
+"""Cheap token counting shared by the session store and providers.
+
+``tiktoken`` is used when it happens to be installed; otherwise we fall back
+to the usual *~4 characters per token* heuristic.  The numbers are only used
+for accounting and display, so an approximation is perfectly acceptable.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+__all__ = ["count_tokens"]
+
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):  # noqa: ANN202 – tiktoken type is optional
+    try:
+        import tiktoken  # type: ignore  # noqa: WPS433
+    except ModuleNotFoundError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Return the (approximate) number of tokens in *text* for *model*."""
+
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return max(1, (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
@@ -0,0 +1,154 @@
+"""Tool calls parsed out of streamed model output and run while it streams.
+
+Until now only the *user* could invoke tools, by typing a JSON object.  With
+``model_tools`` enabled the model may emit the very same objects in its
+reply, e.g. ``{"type": "tool", "tool": "shell", "cmd": "ls"}``.
+:class:`ToolCallParser` consumes completion deltas character by character –
+tracking brace depth, strings and escapes – and returns every top-level
+object the moment its closing brace arrives; :func:`stream_tool_calls`
+hands each one to a worker thread immediately, so tool latency overlaps with
+the rest of the generation instead of being added after it.  Calls run one
+after another in the order the model wrote them (``cd`` before ``ls``, a
+write before ``pytest``); a call marked ``"parallel": true`` opts out and
+runs concurrently with the others.
+
+Braces in prose are tolerated: an object candidate whose first significant
+character is not ``"`` or ``}`` is abandoned and treated as text, and
+objects that are not valid JSON or lack ``"type": "tool"`` stay text too.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, TypedDict
+
+__all__ = ["StreamedReply", "ToolCall", "ToolCallParser", "stream_tool_calls"]
+
+
+class ToolCall(TypedDict):
+    call: dict[str, Any]
+    result: str
+    dispatched: float  # seconds since the stream started
+    finished: float
+
+
+class StreamedReply(TypedDict):
+    text: str  # the reply without the tool-call objects
+    calls: List[ToolCall]
+    duration: float
+
+
+class ToolCallParser:
+    """Incremental scanner returning tool-call objects as soon as they close."""
+
+    __slots__ = ("_text", "_obj", "_depth", "_in_string", "_escape", "_opened")
+
+    def __init__(self) -> None:
+        self._text: List[str] = []
+        self._obj: List[str] = []  # characters of the object being scanned
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._opened = False  # seen the first significant char after "{"
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text)
+
+    def _abandon(self) -> None:
+        self._text.extend(self._obj)
+        self._obj, self._depth, self._in_string, self._escape = [], 0, False, False
+
+    def feed(self, delta: str) -> List[dict[str, Any]]:
+        """Consume *delta*; return the tool calls completed by it."""
+
+        calls: List[dict[str, Any]] = []
+        for ch in delta:
+            if self._depth == 0:
+                if ch == "{":
+                    self._obj, self._depth, self._opened = [ch], 1, False
+                else:
+                    self._text.append(ch)
+                continue
+            self._obj.append(ch)
+            if not self._opened and self._depth == 1 and not ch.isspace():
+                self._opened = True
+                if ch not in '"}':
+                    self._abandon()  # "{x}" in prose, not JSON
+                    continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._obj)
+                    try:
+                        payload = json.loads(raw)
+                    except json.JSONDecodeError:
+                        payload = None
+                    if isinstance(payload, dict) and payload.get("type") == "tool":
+                        calls.append(payload)
+                        self._obj = []
+                    else:
+                        self._abandon()
+        return calls
+
+    def close(self) -> None:
+        """End of stream: an unterminated object is plain text."""
+
+        if self._depth:
+            self._abandon()
+
+
+def stream_tool_calls(
+    deltas: Iterable[str],
+    execute: Callable[[dict[str, Any]], str],
+    max_workers: int = 4,
+    on_text: Callable[[str], None] | None = None,
+) -> StreamedReply:
+    """Consume *deltas*, running each tool call with *execute* as soon as it closes.
+
+    Calls are executed in order on a single worker, except those with
+    ``"parallel": true``, which use a pool of *max_workers* threads.  Results
+    are returned in the order the calls appeared.  *on_text* receives each
+    delta as it arrives (for live display).
+    """
+
+    started = time.perf_counter()
+    parser = ToolCallParser()
+    pending: List[tuple[dict[str, Any], float, Future[tuple[str, float]]]] = []
+
+    def run(call: dict[str, Any]) -> tuple[str, float]:
+        try:
+            result = execute(call)
+        except Exception as exc:  # noqa: BLE001 – reported to the model like any result
+            result = f"Error: {exc}"
+        return result, time.perf_counter() - started
+
+    with (
+        ThreadPoolExecutor(max_workers=1, thread_name_prefix="ecrivez-toolcall") as ordered,
+        ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ecrivez-toolcall-parallel") as parallel,
+    ):
+        for delta in deltas:
+            if on_text is not None:
+                on_text(delta)
+            for call in parser.feed(delta):
+                pool = parallel if call.get("parallel") is True else ordered
+                pending.append((call, time.perf_counter() - started, pool.submit(run, call)))
+        parser.close()
+        calls: List[ToolCall] = []
+        for call, dispatched, future in pending:
+            result, finished = future.result()
+            calls.append({"call": call, "result": result, "dispatched": dispatched, "finished": finished})
+    return {"text": parser.text, "calls": calls, "duration": time.perf_counter() - started}
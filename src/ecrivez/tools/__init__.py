@@ -1,8 +1,20 @@
 """Built-in helper tools for Ecrivez.
 
-Currently includes only *run_shell* – a thin wrapper around subprocess that is
-handy during experiments.  **Do not** expose this to untrusted input in
-production.
+*run_shell* is a thin wrapper around subprocess that is handy during
+experiments.  **Do not** expose this to untrusted input in production.
+
+Heavier tools live in submodules and are imported lazily by their callers:
+
+* :pymod:`ecrivez.tools.testloop` – warm pytest worker with affected-test
+  selection (JSON tool ``{"type": "tool", "tool": "pytest"}``).
+* :pymod:`ecrivez.tools.patch` – headless, atomic multi-file unified-diff
+  application (``/apply`` and ``ecrivez patch``).
+* :pymod:`ecrivez.tools.candidates` – best-of-N candidate patches tested
+  concurrently in git worktrees (``ecrivez best-of``).
+* :pymod:`ecrivez.tools.kernel` – persistent per-session Jupyter kernel
+  (JSON tool ``{"type": "tool", "tool": "python", "code": …}``).
+* :pymod:`ecrivez.tools.shell` – persistent bash session per chat session
+  (``!cmd`` when ``persistent_shell`` is enabled).
 """
 
 from __future__ import annotations
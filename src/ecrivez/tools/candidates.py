@@ -0,0 +1,213 @@
+"""Best-of-N candidate implementations, tested concurrently in git worktrees.
+
+:func:`best_of` asks the provider for *n* candidate patches in parallel
+(the ``--nb_samples`` idea of the ``p3`` alias in ``config/config.py``).
+As soon as a reply arrives it gets its own detached ``git worktree`` of the
+current state of the project – ``git stash create`` captures uncommitted
+changes to tracked files – and the candidate is applied there with
+:func:`ecrivez.tools.patch.apply_patch` and tested on a process pool:
+
+* the first candidate whose test command exits 0 wins; its patch is applied
+  to the real working tree (unless ``apply=False``);
+* queued evaluations are cancelled and running test commands are killed
+  (each runs in its own process group), so the time to a green build is set
+  by the fastest good candidate, not by sequential retries;
+* all worktrees are removed afterwards.
+
+Candidates are plain unified diffs, optionally inside a fenced block.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, List, Optional, TypedDict
+
+__all__ = ["BestOfResult", "Candidate", "CandidateError", "best_of", "extract_diff"]
+
+_FENCE = re.compile(r"```(?:diff|patch)?[^\n]*\n(.*?)```", re.DOTALL)
+
+SYSTEM_PROMPT = (
+    "You implement changes to a git repository. Reply with a single unified diff "
+    "(--- a/path, +++ b/path headers, paths relative to the repository root) and nothing else."
+)
+
+
+class CandidateError(RuntimeError):
+    """The repository cannot host candidates (not a git repo, no commit…)."""
+
+
+class Candidate(TypedDict):
+    index: int
+    status: str  # "passed" | "failed" | "invalid" | "cancelled" | "error"
+    returncode: Optional[int]
+    output: str
+    generate_time: float
+    test_time: float
+    diff: str
+
+
+class BestOfResult(TypedDict):
+    winner: Optional[int]
+    candidates: List[Candidate]
+    duration: float
+
+
+def extract_diff(reply: str) -> str:
+    """The unified diff in *reply*: the first fenced block if any, else the reply."""
+
+    match = _FENCE.search(reply)
+    return (match.group(1) if match else reply).strip("\n") + "\n"
+
+
+def _git(root: Path, *args: str) -> str:
+    proc = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise CandidateError(f"git {' '.join(args)}: {proc.stderr.strip()}")
+    return proc.stdout.strip()
+
+
+def _evaluate(worktree: str, diff: str, test_cmd: str, timeout: float | None, pid_file: str) -> dict[str, Any]:
+    """Apply *diff* in *worktree* and run *test_cmd* there (process-pool worker)."""
+
+    from ecrivez.tools.patch import PatchError, apply_patch
+
+    started = time.perf_counter()
+    try:
+        apply_patch(diff, root=worktree)
+    except PatchError as exc:
+        return {"status": "invalid", "returncode": None, "output": str(exc), "test_time": 0.0}
+    proc = subprocess.Popen(  # noqa: S602 – user-configured test command
+        test_cmd,
+        shell=True,
+        cwd=worktree,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        start_new_session=True,  # own process group: the parent may kill it
+    )
+    Path(pid_file).write_text(str(proc.pid))
+    try:
+        output, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        output, _ = proc.communicate()
+        output += f"\n[timed out after {timeout}s]"
+    return {
+        "status": "passed" if proc.returncode == 0 else "failed",
+        "returncode": proc.returncode,
+        "output": output,
+        "test_time": time.perf_counter() - started,
+    }
+
+
+def best_of(
+    provider: Any,
+    task: str,
+    n: int = 4,
+    test_cmd: str = "python -m pytest -q",
+    root: str | Path = ".",
+    workers: int | None = None,
+    timeout: float | None = 600.0,
+    apply: bool = True,
+) -> BestOfResult:
+    """Generate *n* candidates for *task* and keep the first whose tests pass."""
+
+    started = time.perf_counter()
+    root = Path(_git(Path(root), "rev-parse", "--show-toplevel"))
+    base = _git(root, "stash", "create") or _git(root, "rev-parse", "HEAD")
+    run_dir = root / ".ecrivez" / "worktrees" / uuid.uuid4().hex[:8]
+    run_dir.mkdir(parents=True)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": task}]
+
+    candidates: dict[int, Candidate] = {}
+    worktrees: List[Path] = []
+    winner: Optional[int] = None
+    generate = ThreadPoolExecutor(max_workers=n, thread_name_prefix="ecrivez-candidate")
+    evaluate = ProcessPoolExecutor(max_workers=workers or min(n, os.cpu_count() or 1), mp_context=get_context("spawn"))
+    generating: dict[Future[str], int] = {generate.submit(provider.chat_completion, messages): i for i in range(n)}
+    testing: dict[Future[dict[str, Any]], int] = {}
+    try:
+        pending: set[Future[Any]] = set(generating)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in generating:
+                    index = generating[future]
+                    candidate: Candidate = {
+                        "index": index,
+                        "status": "error",
+                        "returncode": None,
+                        "output": "",
+                        "generate_time": time.perf_counter() - started,
+                        "test_time": 0.0,
+                        "diff": "",
+                    }
+                    candidates[index] = candidate
+                    try:
+                        candidate["diff"] = extract_diff(future.result())
+                    except Exception as exc:  # noqa: BLE001 – one bad sample is not fatal
+                        candidate["output"] = f"provider error: {exc}"
+                        continue
+                    worktree = run_dir / str(index)
+                    _git(root, "worktree", "add", "--detach", str(worktree), base)
+                    worktrees.append(worktree)
+                    test = evaluate.submit(
+                        _evaluate, str(worktree), candidate["diff"], test_cmd, timeout, str(run_dir / f"{index}.pid")
+                    )
+                    testing[test] = index
+                    pending.add(test)
+                else:
+                    candidate = candidates[testing[future]]
+                    try:
+                        candidate.update(future.result())  # type: ignore[typeddict-item]
+                    except Exception as exc:  # noqa: BLE001
+                        candidate["output"] = f"evaluation error: {exc}"
+                    if candidate["status"] == "passed" and winner is None:
+                        winner = candidate["index"]
+        # cancel the rest: queued tests never start, running ones are killed
+        for future, index in testing.items():
+            if future.done():
+                continue
+            candidates[index]["status"] = "cancelled"
+            if not future.cancel():
+                pid_file = run_dir / f"{index}.pid"
+                try:
+                    os.killpg(int(pid_file.read_text()), signal.SIGKILL)
+                except (OSError, ValueError):
+                    pass  # not started yet or already gone
+        for index in set(range(n)) - set(candidates):
+            candidates[index] = {
+                "index": index,
+                "status": "cancelled",
+                "returncode": None,
+                "output": "",
+                "generate_time": time.perf_counter() - started,
+                "test_time": 0.0,
+                "diff": "",
+            }
+    finally:
+        generate.shutdown(wait=False, cancel_futures=True)
+        evaluate.shutdown(wait=True, cancel_futures=True)
+        for worktree in worktrees:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=root, capture_output=True)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        subprocess.run(["git", "worktree", "prune"], cwd=root, capture_output=True)
+
+    if winner is not None and apply:
+        from ecrivez.tools.patch import apply_patch
+
+        apply_patch(candidates[winner]["diff"], root=root)
+    return {
+        "winner": winner,
+        "candidates": [candidates[i] for i in sorted(candidates)],
+        "duration": time.perf_counter() - started,
+    }
@@ -0,0 +1,217 @@
+"""Persistent Python execution through a long-lived Jupyter kernel.
+
+``run_shell("python -c …")`` starts a fresh interpreter and re-imports
+pandas/numpy on every call.  :class:`PythonKernel` keeps one ``ipykernel``
+process per session (``ipykernel``/``jupyter_client`` are dependencies of
+ecrivez), so variables and imports survive between snippets and a second
+analysis step runs in milliseconds.
+
+* :pymeth:`PythonKernel.execute` streams ``stdout``/``stderr``, results and
+  tracebacks to an optional callback while collecting them;
+* a snippet running longer than its *timeout* is interrupted (``KeyboardInterrupt``
+  in the kernel – state is kept), whether or not it is printing; if the
+  kernel does not come back it is restarted;
+* only the last :data:`MAX_OUTPUT` characters of output are kept (the
+  callback still sees everything);
+* a crashed kernel (segfault, ``os._exit``…) is restarted transparently and
+  the result says that the state was lost.
+
+The chat exposes it as the JSON tool ``{"type": "tool", "tool": "python",
+"code": "…"}``; :func:`get_kernel` returns the kernel of a session.
+"""
+
+from __future__ import annotations
+
+import atexit
+import queue
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypedDict
+
+__all__ = ["ExecResult", "PythonKernel", "close_kernel", "get_kernel", "shutdown_kernels"]
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+_POLL = 0.05
+_GRACE = 5.0  # seconds an interrupted kernel gets before it is restarted
+MAX_OUTPUT = 1 << 20  # characters of output kept per snippet (the tail)
+
+
+class ExecResult(TypedDict):
+    status: str  # "ok" | "error" | "timeout" | "restarted"
+    output: str
+    execution_count: Optional[int]
+    duration: float
+
+
+class PythonKernel:
+    """One IPython kernel with state kept between :pymeth:`execute` calls."""
+
+    def __init__(self, kernel_name: str = "python3", cwd: str | None = None, startup_timeout: float = 60.0) -> None:
+        self.kernel_name = kernel_name
+        self.cwd = cwd
+        self.startup_timeout = startup_timeout
+        self.restarts = 0
+        self._manager: Any = None
+        self._client: Any = None
+        self._lock = threading.Lock()  # one snippet at a time
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        from jupyter_client.manager import KernelManager
+
+        self._manager = KernelManager(kernel_name=self.kernel_name)
+        self._manager.start_kernel(**({"cwd": self.cwd} if self.cwd else {}))
+        self._client = self._manager.blocking_client()
+        self._client.start_channels()
+        self._client.wait_for_ready(timeout=self.startup_timeout)
+
+    @property
+    def alive(self) -> bool:
+        return self._manager is not None and self._manager.is_alive()
+
+    def restart(self) -> None:
+        """Start a fresh kernel (all state is lost)."""
+
+        self.shutdown()
+        self.start()
+        self.restarts += 1
+
+    def interrupt(self) -> None:
+        if self._manager is not None:
+            self._manager.interrupt_kernel()
+
+    def shutdown(self) -> None:
+        if self._client is not None:
+            self._client.stop_channels()
+            self._client = None
+        if self._manager is not None:
+            if self._manager.has_kernel:
+                self._manager.shutdown_kernel(now=True)
+            self._manager = None
+
+    # -- execution ---------------------------------------------------------
+
+    def execute(
+        self,
+        code: str,
+        timeout: float | None = 60.0,
+        on_output: Callable[[str], None] | None = None,
+    ) -> ExecResult:
+        """Run *code*; output chunks are passed to *on_output* as they arrive."""
+
+        with self._lock:
+            started = time.perf_counter()
+            if self._manager is None:
+                self.start()
+            elif not self.alive:
+                self.restart()
+            parts: List[str] = []
+            size = dropped = 0
+
+            def emit(text: str) -> None:
+                nonlocal size, dropped
+                if not text:
+                    return
+                parts.append(text)
+                size += len(text)
+                if on_output is not None:
+                    on_output(text)
+                if size > 2 * MAX_OUTPUT:  # compact now and then, not per chunk
+                    joined = "".join(parts)
+                    dropped += len(joined) - MAX_OUTPUT
+                    parts[:] = [joined[-MAX_OUTPUT:]]
+                    size = MAX_OUTPUT
+
+            msg_id = self._client.execute(code, allow_stdin=False)
+            deadline = None if timeout is None else started + timeout
+            status, count = "ok", None
+            interrupted_at: Optional[float] = None
+            while True:
+                # checked on every message too: a snippet that keeps printing
+                # never leaves the queue empty
+                now = time.perf_counter()
+                if deadline is not None and now > deadline and interrupted_at is None:
+                    self.interrupt()
+                    interrupted_at = now
+                    status = "timeout"
+                elif interrupted_at is not None and now - interrupted_at > _GRACE:
+                    emit("\n[kernel did not respond to interrupt – restarted, state was lost]\n")
+                    self.restart()
+                    break
+                try:
+                    msg = self._client.get_iopub_msg(timeout=_POLL)
+                except queue.Empty:
+                    if not self.alive:
+                        emit("\n[kernel died – restarted, state was lost]\n")
+                        self.restart()
+                        status = "restarted"
+                        break
+                    continue
+                if msg["parent_header"].get("msg_id") != msg_id:
+                    continue
+                kind, content = msg["msg_type"], msg["content"]
+                if kind == "stream":
+                    emit(content["text"])
+                elif kind in {"execute_result", "display_data"}:
+                    emit(content["data"].get("text/plain", "") + "\n")
+                    count = content.get("execution_count", count)
+                elif kind == "execute_input":
+                    count = content.get("execution_count")
+                elif kind == "error":
+                    if status != "timeout":
+                        status = "error"
+                    emit(_ANSI.sub("", "\n".join(content["traceback"])) + "\n")
+                elif kind == "status" and content["execution_state"] == "idle":
+                    break
+            if status == "timeout":
+                emit(f"[interrupted after {timeout}s]\n")
+            output = "".join(parts)
+            if len(output) > MAX_OUTPUT:
+                dropped += len(output) - MAX_OUTPUT
+                output = output[-MAX_OUTPUT:]
+            if dropped:
+                output = f"[{dropped} characters truncated]\n" + output
+            return {
+                "status": status,
+                "output": output,
+                "execution_count": count,
+                "duration": time.perf_counter() - started,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Per-session kernels
+# ---------------------------------------------------------------------------
+
+_KERNELS: Dict[str, PythonKernel] = {}
+_KERNELS_LOCK = threading.Lock()
+
+
+def get_kernel(session: str = "default") -> PythonKernel:
+    """The (lazily started) kernel of *session*; all are shut down at exit."""
+
+    with _KERNELS_LOCK:
+        kernel = _KERNELS.get(session)
+        if kernel is None:
+            if not _KERNELS:
+                atexit.register(shutdown_kernels)
+            kernel = _KERNELS[session] = PythonKernel()
+        return kernel
+
+
+def close_kernel(session: str) -> None:
+    """Shut down the kernel of *session*, if it has one (e.g. when the session ends)."""
+
+    with _KERNELS_LOCK:
+        kernel = _KERNELS.pop(session, None)
+    if kernel is not None:
+        kernel.shutdown()
+
+
+def shutdown_kernels() -> None:
+    with _KERNELS_LOCK:
+        for kernel in _KERNELS.values():
+            kernel.shutdown()
+        _KERNELS.clear()
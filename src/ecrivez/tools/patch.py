@@ -0,0 +1,344 @@
+"""Headless multi-file unified-diff application.
+
+``/apply`` used to go through :func:`ecrivez.nvim_api.apply_diff`, which
+edits the current Neovim buffer only.  :func:`apply_patch` needs no editor
+and handles ``git diff``/``diff -u`` output touching any number of files:
+
+1. :func:`parse_patch` splits the text into per-file hunks (new and deleted
+   files via ``/dev/null`` included);
+2. every target is read through :pymod:`mmap` and its hunks are applied in a
+   thread pool – context lines must match exactly, but a hunk may have moved
+   by any number of lines (the nearest match wins, like ``patch``);
+3. only if *all* files patch cleanly, each result is written to a temporary
+   file next to its target, then the targets are swapped in with
+   ``os.replace``.  Should any step of the commit fail, already replaced
+   files are restored from their backups, so a patch is applied completely
+   or not at all.
+
+When a Neovim instance is passed, buffers showing a changed file are
+reloaded from disk afterwards.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, TypedDict
+
+__all__ = [
+    "FilePatch",
+    "Hunk",
+    "PatchError",
+    "PatchResult",
+    "apply_patch",
+    "parse_patch",
+    "reload_buffers",
+]
+
+_HUNK = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_DEV_NULL = "/dev/null"
+
+
+class PatchError(RuntimeError):
+    """The patch is malformed or does not apply; nothing was written."""
+
+
+class Hunk(TypedDict):
+    old_start: int  # 1-based, as in the header
+    lines: List[str]  # " ctx", "-old", "+new" (without line endings)
+    no_newline_old: bool  # "\ No newline at end of file" after the old side
+    no_newline_new: bool
+
+
+class FilePatch(TypedDict):
+    old_path: Optional[str]  # None for new files
+    new_path: Optional[str]  # None for deleted files
+    hunks: List[Hunk]
+
+
+class PatchResult(TypedDict):
+    files: List[str]
+    created: List[str]
+    deleted: List[str]
+    renamed: List[tuple[str, str]]  # (old path, new path)
+    hunks: int
+    duration: float
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+
+def _header_path(line: str) -> Optional[str]:
+    path = line[4:].split("\t", 1)[0].strip()
+    if path == _DEV_NULL:
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def parse_patch(text: str) -> List[FilePatch]:
+    """Parse unified diff *text* into one :class:`FilePatch` per file."""
+
+    patches: List[FilePatch] = []
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not (line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")):
+            i += 1  # "diff --git", "index …" and other noise
+            continue
+        patch: FilePatch = {
+            "old_path": _header_path(line),
+            "new_path": _header_path(lines[i + 1]),
+            "hunks": [],
+        }
+        i += 2
+        while i < len(lines) and lines[i].startswith("@@"):
+            match = _HUNK.match(lines[i])
+            if match is None:
+                raise PatchError(f"malformed hunk header: {lines[i]!r}")
+            old_len = int(match.group(2) or 1)
+            new_len = int(match.group(4) or 1)
+            hunk: Hunk = {
+                "old_start": int(match.group(1)),
+                "lines": [],
+                "no_newline_old": False,
+                "no_newline_new": False,
+            }
+            i += 1
+            old_seen = new_seen = 0
+            while i < len(lines) and (old_seen < old_len or new_seen < new_len or lines[i].startswith("\\")):
+                body = lines[i]
+                if body.startswith("\\"):
+                    last = hunk["lines"][-1][:1] if hunk["lines"] else " "
+                    if last in " -":
+                        hunk["no_newline_old"] = True
+                    if last in " +":
+                        hunk["no_newline_new"] = True
+                    i += 1
+                    continue
+                tag = body[:1] or " "  # some tools strip the space of empty context lines
+                if tag not in " -+":
+                    raise PatchError(f"unexpected line in hunk: {body!r}")
+                old_seen += tag != "+"
+                new_seen += tag != "-"
+                hunk["lines"].append(tag + body[1:])
+                i += 1
+            if old_seen != old_len or new_seen != new_len:
+                raise PatchError(f"truncated hunk in {patch['new_path'] or patch['old_path']}")
+            patch["hunks"].append(hunk)
+        patches.append(patch)
+    if not patches:
+        raise PatchError("no file headers (---/+++) found in patch")
+    return patches
+
+
+# ---------------------------------------------------------------------------
+# Applying (in memory)
+# ---------------------------------------------------------------------------
+
+
+def _read(path: Path) -> bytes:
+    """Contents of *path*, mapped rather than read through a buffer."""
+
+    with path.open("rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return b""
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:]
+
+
+def _find(lines: List[str], old: List[str], expected: int) -> int:
+    """Index where *old* occurs in *lines*, searching outwards from *expected*."""
+
+    limit = len(lines) - len(old)
+    expected = min(max(expected, 0), max(limit, 0))
+    for delta in range(max(expected, limit - expected) + 1):
+        for start in (expected - delta, expected + delta):
+            if 0 <= start <= limit and lines[start : start + len(old)] == old:
+                return start
+    return -1
+
+
+def _inside(root: Path, relative: str) -> Path:
+    """``root / relative``, refusing anything that resolves outside *root*."""
+
+    path = (root / relative).resolve()
+    if not path.is_relative_to(root.resolve()):
+        raise PatchError(f"{relative}: outside the patch root {root}")
+    return path
+
+
+def _apply_file(root: Path, patch: FilePatch) -> List[tuple[Path, Optional[bytes]]]:
+    """Return the paths to write and their new contents (None = delete)."""
+
+    source = _inside(root, patch["old_path"]) if patch["old_path"] else None
+    target = _inside(root, patch["new_path"] or patch["old_path"] or "")
+    name = patch["new_path"] or patch["old_path"]
+    renamed = source is not None and patch["new_path"] is not None and source != target
+    if renamed and target.exists():
+        raise PatchError(f"{patch['old_path']} -> {name}: {name} already exists")
+    if source is not None:
+        try:
+            text = _read(source).decode("utf-8")
+        except FileNotFoundError as exc:
+            raise PatchError(f"{name}: file not found") from exc
+    else:
+        if target.exists():
+            raise PatchError(f"{name}: file already exists")
+        text = ""
+    newline = "\r\n" if "\r\n" in text else "\n"
+    lines = text.splitlines()
+    missing_eol = bool(text) and not text.endswith(("\n", "\r"))
+
+    offset = 0
+    for number, hunk in enumerate(patch["hunks"], 1):
+        old = [line[1:] for line in hunk["lines"] if line[0] != "+"]
+        new = [line[1:] for line in hunk["lines"] if line[0] != "-"]
+        expected = hunk["old_start"] - 1 + offset if old else hunk["old_start"] + offset
+        start = _find(lines, old, expected)
+        if start < 0:
+            raise PatchError(f"{name}: hunk #{number} does not apply")
+        at_end = start + len(old) == len(lines)
+        lines[start : start + len(old)] = new
+        offset += len(new) - len(old)
+        if at_end:
+            missing_eol = hunk["no_newline_new"]
+
+    if patch["new_path"] is None:
+        if lines:
+            raise PatchError(f"{name}: deleted file still has content after patching")
+        return [(target, None)]
+    body = newline.join(lines)
+    if lines and not missing_eol:
+        body += newline
+    written: List[tuple[Path, Optional[bytes]]] = [(target, body.encode("utf-8"))]
+    if renamed:
+        written.append((source, None))  # type: ignore[arg-type]
+    return written
+
+
+# ---------------------------------------------------------------------------
+# Atomic commit
+# ---------------------------------------------------------------------------
+
+
+def _stage(target: Path, data: bytes) -> Path:
+    """Write *data* to a temporary file beside *target* (same filesystem)."""
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".ecrivez-tmp", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if target.exists():
+            os.chmod(tmp, target.stat().st_mode & 0o7777)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return Path(tmp)
+
+
+def _commit(results: List[tuple[Path, Optional[bytes]]], pool: ThreadPoolExecutor) -> None:
+    staged: List[tuple[Path, Optional[Path]]] = list(
+        zip(
+            [target for target, _ in results],
+            pool.map(lambda r: _stage(r[0], r[1]) if r[1] is not None else None, results),
+        )
+    )
+    done: List[tuple[Path, Optional[Path]]] = []  # (target, backup or None if newly created)
+    try:
+        for target, tmp in staged:
+            backup = None
+            if target.exists():
+                backup = target.with_name(f".{target.name}.ecrivez-bak")
+                os.replace(target, backup)
+            done.append((target, backup))
+            if tmp is not None:
+                os.replace(tmp, target)
+    except BaseException:
+        for target, backup in reversed(done):
+            if backup is not None:
+                os.replace(backup, target)
+            else:
+                target.unlink(missing_ok=True)
+        for _, tmp in staged:
+            if tmp is not None:
+                tmp.unlink(missing_ok=True)
+        raise
+    for _, backup in done:
+        if backup is not None:
+            backup.unlink(missing_ok=True)
+
+
+def reload_buffers(nvim: Any, paths: Iterable[Path]) -> int:
+    """Reload the Neovim buffers showing *paths* from disk; return how many."""
+
+    wanted = {str(Path(p).resolve()) for p in paths}
+    reloaded = 0
+    for buf in nvim.buffers:
+        if buf.name and str(Path(buf.name).resolve()) in wanted:
+            if nvim.call("getbufvar", buf.number, "&modified"):
+                continue  # unsaved edits: leave them to the user
+            nvim.call("setbufvar", buf.number, "&autoread", 1)
+            nvim.command(f"checktime {buf.number}")
+            reloaded += 1
+    return reloaded
+
+
+def apply_patch(
+    patch: str | List[FilePatch],
+    root: str | Path = ".",
+    workers: int | None = None,
+    nvim: Any = None,
+    check: bool = False,
+) -> PatchResult:
+    """Apply a (multi-file) unified diff below *root*, all files or none.
+
+    With *check* nothing is written, only whether the patch applies is
+    verified.  Raises :class:`PatchError` listing every failing file; paths
+    resolving outside *root* (``../``, absolute paths, symlinks) are refused.
+    A file whose ``---`` and ``+++`` names differ is renamed.
+    """
+
+    started = time.perf_counter()
+    patches = parse_patch(patch) if isinstance(patch, str) else patch
+    root = Path(root)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+        futures = [pool.submit(_apply_file, root, p) for p in patches]
+        results, errors = [], []
+        for future in futures:
+            try:
+                results.extend(future.result())
+            except (PatchError, UnicodeDecodeError, OSError) as exc:
+                errors.append(str(exc))
+        if errors:
+            raise PatchError("patch not applied:\n" + "\n".join(errors))
+        if len({target for target, _ in results}) != len(results):
+            raise PatchError("patch not applied: a file appears more than once")
+        if not check:
+            _commit(results, pool)
+    if nvim is not None and not check:
+        reload_buffers(nvim, [target for target, data in results if data is not None])
+    return {
+        "files": [str(p.get("new_path") or p.get("old_path")) for p in patches],
+        "created": [str(p["new_path"]) for p in patches if p["old_path"] is None],
+        "deleted": [str(p["old_path"]) for p in patches if p["new_path"] is None],
+        "renamed": [
+            (str(p["old_path"]), str(p["new_path"]))
+            for p in patches
+            if p["old_path"] is not None and p["new_path"] is not None and p["old_path"] != p["new_path"]
+        ],
+        "hunks": sum(len(p["hunks"]) for p in patches),
+        "duration": time.perf_counter() - started,
+    }
@@ -0,0 +1,228 @@
+"""Persistent shell sessions: one bash coprocess per chat session.
+
+:func:`ecrivez.tools.run_shell` spawns a new process per command, so ``cd``,
+exported variables and activated virtualenvs are gone by the next call and
+every command pays process start-up.  :class:`ShellSession` keeps a single
+shell (the ``shell`` setting of :class:`ecrivez.config.tools.DefaultTools`,
+``bash`` by default) alive and writes commands to its stdin:
+
+* each command is passed to ``eval`` as one quoted word inside a ``{ … }``
+  group – no subshell, so state sticks, and unbalanced quotes, open
+  heredocs or a stray ``}`` are reported as syntax errors instead of
+  swallowing the sentinel or breaking the wrapper – with stdin from
+  ``/dev/null`` and stderr merged into stdout;
+* it is followed by ``printf`` of a per-command random sentinel with the exit
+  code and ``$PWD``, which delimits the output on the pipe without relying on
+  line boundaries;
+* output is streamed to an optional callback while it is read; only the
+  last :data:`MAX_OUTPUT` bytes are kept for the result, behind a
+  ``[N bytes truncated]`` marker;
+* on timeout (checked between reads, so commands that never stop printing
+  are caught too) or ``exit`` the process group is killed and a fresh shell is
+  started in the last known directory; environment changes are lost then and
+  the result says so.
+
+``!cmd`` and the ``shell`` JSON tool use the session from :func:`get_shell`
+when ``persistent_shell`` is enabled in the project config.
+"""
+
+from __future__ import annotations
+
+import atexit
+import codecs
+import os
+import select
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional, TypedDict
+
+__all__ = ["ShellResult", "ShellSession", "close_shell", "get_shell", "shutdown_shells"]
+
+MAX_OUTPUT = 1 << 20  # bytes of output kept per command (the tail)
+
+
+class ShellResult(TypedDict):
+    exit_code: int  # -1 after a timeout, the exit status of the shell after ``exit``
+    output: str
+    cwd: str
+    duration: float
+    restarted: bool
+
+
+class ShellSession:
+    """A long-lived shell process executing one command at a time."""
+
+    def __init__(self, shell: str = "bash", cwd: str | Path | None = None, env: Dict[str, str] | None = None) -> None:
+        self.shell = shell
+        self.cwd = str(Path(cwd or ".").resolve())
+        self.env = env
+        self.restarts = 0
+        self._proc: Optional[subprocess.Popen[bytes]] = None
+        self._lock = threading.Lock()
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        argv = [self.shell, "--noprofile", "--norc"] if Path(self.shell).name == "bash" else [self.shell]
+        self._proc = subprocess.Popen(  # noqa: S603 – configured shell
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=self.cwd,
+            env=self.env,
+            bufsize=0,
+            start_new_session=True,  # own process group, killable as a whole
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def close(self) -> None:
+        if self._proc is None:
+            return
+        if self._proc.poll() is None:
+            try:
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._proc.wait()
+        for stream in (self._proc.stdin, self._proc.stdout):
+            if stream is not None:
+                stream.close()
+        self._proc = None
+
+    def _restart(self) -> None:
+        self.close()
+        self.start()
+        self.restarts += 1
+
+    # -- execution ---------------------------------------------------------
+
+    def run(
+        self,
+        command: str,
+        timeout: float | None = None,
+        on_output: Callable[[str], None] | None = None,
+    ) -> ShellResult:
+        """Run *command* in the session; *on_output* receives output as it arrives."""
+
+        with self._lock:
+            started = time.perf_counter()
+            if self._proc is None:
+                self.start()
+            elif not self.alive:
+                self._restart()
+            assert self._proc is not None and self._proc.stdin is not None and self._proc.stdout is not None
+            marker = f"__ecrivez_{uuid.uuid4().hex}__".encode()
+            script = (
+                f"{{ eval {shlex.quote(command)}\n}} </dev/null 2>&1\n"
+                f"printf '%s:%d:%s\\n' '{marker.decode()}' \"$?\" \"$PWD\"\n"
+            )
+            self._proc.stdin.write(script.encode("utf-8"))
+
+            fd = self._proc.stdout.fileno()
+            buffer = bytearray()
+            scanned = 0  # the sentinel cannot start before this offset
+            emitted = 0  # bytes of *buffer* already passed to on_output
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            deadline = None if timeout is None else started + timeout
+            exit_code: Optional[int] = None
+            restarted = False
+            dropped = 0  # bytes cut from the front of *buffer*
+            while exit_code is None:
+                # checked before every read: a command that never stops
+                # printing keeps select() ready forever
+                if deadline is not None and time.perf_counter() >= deadline:
+                    buffer += f"\n[timed out after {timeout}s – shell restarted, environment lost]\n".encode()
+                    exit_code, restarted = -1, True
+                    break
+                wait = 0.1 if deadline is None else max(0.0, min(0.1, deadline - time.perf_counter()))
+                ready, _, _ = select.select([fd], [], [], wait)
+                if not ready:
+                    continue
+                data = os.read(fd, 65536)
+                if not data:  # the shell exited (``exit`` in the command)
+                    status = self._proc.wait()
+                    buffer += "\n[shell exited – restarted, environment lost]\n".encode()
+                    exit_code, restarted = status, True
+                    break
+                buffer += data
+                index = buffer.find(marker, scanned)
+                scanned = max(scanned, len(buffer) - len(marker))
+                if index >= 0 and buffer.endswith(b"\n"):
+                    _, code, cwd = buffer[index:].rstrip(b"\n").split(b":", 2)
+                    exit_code, self.cwd = int(code), cwd.decode("utf-8", "replace")
+                    del buffer[index:]
+                elif on_output is not None and index < 0:
+                    held = next((k for k in range(len(marker) - 1, 0, -1) if buffer.endswith(marker[:k])), 0)
+                    safe = len(buffer) - held  # never emit the start of the sentinel
+                    if safe > emitted:
+                        on_output(decoder.decode(bytes(buffer[emitted:safe])))
+                        emitted = safe
+                if exit_code is None and len(buffer) > 2 * MAX_OUTPUT:  # keep the tail only
+                    cut = len(buffer) - MAX_OUTPUT
+                    if on_output is not None:
+                        cut = min(cut, emitted)  # everything is streamed once
+                    del buffer[:cut]
+                    dropped += cut
+                    scanned, emitted = max(0, scanned - cut), emitted - cut
+            if on_output is not None and len(buffer) > emitted:
+                on_output(decoder.decode(bytes(buffer[emitted:]), final=True))
+            if restarted:
+                self._restart()
+            if len(buffer) > MAX_OUTPUT:
+                dropped += len(buffer) - MAX_OUTPUT
+                del buffer[: len(buffer) - MAX_OUTPUT]
+            output = buffer.decode("utf-8", "replace")
+            if dropped:
+                output = f"[{dropped} bytes truncated]\n" + output
+            return {
+                "exit_code": exit_code,
+                "output": output,
+                "cwd": self.cwd,
+                "duration": time.perf_counter() - started,
+                "restarted": restarted,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Per-session shells
+# ---------------------------------------------------------------------------
+
+_SHELLS: Dict[str, ShellSession] = {}
+_SHELLS_LOCK = threading.Lock()
+
+
+def get_shell(session: str = "default", shell: str = "bash") -> ShellSession:
+    """The persistent shell of *session*; all are closed at exit."""
+
+    with _SHELLS_LOCK:
+        current = _SHELLS.get(session)
+        if current is None:
+            if not _SHELLS:
+                atexit.register(shutdown_shells)
+            current = _SHELLS[session] = ShellSession(shell)
+        return current
+
+
+def close_shell(session: str) -> None:
+    """Close the shell of *session*, if it has one (e.g. when the session ends)."""
+
+    with _SHELLS_LOCK:
+        current = _SHELLS.pop(session, None)
+    if current is not None:
+        current.close()
+
+
+def shutdown_shells() -> None:
+    with _SHELLS_LOCK:
+        for session in _SHELLS.values():
+            session.close()
+        _SHELLS.clear()
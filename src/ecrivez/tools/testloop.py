@@ -0,0 +1,431 @@
+"""Fast edit → test loop: a warm pytest worker plus affected-test selection.
+
+:class:`TestLoop` keeps one long-lived worker process (``python -m
+ecrivez.tools.testloop``) with pytest and the project's dependencies already
+imported.  Before every run the worker drops from :data:`sys.modules` only the
+project modules whose source changed (and the project modules that imported
+them), so heavy third-party imports are paid once per worker instead of once
+per run.
+
+While tests run, the worker records which project files each test executes,
+using :pymod:`sys.monitoring` (one event per function per test, so the
+overhead is small).  The resulting *test map* is stored in
+``.ecrivez/testmap.json``.  Later runs compare file mtimes against the last
+run and only execute tests that touched a changed file, tests in changed test
+files, tests the map does not know yet and tests that failed last time.
+Deleted files count as changed: the tests that executed them run again
+(and tests of deleted test files are forgotten).  Every ``full_every`` runs –
+and whenever there is no map yet – the whole suite runs instead, which also
+refreshes the map.  A run taking longer than ``timeout`` seconds kills the
+worker (a fresh one is started for the next run) and reports exit code -1.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Any, Iterable, List, TypedDict
+
+__all__ = ["TestLoop", "TestRun", "get_test_loop"]
+
+_SENTINEL = "\x00ecrivez-testloop "
+_SKIP_DIRS = {".git", ".ecrivez", ".venv", "venv", "__pycache__", "node_modules", ".tox", ".nox"}
+
+
+class TestRun(TypedDict):
+    exit_code: int
+    output: str
+    duration: float
+    mode: str  # "full" | "affected" | "none"
+    selected: List[str]
+    reloaded: List[str]
+
+
+def _python_files(root: Path) -> dict[str, float]:
+    """Relative path → mtime of every ``*.py`` file below *root*."""
+
+    found: dict[str, float] = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in _SKIP_DIRS and not entry.name.endswith(".egg-info"):
+                    stack.append(Path(entry.path))
+            elif entry.name.endswith(".py"):
+                found[os.path.relpath(entry.path, root)] = entry.stat().st_mtime
+    return found
+
+
+class TestLoop:
+    """Client side: owns the worker process and the test map."""
+
+    __test__ = False  # not a pytest test class despite the name
+
+    def __init__(
+        self,
+        root: str | Path = ".",
+        map_path: str | Path | None = None,
+        full_every: int = 10,
+        python: str = sys.executable,
+        timeout: float | None = 600.0,
+    ) -> None:
+        self.root = Path(root).resolve()
+        self.map_path = Path(map_path) if map_path else self.root / ".ecrivez" / "testmap.json"
+        self.full_every = full_every
+        self.python = python
+        self.timeout = timeout
+        self._proc: subprocess.Popen[str] | None = None
+        self._runs_since_full = 0
+        data = self._load_map()
+        self.tests: dict[str, List[str]] = data.get("tests", {})
+        self.files: dict[str, float] = data.get("files", {})
+        self.failed: List[str] = data.get("failed", [])
+
+    # ------------------------------------------------------------------
+    # Test map
+    # ------------------------------------------------------------------
+
+    def _load_map(self) -> dict[str, Any]:
+        try:
+            return json.loads(self.map_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_map(self) -> None:
+        self.map_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.map_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"tests": self.tests, "files": self.files, "failed": self.failed}))
+        os.replace(tmp, self.map_path)
+
+    def changed_files(self, current: dict[str, float] | None = None) -> List[str]:
+        current = current if current is not None else _python_files(self.root)
+        changed = {p for p, mtime in current.items() if self.files.get(p) != mtime}
+        return sorted(changed | (set(self.files) - set(current)))  # deleted files too
+
+    def affected_tests(self, changed: Iterable[str]) -> List[str]:
+        """Test node ids (or test files) to run for the *changed* files."""
+
+        changed = set(changed)
+        selected = {t for t, files in self.tests.items() if changed.intersection(files)}
+        for path in changed:
+            name = Path(path).name
+            if name.startswith("test_") or name.endswith("_test.py"):
+                selected = {t for t in selected if not t.startswith(path + "::")}
+                if (self.root / path).exists():
+                    selected.add(path)  # re-collect the whole (possibly new) file
+        selected.update(t for t in self.failed if t.split("::", 1)[0] not in changed)
+        return sorted(selected)
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def _worker(self) -> subprocess.Popen[str]:
+        if self._proc is None or self._proc.poll() is not None:
+            # Make sure the worker can import ecrivez even from a foreign venv.
+            package_root = str(Path(__file__).resolve().parents[2])
+            pythonpath = os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")]))
+            self._proc = subprocess.Popen(  # noqa: S603 – our own interpreter
+                [self.python, "-m", "ecrivez.tools.testloop", str(self.root)],
+                cwd=self.root,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                env={**os.environ, "PYTHONPATH": pythonpath},
+                start_new_session=True,  # own process group: a timeout kills what tests spawned too
+            )
+        return self._proc
+
+    def _response(self, proc: subprocess.Popen[str], deadline: float | None) -> dict[str, Any] | None:
+        """Read the worker's next response; None if it exited first."""
+
+        assert proc.stdout is not None
+        fd = proc.stdout.fileno()  # read raw: select() can't see the text wrapper's buffer
+        buffer = bytearray()
+        sentinel = _SENTINEL.encode()
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                return None
+            buffer += data
+            while (end := buffer.find(b"\n")) >= 0:
+                line = bytes(buffer[:end])
+                del buffer[: end + 1]
+                if line.startswith(sentinel):
+                    return json.loads(line[len(sentinel) :])
+
+    def _request(self, args: List[str], timeout: float | None = None) -> dict[str, Any]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(2):
+            proc = self._worker()
+            assert proc.stdin is not None
+            try:
+                proc.stdin.write(json.dumps({"args": args}) + "\n")
+                proc.stdin.flush()
+                response = self._response(proc, deadline)
+            except BrokenPipeError:
+                response = None
+            except TimeoutError:
+                self.kill()
+                raise
+            if response is not None:
+                return response
+            self.close()  # worker died (e.g. a test called os._exit) – restart once
+            if attempt:
+                break
+        raise RuntimeError("pytest worker exited unexpectedly")
+
+    def run(self, args: Iterable[str] = (), full: bool = False, timeout: float | None = None) -> TestRun:
+        """Run the affected tests (or the whole suite) in the warm worker.
+
+        *timeout* defaults to the loop's ``timeout``.
+        """
+
+        start = time.perf_counter()
+        current = _python_files(self.root)
+        changed = self.changed_files(current)
+        gone = set(self.files) - set(current)
+        if gone:  # tests of deleted test files no longer exist
+            self.tests = {t: f for t, f in self.tests.items() if t.split("::", 1)[0] not in gone}
+            self.failed = [t for t in self.failed if t.split("::", 1)[0] not in gone]
+        full = full or not self.tests or self._runs_since_full + 1 >= self.full_every
+
+        if full:
+            selected: List[str] = []
+            mode = "full"
+        else:
+            selected = self.affected_tests(changed)
+            mode = "affected"
+            if not selected:
+                self._runs_since_full += 1
+                self.files = current
+                self._save_map()
+                return TestRun(
+                    exit_code=0,
+                    output="no affected tests",
+                    duration=time.perf_counter() - start,
+                    mode="none",
+                    selected=[],
+                    reloaded=[],
+                )
+
+        limit = self.timeout if timeout is None else timeout
+        try:
+            response = self._request([*args, *selected], limit)
+        except TimeoutError:
+            # the map and mtimes stay as they were: the same tests are selected next time
+            return TestRun(
+                exit_code=-1,
+                output=f"[tests timed out after {limit}s – pytest worker killed]",
+                duration=time.perf_counter() - start,
+                mode=mode,
+                selected=selected,
+                reloaded=[],
+            )
+        if full:
+            self.tests = {}
+            self._runs_since_full = 0
+        else:
+            self._runs_since_full += 1
+            for test in selected:  # forget stale entries of re-collected files
+                if "::" not in test:
+                    self.tests = {t: f for t, f in self.tests.items() if not t.startswith(test + "::")}
+        self.tests.update(response["map"])
+        ran = set(response["map"])
+        self.failed = sorted((set(self.failed) - ran) | set(response["failed"]))
+        self.files = current
+        self._save_map()
+        return TestRun(
+            exit_code=response["exit_code"],
+            output=response["output"],
+            duration=time.perf_counter() - start,
+            mode=mode,
+            selected=selected,
+            reloaded=response["reloaded"],
+        )
+
+    def kill(self) -> None:
+        """Kill the worker and everything it started; the next run starts a new one."""
+
+        if self._proc is not None:
+            try:
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self._proc.wait()
+            for stream in (self._proc.stdin, self._proc.stdout):
+                if stream is not None:
+                    stream.close()
+            self._proc = None
+
+    def close(self) -> None:
+        if self._proc is not None:
+            if self._proc.stdin:
+                self._proc.stdin.close()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+
+
+_LOOPS: dict[Path, TestLoop] = {}
+
+
+def get_test_loop(root: str | Path = ".") -> TestLoop:
+    """Process-wide :class:`TestLoop` for *root* (workers are reused across turns)."""
+
+    key = Path(root).resolve()
+    if key not in _LOOPS:
+        _LOOPS[key] = TestLoop(key)
+    return _LOOPS[key]
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+
+
+class _Tracer:
+    """Pytest plugin recording the project files each test executes."""
+
+    def __init__(self, root: Path) -> None:
+        self.prefix = str(root) + os.sep
+        self.current: set[str] | None = None
+        self.map: dict[str, List[str]] = {}
+        self.failed: List[str] = []
+        self.tool_id = self._claim_tool_id()
+
+    @staticmethod
+    def _claim_tool_id() -> int | None:
+        mon = sys.monitoring
+        for tool_id in (4, 3, mon.PROFILER_ID, mon.OPTIMIZER_ID):
+            if mon.get_tool(tool_id) is None:
+                mon.use_tool_id(tool_id, "ecrivez-testloop")
+                return tool_id
+        return None
+
+    def _on_start(self, code: Any, offset: int) -> Any:
+        if self.current is not None and code.co_filename.startswith(self.prefix):
+            self.current.add(code.co_filename[len(self.prefix) :])
+        return sys.monitoring.DISABLE
+
+    def install(self) -> None:
+        if self.tool_id is not None:
+            sys.monitoring.register_callback(self.tool_id, sys.monitoring.events.PY_START, self._on_start)
+            sys.monitoring.set_events(self.tool_id, sys.monitoring.events.PY_START)
+
+    def pytest_runtest_protocol(self, item: Any, nextitem: Any) -> None:
+        self.current = set()
+        sys.monitoring.restart_events()
+
+    def pytest_runtest_logreport(self, report: Any) -> None:
+        if report.failed and report.nodeid not in self.failed:
+            self.failed.append(report.nodeid)
+        if report.when == "teardown" and self.current is not None:
+            self.map[report.nodeid] = sorted(self.current)
+            self.current = None
+
+
+class _Worker:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.prefix = str(root) + os.sep
+        self.mtimes: dict[str, float] = {}
+        import pytest  # noqa: F401,WPS433 – keep pytest warm
+
+    def _project_modules(self) -> dict[str, Any]:
+        return {
+            name: mod
+            for name, mod in list(sys.modules.items())
+            if (getattr(mod, "__file__", None) or "").startswith(self.prefix)
+        }
+
+    def invalidate(self) -> List[str]:
+        """Drop changed project modules and everything in the project that imported them."""
+
+        modules = self._project_modules()
+        stale = set()
+        for name, mod in modules.items():
+            try:
+                mtime = os.stat(mod.__file__).st_mtime
+            except OSError:
+                mtime = None
+            if self.mtimes.get(name) != mtime:
+                stale.add(name)
+        grew = True
+        while grew:
+            grew = False
+            for name, mod in modules.items():
+                if name in stale:
+                    continue
+                for value in list(vars(mod).values()):
+                    owner = value.__name__ if isinstance(value, type(sys)) else getattr(value, "__module__", None)
+                    if owner in stale:
+                        stale.add(name)
+                        grew = True
+                        break
+        for name in stale:
+            sys.modules.pop(name, None)
+        return sorted(stale)
+
+    def run(self, args: List[str]) -> dict[str, Any]:
+        import pytest  # noqa: WPS433
+
+        reloaded = [n for n in self.invalidate() if n in self.mtimes]
+        tracer = _Tracer(self.root)
+        tracer.install()
+        out = io.StringIO()
+        try:
+            with redirect_stdout(out), redirect_stderr(out):
+                exit_code = int(pytest.main(["-p", "no:cacheprovider", *args], plugins=[tracer]))
+        finally:
+            if tracer.tool_id is not None:
+                sys.monitoring.set_events(tracer.tool_id, 0)
+                sys.monitoring.register_callback(tracer.tool_id, sys.monitoring.events.PY_START, None)
+                sys.monitoring.free_tool_id(tracer.tool_id)
+        self.mtimes = {}
+        for name, mod in self._project_modules().items():
+            try:
+                self.mtimes[name] = os.stat(mod.__file__).st_mtime
+            except OSError:
+                pass
+        return {
+            "exit_code": exit_code,
+            "output": out.getvalue(),
+            "map": tracer.map,
+            "failed": tracer.failed,
+            "reloaded": reloaded,
+        }
+
+
+def _worker_main(root: str) -> None:
+    worker = _Worker(Path(root).resolve())
+    for line in sys.stdin:
+        request = json.loads(line)
+        response = worker.run(request.get("args", []))
+        sys.__stdout__.write(_SENTINEL + json.dumps(response) + "\n")
+        sys.__stdout__.flush()
+
+
+if __name__ == "__main__":  # pragma: no cover – worker entry point
+    _worker_main(sys.argv[1] if len(sys.argv) > 1 else ".")
@@ -1,58 +1,482 @@
+"""Render node/edge graphs (sessions, agents, workflows) as vis-network HTML.
+
+Graph sources are YAML or JSON documents with top-level ``nodes`` and
+``edges`` lists (vis-network item format: ``{id, label, group, ...}`` and
+``{from, to, ...}``), or any callable returning an iterable of
+``("node" | "edge", item)`` pairs.
+
+Everything is streamed so that graphs with 100k+ nodes fit in bounded
+memory:
+
+* YAML is read event by event with the libyaml-backed ``CSafeLoader`` (when
+  available) and each list item is built on its own; JSON is decoded item by
+  item with the C scanner of :mod:`json` over a sliding buffer.
+* :func:`write_html` writes the page incrementally.  Items are JSON-encoded
+  and emitted as ``<script>`` chunks of ``chunk_size`` items, or into a
+  separate NDJSON data file that the page fetches and adds batch by batch.
+* Above ``threshold`` nodes the graph is laid out server side (nodes of the
+  same group, or connected component, are packed into discs placed on a
+  spiral) and physics is switched off; ``mode="cluster"`` instead collapses
+  every group into one node with aggregated, weighted edges.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import math
+from collections import Counter
 from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator, Literal, Tuple
 
 import yaml
 
+__all__ = ["generate_html", "iter_graph", "write_html"]
 
-def generate_html(content: str | Path) -> str:
-    if isinstance(content, Path):
-        with open(content, "r") as f:
-            data = yaml.safe_load(f)
-    else:
-        data = yaml.safe_load(content)
-    return f"""\
+Item = Tuple[str, dict]
+Source = str | Path | Callable[[], Iterable[Item]]
+
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_KINDS = {"nodes": "node", "edges": "edge"}
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+# ---------------------------------------------------------------------------
+# Streaming readers
+# ---------------------------------------------------------------------------
+
+
+def _yaml_value(loader: Any, event: Any) -> Any:
+    """Build the Python value starting at *event* (already consumed)."""
+
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, style=event.style)
+        constructor = loader.yaml_constructors.get(tag, loader.yaml_constructors[None])
+        return constructor(loader, node)
+    if isinstance(event, yaml.SequenceStartEvent):
+        items = []
+        while not loader.check_event(yaml.SequenceEndEvent):
+            items.append(_yaml_value(loader, loader.get_event()))
+        loader.get_event()
+        return items
+    if isinstance(event, yaml.MappingStartEvent):
+        mapping = {}
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _yaml_value(loader, loader.get_event())
+            mapping[key] = _yaml_value(loader, loader.get_event())
+        loader.get_event()
+        return mapping
+    raise ValueError(f"Unsupported YAML construct in graph: {type(event).__name__}")
+
+
+def _iter_yaml(fh: IO[str]) -> Iterator[Item]:
+    loader = _Loader(fh)
+    try:
+        while not loader.check_event(yaml.MappingStartEvent, yaml.StreamEndEvent):
+            loader.get_event()
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _yaml_value(loader, loader.get_event())
+            if key in _KINDS and loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield _KINDS[key], _yaml_value(loader, loader.get_event())
+                loader.get_event()
+            else:
+                _yaml_value(loader, loader.get_event())  # skip other keys
+    finally:
+        loader.dispose()
+
+
+class _JSONStream:
+    """Incremental reader over a text stream using ``json``'s C scanner."""
+
+    def __init__(self, fh: IO[str], chunk: int = 1 << 20) -> None:
+        self.fh = fh
+        self.chunk = chunk
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.fh.read(self.chunk)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Malformed JSON graph: expected one of {chars!r}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A value touching the buffer end may be truncated (e.g. a number).
+            if end < len(self.buf) or not self._fill():
+                self.pos = end
+                return value
+
+
+def _iter_json(fh: IO[str], chunk: int = 1 << 20) -> Iterator[Item]:
+    stream = _JSONStream(fh, chunk)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key in _KINDS and stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    yield _KINDS[key], stream.value()
+                    if stream.expect(",]") == "]":
+                        break
+        else:
+            stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+
+def _iter_sniffed(fh: IO[str]) -> Iterator[Item]:
+    """JSON if the document parses as such, YAML otherwise.
+
+    A YAML flow mapping (``{nodes: [...]}``) starts with ``{`` as well; it
+    fails the JSON reader before any item is produced, so the stream is
+    rewound and read again as YAML.
+    """
+
+    items = _iter_json(fh)
+    try:
+        first = next(items)
+    except StopIteration:
+        return
+    except ValueError:
+        fh.seek(0)
+        yield from _iter_yaml(fh)
+        return
+    yield first
+    yield from items
+
+
+def iter_graph(source: Source) -> Iterator[Item]:
+    """Yield ``(kind, item)`` pairs from a YAML/JSON file, text or item callable.
+
+    Files named ``*.json`` or ``*.yaml``/``*.yml`` are read with that parser;
+    otherwise a document starting with ``{`` is tried as JSON first.
+    """
+
+    if callable(source):
+        yield from source()
+        return
+    if isinstance(source, Path):
+        suffix = source.suffix.lower()
+        with source.open(encoding="utf-8") as fh:
+            if suffix == ".json":
+                yield from _iter_json(fh)
+            elif suffix in (".yaml", ".yml"):
+                yield from _iter_yaml(fh)
+            else:
+                first = fh.read(1)
+                while first.isspace():
+                    first = fh.read(1)
+                fh.seek(0)
+                yield from (_iter_sniffed(fh) if first == "{" else _iter_yaml(fh))
+        return
+    fh = io.StringIO(source)
+    yield from (_iter_sniffed(fh) if source.lstrip().startswith("{") else _iter_yaml(fh))
+
+
+# ---------------------------------------------------------------------------
+# Large graphs: pre-layout and clustering
+# ---------------------------------------------------------------------------
+
+
+class _Clusters:
+    """Group every node by ``group`` – or by connected component – in O(nodes) ints."""
+
+    def __init__(self, source: Source) -> None:
+        self.index: dict[Any, int] = {}
+        self.parent: list[int] = []
+        self.group: list[Any] = []
+        for kind, item in iter_graph(source):
+            if kind == "node":
+                self._add(item["id"], item.get("group"))
+            elif item.get("from") in self.index and item.get("to") in self.index:
+                self._union(self.index[item["from"]], self.index[item["to"]])
+        self.key = [
+            ("group", g) if g is not None else ("component", self._find(i)) for i, g in enumerate(self.group)
+        ]
+        self.sizes = Counter(self.key)
+
+    def _add(self, node_id: Any, group: Any) -> None:
+        if node_id not in self.index:
+            self.index[node_id] = len(self.parent)
+            self.parent.append(len(self.parent))
+            self.group.append(group)
+
+    def _find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def _union(self, a: int, b: int) -> None:
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def label(self, key: Tuple[str, Any]) -> str:
+        kind, value = key
+        return str(value) if kind == "group" else f"component {value}"
+
+    def layout(self, spacing: float = 30.0) -> dict[Tuple[str, Any], Tuple[float, float, float]]:
+        """Cluster key → (centre x, centre y, disc radius), biggest clusters first."""
+
+        centres = {}
+        radius_sum = 0.0
+        for rank, (key, size) in enumerate(self.sizes.most_common()):
+            radius = spacing * math.sqrt(size)
+            distance = 0.0 if rank == 0 else radius_sum + radius
+            angle = rank * _GOLDEN_ANGLE
+            centres[key] = (distance * math.cos(angle), distance * math.sin(angle), radius)
+            radius_sum += radius * 0.35
+        return centres
+
+
+# ---------------------------------------------------------------------------
+# HTML output
+# ---------------------------------------------------------------------------
+
+
+_HEAD = """\
 <!DOCTYPE html>
 <html>
 <head>
-    <title>Graph Visualization</title>
+    <meta charset="utf-8">
+    <title>{title}</title>
     <script type="text/javascript" src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"></script>
     <style type="text/css">
         #mynetwork {{
-            width: 800px;
-            height: 600px;
+            width: 100%;
+            height: 90vh;
             border: 1px solid lightgray;
         }}
     </style>
 </head>
 <body>
     <div id="mynetwork"></div>
+    <div id="status"></div>
+    <script type="text/javascript">
+        var nodes = new vis.DataSet();
+        var edges = new vis.DataSet();
+    </script>
+"""
+
+_NETWORK = """\
+    <script type="text/javascript">
+        var options = {options};
+        var network = new vis.Network(document.getElementById('mynetwork'), {{nodes: nodes, edges: edges}}, options);
+    </script>
+"""
+
+_FETCH = """\
     <script type="text/javascript">
-        // Create nodes and edges datasets
-        var nodes = new vis.DataSet({str(data["nodes"])});
-        var edges = new vis.DataSet({str(data["edges"])});
-
-        // Create a network
-        var container = document.getElementById('mynetwork');
-        var data = {{
-            nodes: nodes,
-            edges: edges
-        }};
-        var options = {{
-            nodes: {{
-                shape: 'circle',
-                font: {{
-                    size: 20
+        // Stream the NDJSON data file and add items batch by batch.
+        (async function () {{
+            var response = await fetch({url});
+            var reader = response.body.getReader();
+            var decoder = new TextDecoder();
+            var rest = '';
+            var count = 0;
+            while (true) {{
+                var chunk = await reader.read();
+                if (chunk.done) break;
+                var lines = (rest + decoder.decode(chunk.value, {{stream: true}})).split('\\n');
+                rest = lines.pop();
+                var batch = {{node: [], edge: []}};
+                for (var i = 0; i < lines.length; i++) {{
+                    if (!lines[i]) continue;
+                    var entry = JSON.parse(lines[i]);
+                    batch[entry[0]].push(entry[1]);
                 }}
-            }},
-            edges: {{
-                arrows: 'to'
-            }},
-            physics: {{
-                enabled: true,
-                solver: 'forceAtlas2Based'
+                nodes.add(batch.node);
+                edges.add(batch.edge);
+                count += batch.node.length;
+                document.getElementById('status').textContent = count + ' nodes loaded';
             }}
-        }};
-        var network = new vis.Network(container, data, options);
+        }})();
     </script>
-</body>
-</html>
 """
+
+
+def _js(value: Any) -> str:
+    """JSON for embedding inside ``<script>`` (no ``</script>`` breakout)."""
+
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def _options(large: bool) -> dict[str, Any]:
+    if large:
+        return {
+            "nodes": {"shape": "dot", "size": 6},
+            "edges": {"arrows": "to", "smooth": False},
+            "physics": {"enabled": False},
+            "layout": {"improvedLayout": False},
+            "interaction": {"hideEdgesOnDrag": True, "hideEdgesOnZoom": True},
+        }
+    return {
+        "nodes": {"shape": "circle", "font": {"size": 20}},
+        "edges": {"arrows": "to"},
+        "physics": {"enabled": True, "solver": "forceAtlas2Based"},
+    }
+
+
+def _laid_out(source: Source, clusters: _Clusters) -> Iterator[Item]:
+    centres = clusters.layout()
+    placed: Counter[Tuple[str, Any]] = Counter()
+    for kind, item in iter_graph(source):
+        if kind == "node" and item.get("id") in clusters.index:
+            key = clusters.key[clusters.index[item["id"]]]
+            cx, cy, radius = centres[key]
+            k = placed[key]
+            placed[key] += 1
+            r = radius * math.sqrt((k + 0.5) / clusters.sizes[key])
+            item = {**item, "x": cx + r * math.cos(k * _GOLDEN_ANGLE), "y": cy + r * math.sin(k * _GOLDEN_ANGLE)}
+        yield kind, item
+
+
+def _clustered(source: Source, clusters: _Clusters) -> Iterator[Item]:
+    centres = clusters.layout(spacing=4.0)
+    ids = {key: n for n, key in enumerate(centres)}
+    for key, n in ids.items():
+        cx, cy, _ = centres[key]
+        size = clusters.sizes[key]
+        yield "node", {
+            "id": n,
+            "label": f"{clusters.label(key)} ({size})",
+            "value": size,
+            "x": cx,
+            "y": cy,
+        }
+    weights: Counter[Tuple[int, int]] = Counter()
+    for kind, item in iter_graph(source):
+        if kind == "edge" and item.get("from") in clusters.index and item.get("to") in clusters.index:
+            a = ids[clusters.key[clusters.index[item["from"]]]]
+            b = ids[clusters.key[clusters.index[item["to"]]]]
+            if a != b:
+                weights[a, b] += 1
+    for (a, b), weight in weights.items():
+        yield "edge", {"from": a, "to": b, "value": weight, "title": f"{weight} edges"}
+
+
+def write_html(
+    source: Source,
+    out: IO[str],
+    *,
+    data_file: str | Path | None = None,
+    threshold: int = 5000,
+    mode: Literal["auto", "layout", "cluster", "plain"] = "auto",
+    chunk_size: int = 5000,
+    title: str = "Graph Visualization",
+) -> dict[str, int]:
+    """Stream the graph of *source* into the HTML document *out*.
+
+    With *data_file* the items go to that NDJSON file (``["node", {...}]``
+    per line) and the page fetches it incrementally – serve both over HTTP,
+    since browsers block ``fetch`` from ``file://``.  In ``auto`` mode graphs
+    with more than *threshold* nodes are pre-laid out.  *source* is read
+    twice in the ``layout`` and ``cluster`` modes, so it must be a path, text
+    or callable, not a one-shot iterator.  Returns node and edge counts.
+    """
+
+    large = False
+    items: Iterable[Item] = ()
+    if mode == "auto":
+        # Small graphs are buffered and written in a single pass.
+        head: list[Item] = []
+        for entry in iter_graph(source):
+            head.append(entry)
+            if len(head) > 4 * threshold:
+                break
+        else:
+            items, mode = head, "plain"
+        del head
+    if mode == "plain":
+        items = items or iter_graph(source)
+    else:
+        clusters = _Clusters(source)
+        large = mode != "auto" or len(clusters.parent) > threshold
+        if not large:
+            items = iter_graph(source)
+        elif mode == "cluster":
+            items = _clustered(source, clusters)
+        else:
+            items = _laid_out(source, clusters)
+
+    counts = {"nodes": 0, "edges": 0}
+    out.write(_HEAD.format(title=title))
+    if data_file is not None:
+        with open(data_file, "w", encoding="utf-8") as data:
+            for kind, item in items:
+                counts[kind + "s"] += 1
+                data.write(json.dumps([kind, item], ensure_ascii=False, separators=(",", ":")) + "\n")
+        out.write(_NETWORK.format(options=_js(_options(large))))
+        out.write(_FETCH.format(url=_js(Path(data_file).name)))
+    else:
+        batch: dict[str, list[dict]] = {"node": [], "edge": []}
+
+        def flush() -> None:
+            for kind, target in (("node", "nodes"), ("edge", "edges")):
+                if batch[kind]:
+                    out.write(f"    <script>{target}.add({_js(batch[kind])});</script>\n")
+                    batch[kind] = []
+
+        for kind, item in items:
+            counts[kind + "s"] += 1
+            batch[kind].append(item)
+            if len(batch[kind]) >= chunk_size:
+                flush()
+        flush()
+        out.write(_NETWORK.format(options=_js(_options(large))))
+    out.write("</body>\n</html>\n")
+    return counts
+
+
+def generate_html(content: str | Path) -> str:
+    """Return the HTML page for a small graph given as YAML/JSON text or file."""
+
+    out = io.StringIO()
+    write_html(content, out)
+    return out.getvalue()
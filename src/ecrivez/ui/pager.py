@@ -0,0 +1,287 @@
+"""Spill-to-disk buffer and lazy terminal view for large tool/model outputs.
+
+Printing a multi-megabyte ``run_shell`` result floods the terminal.  The REPL
+instead writes large replies into a :class:`SpillBuffer`, which keeps the
+first ``memory_limit`` bytes in memory and moves everything to a temporary
+file beyond that, while tracking the line count, the first and last lines
+and a sparse line-offset index.  Only :pymeth:`SpillBuffer.summary` – head,
+tail and a one-line summary – is printed, so rendering costs the same for 10
+KB and 10 GB.
+
+The full output stays available on demand: :pymeth:`~SpillBuffer.page`
+seeks straight to a line through the index, :pymeth:`~SpillBuffer.search`
+scans the file with a regex, and :pymeth:`~SpillBuffer.fzf` hands the lines
+to ``fzf`` (see ``dev/fzfdocs.txt``) for interactive fuzzy search; the REPL
+exposes these as ``:page``, ``:search`` and ``:fzf``.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+
+__all__ = ["SpillBuffer", "VIEW_COMMANDS", "view_command"]
+
+_INDEX_EVERY = 1024  # one byte offset per this many lines
+_MAX_LINE = 400  # chars per line in summaries
+
+
+def _clip(line: str) -> str:
+    return line if len(line) <= _MAX_LINE else line[:_MAX_LINE] + f"… (+{len(line) - _MAX_LINE} chars)"
+
+
+def _human(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{n} B"  # pragma: no cover
+
+
+class SpillBuffer:
+    """Append-only text buffer that spills to disk and renders a bounded summary."""
+
+    def __init__(
+        self,
+        memory_limit: int = 1 << 20,
+        head_lines: int = 20,
+        tail_lines: int = 20,
+        spill_dir: str | Path | None = None,
+    ) -> None:
+        self.memory_limit = memory_limit
+        self.head_lines = head_lines
+        self.spill_dir = spill_dir
+        self.n_lines = 0
+        self.n_bytes = 0
+        self.head: List[str] = []
+        self.tail: deque[str] = deque(maxlen=tail_lines)
+        self._chunks: List[str] = []
+        self._file: Optional[IO[bytes]] = None
+        self._path: Optional[Path] = None
+        self._partial = ""
+        self._offset = 0  # byte offset of the start of the current line
+        self._index: List[int] = [0]  # byte offset of line k * _INDEX_EVERY
+
+    # -- writing -----------------------------------------------------------
+
+    @classmethod
+    def from_text(cls, text: str, **kwargs: object) -> "SpillBuffer":
+        buffer = cls(**kwargs)  # type: ignore[arg-type]
+        buffer.write(text)
+        buffer.finish()
+        return buffer
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        data = text.encode("utf-8")
+        self.n_bytes += len(data)
+        if self._file is None and self.n_bytes > self.memory_limit:
+            self._spill()
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._chunks.append(text)
+        *lines, self._partial = (self._partial + text).split("\n")
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line: str) -> None:
+        if len(self.head) < self.head_lines:
+            self.head.append(line)
+        else:
+            self.tail.append(line)
+        self.n_lines += 1
+        self._offset += len(line.encode("utf-8")) + 1
+        if self.n_lines % _INDEX_EVERY == 0:
+            self._index.append(self._offset)
+
+    def finish(self) -> None:
+        """Account a trailing line without newline and flush the spill file."""
+
+        if self._partial:
+            partial, self._partial = self._partial, ""
+            self._add_line(partial)
+            self._offset -= 1  # no newline after it
+        if self._file is not None:
+            self._file.flush()
+
+    def _spill(self) -> None:
+        fd, name = tempfile.mkstemp(prefix="ecrivez-output-", suffix=".txt", dir=self.spill_dir)
+        self._file = os.fdopen(fd, "w+b")
+        self._path = Path(name)
+        for chunk in self._chunks:
+            self._file.write(chunk.encode("utf-8"))
+        self._chunks = []
+
+    @property
+    def path(self) -> Optional[Path]:
+        """The spill file, or None while everything is in memory."""
+
+        return self._path
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._path is not None:
+            self._path.unlink(missing_ok=True)
+            self._path = None
+
+    def __enter__(self) -> "SpillBuffer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    # -- reading -----------------------------------------------------------
+
+    def summary(self) -> str:
+        """Head and tail lines plus one summary line; size independent of the output."""
+
+        shown = len(self.head) + len(self.tail)
+        lines = [_clip(line) for line in self.head]
+        if self.n_lines > shown:
+            hidden = self.n_lines - shown
+            where = f", spilled to {self._path}" if self._path else ""
+            lines.append(
+                f"… {hidden} more lines ({self.n_lines} lines, {_human(self.n_bytes)}{where}) – "
+                ":page [LINE], :search PATTERN, :fzf …"
+            )
+        lines.extend(_clip(line) for line in self.tail)
+        return "\n".join(lines)
+
+    def _open(self) -> IO[bytes]:
+        if self._file is not None:
+            self._file.flush()
+            return open(self._path, "rb")  # type: ignore[arg-type]  # own read position
+        import io
+
+        return io.BytesIO("".join(self._chunks).encode("utf-8"))
+
+    def iter_lines(self, start: int = 0) -> Iterator[str]:
+        """Yield lines from line *start* (0-based), seeking via the sparse index."""
+
+        start = max(0, start)
+        block = min(start // _INDEX_EVERY, len(self._index) - 1)
+        with self._open() as fh:
+            fh.seek(self._index[block])
+            lineno = block * _INDEX_EVERY
+            for raw in fh:
+                if lineno >= start:
+                    yield raw.decode("utf-8", "replace").rstrip("\n")
+                lineno += 1
+
+    def page(self, start: int = 0, count: int = 50) -> List[str]:
+        lines = []
+        for line in self.iter_lines(start):
+            lines.append(line)
+            if len(lines) >= count:
+                break
+        return lines
+
+    def search(self, pattern: str, limit: int = 50, ignore_case: bool = True) -> List[Tuple[int, str]]:
+        """Return up to *limit* ``(line number, line)`` matches of regex *pattern*."""
+
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        hits = []
+        for lineno, line in enumerate(self.iter_lines()):
+            if regex.search(line):
+                hits.append((lineno, _clip(line)))
+                if len(hits) >= limit:
+                    break
+        return hits
+
+    def text(self) -> str:
+        with self._open() as fh:
+            return fh.read().decode("utf-8", "replace")
+
+    # -- interactive -------------------------------------------------------
+
+    def fzf(self, query: str = "") -> Optional[List[Tuple[int, str]]]:
+        """Fuzzy-search the lines with ``fzf``; None if fzf is not installed."""
+
+        exe = shutil.which("fzf")
+        if exe is None:
+            return None
+        proc = subprocess.Popen(  # noqa: S603 – fixed argv
+            [exe, "--multi", "--no-sort", "--delimiter", "\t", "--with-nth", "2..", "--query", query],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+        try:
+            for lineno, line in enumerate(self.iter_lines()):
+                proc.stdin.write(f"{lineno}\t{line}\n".encode("utf-8"))
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass  # user picked or aborted before reading everything
+        selected = proc.stdout.read().decode("utf-8", "replace")
+        proc.wait()
+        picks = []
+        for entry in selected.splitlines():
+            lineno, _, line = entry.partition("\t")
+            picks.append((int(lineno), line))
+        return picks
+
+    def open_pager(self, line: int = 0) -> None:
+        """Show the whole output in ``$PAGER`` (``less`` by default) from *line*."""
+
+        self.finish()
+        pager = os.environ.get("PAGER", "less")
+        if self._path is not None:
+            subprocess.run([*pager.split(), f"+{line + 1}", str(self._path)], check=False)  # noqa: S603
+        else:
+            subprocess.run(pager.split(), input=self.text().encode("utf-8"), check=False)  # noqa: S603
+
+
+# ---------------------------------------------------------------------------
+# REPL commands
+# ---------------------------------------------------------------------------
+
+VIEW_COMMANDS = (":page", ":search", ":fzf")
+
+
+def view_command(text: str, view: Optional[SpillBuffer], page_size: int = 50) -> Optional[str]:
+    """Run a ``:page``/``:search``/``:fzf`` REPL command on *view*.
+
+    Returns the text to print, or None when *text* is not a view command.
+    ``:page`` without argument opens the pager; ``:page N`` prints a page
+    from line N.  ``:fzf`` falls back to the pager when fzf is missing.
+    """
+
+    command, _, arg = text.strip().partition(" ")
+    if command not in VIEW_COMMANDS:
+        return None
+    if view is None:
+        return "(no large output to view)"
+    arg = arg.strip()
+    if command == ":page":
+        if not arg:
+            view.open_pager()
+            return ""
+        try:
+            start = int(arg)
+        except ValueError:
+            return f"Error: :page expects a line number, got {arg!r}"
+        return "\n".join(f"{start + i:>7}  {line}" for i, line in enumerate(view.page(start, page_size)))
+    if command == ":search":
+        if not arg:
+            return "Error: :search expects a pattern"
+        try:
+            hits = view.search(arg, limit=page_size)
+        except re.error as exc:
+            return f"Error: bad pattern – {exc}"
+        return "\n".join(f"{lineno:>7}  {line}" for lineno, line in hits) or "(no match)"
+    picks = view.fzf(arg)
+    if picks is None:
+        view.open_pager()
+        return ""
+    return "\n".join(f"{lineno:>7}  {line}" for lineno, line in picks)
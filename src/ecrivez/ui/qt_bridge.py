@@ -0,0 +1,203 @@
+"""Bridge between the Qt UI and the (blocking) chat engine.
+
+Provider and tool calls never run on the Qt event loop.  :class:`ChatBridge`
+executes each turn through :func:`ecrivez.chat._process_input` on a worker
+thread (turns stay serialised, like in the REPL) and writes everything it
+produces into a :class:`FrameBuffer`:
+
+* shell commands run like in the REPL (``persistent_shell``,
+  ``shell_timeout``, exit codes reported); with the persistent shell their
+  output is streamed while the command runs;
+* providers with a ``stream_completion(messages)`` generator stream their
+  deltas, others appear when the reply is complete.
+
+:class:`FrameBuffer` is the only place that touches the widget.  Writers on
+any thread just append to a locked list; a ``QTimer`` on the GUI thread
+drains it once per frame (~60 Hz) with a single text insertion, so
+100k lines of output cost a few hundred widget updates instead of 100k and
+the UI keeps repainting.  Everything works with ``QT_QPA_PLATFORM=offscreen``
+and :class:`~ecrivez.chat.EchoProvider`.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterable, List
+
+from PyQt6.QtCore import QObject, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QPlainTextEdit
+
+from ecrivez.chat import BaseProvider, Message, _persistent_shell, _process_input
+from ecrivez.history import History
+from ecrivez.tools import run_shell
+
+__all__ = ["ChatBridge", "FrameBuffer"]
+
+
+class FrameBuffer(QObject):
+    """Thread-safe text sink applied to a ``QPlainTextEdit`` once per frame."""
+
+    def __init__(
+        self,
+        widget: QPlainTextEdit,
+        interval_ms: int = 16,
+        max_chars_per_frame: int = 1 << 18,
+        max_blocks: int = 50_000,
+    ) -> None:
+        super().__init__(widget)
+        self.widget = widget
+        self.max_chars_per_frame = max_chars_per_frame
+        self.updates = 0
+        self._pending: List[str] = []
+        self._size = 0
+        self._lock = threading.Lock()
+        widget.setMaximumBlockCount(max_blocks)  # old lines are dropped, memory stays bounded
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def write(self, text: str) -> None:
+        """Queue *text* for display (callable from any thread)."""
+
+        if text:
+            with self._lock:
+                self._pending.append(text)
+                self._size += len(text)
+
+    @property
+    def pending(self) -> int:
+        return self._size
+
+    def flush(self) -> None:
+        """Apply queued text to the widget (GUI thread only)."""
+
+        with self._lock:
+            if not self._pending:
+                return
+            text = "".join(self._pending)
+            chunk, rest = text[: self.max_chars_per_frame], text[self.max_chars_per_frame :]
+            self._pending = [rest] if rest else []
+            self._size = len(rest)
+        scrollbar = self.widget.verticalScrollBar()
+        follow = scrollbar.value() == scrollbar.maximum()
+        cursor = self.widget.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(chunk)
+        if follow:
+            scrollbar.setValue(scrollbar.maximum())
+        self.updates += 1
+
+    def stop(self) -> None:
+        self._timer.stop()
+        while self._pending:
+            self.flush()
+
+
+class _Streaming(BaseProvider):
+    """Provider wrapper writing ``stream_completion`` deltas as they arrive."""
+
+    def __init__(self, inner: Any, output: FrameBuffer) -> None:
+        self._inner = inner
+        self._output = output
+        self.streamed = False
+
+    @property
+    def name(self) -> str:  # noqa: D401
+        return self._inner.name
+
+    @property
+    def last_usage(self) -> Any:  # noqa: D401
+        return getattr(self._inner, "last_usage", None)
+
+    def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
+        stream = getattr(self._inner, "stream_completion", None)
+        if stream is None:
+            return self._inner.chat_completion(messages)
+        parts = []
+        self._output.write("llm › ")
+        for delta in stream(messages):
+            parts.append(delta)
+            self._output.write(delta)
+        self._output.write("\n")
+        self.streamed = True
+        return "".join(parts)
+
+
+class ChatBridge(QObject):
+    """Run chat turns off the GUI thread and stream their output to a widget."""
+
+    reply_ready = pyqtSignal(str)
+    busy_changed = pyqtSignal(bool)
+    _done = pyqtSignal(str)
+
+    def __init__(
+        self,
+        provider: BaseProvider,
+        output: FrameBuffer,
+        cfg: dict[str, Any] | None = None,
+        history: Iterable[Message] = (),
+    ) -> None:
+        super().__init__(output)
+        self.output = output
+        self.cfg = cfg or {}
+        self.history = History(history)
+        self._provider = _Streaming(provider, output)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ecrivez-qt")
+        self._busy = 0
+        self._streamed_tool = False
+        self._persistent = _persistent_shell(self.cfg, on_output=output.write)
+        # Always queued: the turn may even finish before submit() returns.
+        self._done.connect(self._on_done, Qt.ConnectionType.QueuedConnection)
+
+    def _shell(self, cmd: str) -> str:
+        """Run *cmd* like the REPL does, streaming its output when the shell is persistent."""
+
+        if not self.cfg.get("persistent_shell"):
+            return run_shell(cmd)  # shown with the reply
+        self._streamed_tool = True
+        return self._persistent(cmd)
+
+    def _run(self, text: str) -> str:
+        self._provider.streamed = False
+        self._streamed_tool = False
+        reply = _process_input(text, self.cfg, self._provider, self.history, shell=self._shell)
+        if not (self._provider.streamed or self._streamed_tool):
+            self.output.write(f"llm › {reply}\n")
+        return reply
+
+    def submit(self, text: str) -> Future[str]:
+        """Queue one turn; ``reply_ready`` is emitted (on the GUI thread) when done."""
+
+        self.output.write(f"you › {text}\n")
+        self._busy += 1
+        if self._busy == 1:
+            self.busy_changed.emit(True)
+        future = self._executor.submit(self._run, text)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future[str]) -> None:
+        # Runs on the worker thread: the signal is queued to the GUI thread.
+        try:
+            reply = future.result()
+        except Exception as exc:  # noqa: BLE001 – surface errors in the UI
+            reply = f"Error: {exc}"
+            self.output.write(reply + "\n")
+        self._done.emit(reply)
+
+    def _on_done(self, reply: str) -> None:
+        self._busy -= 1
+        self.reply_ready.emit(reply)
+        if self._busy == 0:
+            self.busy_changed.emit(False)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.output.stop()
+        if self.cfg.get("persistent_shell"):
+            from ecrivez.tools.shell import close_shell
+
+            close_shell(self.cfg.get("session_id", "default"))
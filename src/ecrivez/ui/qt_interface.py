@@ -6,6 +6,7 @@ from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWidgets import (
     QApplication,
     QHBoxLayout,
+    QLineEdit,
     QMainWindow,
     QPlainTextEdit,
     QSplitter,
@@ -17,6 +18,19 @@ from PyQt6.QtWidgets import (
 
 from qtermwidget import QTermWidget
 
+from ecrivez.ui.qt_bridge import ChatBridge, FrameBuffer
+
+
+def _provider_and_config():
+    """Project provider/config, or the echo provider outside a project."""
+    from ecrivez.chat import EchoProvider, _choose_provider, _load_config
+
+    try:
+        cfg = _load_config()
+        return _choose_provider(cfg), cfg
+    except SystemExit:
+        return EchoProvider(), {}
+
 
 class BrowserView(QWebEngineView):
     def keyPressEvent(self, event: QKeyEvent) -> None:
@@ -84,12 +98,25 @@ class BrowserTerminalApp(QMainWindow):
         # Since QPlainTextEdit doesn't have sendText, we'll skip the nvim command for now
         # self.nvim_terminal.sendText("nvim\n")
 
-        # Command prompt terminal
+        # Command prompt terminal: chat output plus an input line.  Turns run
+        # on a worker thread and output is applied once per frame.
         self.cmd_terminal = QPlainTextEdit()
+        self.cmd_terminal.setReadOnly(True)
         self.cmd_terminal.setStyleSheet("background-color: #002b36; color: #839496;")
+        self.cmd_input = QLineEdit()
+        self.cmd_input.setPlaceholderText("message, !command or JSON tool call")
+        provider, cfg = _provider_and_config()
+        self.chat = ChatBridge(provider, FrameBuffer(self.cmd_terminal), cfg)
+        self.cmd_input.returnPressed.connect(self.submitCommand)
+        self.chat.busy_changed.connect(lambda busy: self.cmd_input.setPlaceholderText("working…" if busy else ""))
+        self.cmd_panel = QWidget()
+        self.cmd_layout = QVBoxLayout(self.cmd_panel)
+        self.cmd_layout.setContentsMargins(0, 0, 0, 0)
+        self.cmd_layout.addWidget(self.cmd_terminal)
+        self.cmd_layout.addWidget(self.cmd_input)
 
         self.nvim_splitter.addWidget(self.nvim_terminal)
-        self.nvim_splitter.addWidget(self.cmd_terminal)
+        self.nvim_splitter.addWidget(self.cmd_panel)
         self.nvim_splitter.setStretchFactor(0, 3)  # Make nvim take more space
 
         self.tab2_layout.addWidget(self.nvim_splitter)
@@ -102,6 +129,16 @@ class BrowserTerminalApp(QMainWindow):
         # Window setup
         self.setGeometry(100, 100, 1200, 800)
 
+    def submitCommand(self):
+        text = self.cmd_input.text().strip()
+        if text:
+            self.cmd_input.clear()
+            self.chat.submit(text)
+
+    def closeEvent(self, event):
+        self.chat.close()
+        super().closeEvent(event)
+
     def setupVimBindings(self):
         pass  # Remove this as we're now handling keys in BrowserView
 
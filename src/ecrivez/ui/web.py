@@ -0,0 +1,222 @@
+"""Gradio web front end (``ecrivez web``) on top of ``_process_input``.
+
+Every browser session gets its own :class:`~ecrivez.history.History` (held
+in a ``gr.State``) and its own persistent shell (the Gradio session hash is
+used as ``session_id``), so users never see each other's turns or working
+directories.  The shell and Python kernel of a session are closed when its
+browser tab goes away (``Blocks.unload``, see :func:`close_session`).  All
+sessions share the provider and a bounded worker pool.
+
+Turns are streamed: providers with ``stream_completion`` push their deltas
+to the chat bubble as they arrive, anything else shows up when complete.
+Gradio's request queue bounds how many turns run at once
+(``concurrency``) and how many may wait (``max_queue``); each turn holds
+one slot only, so a long tool call never blocks other users.
+
+:func:`load_test` starts the app on a local port and drives it with many
+simultaneous :mod:`gradio_client` clients, reporting latency and
+throughput.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional
+
+from ecrivez.chat import BaseProvider, Message, _process_input
+from ecrivez.history import History
+
+__all__ = ["build_app", "close_session", "load_test", "make_handler"]
+
+_DONE = object()
+
+
+class _Deltas(BaseProvider):
+    """Per-turn provider wrapper forwarding streamed deltas to a queue."""
+
+    def __init__(self, inner: BaseProvider, sink: "queue.Queue[object]") -> None:
+        self._inner = inner
+        self._sink = sink
+
+    @property
+    def name(self) -> str:  # noqa: D401
+        return self._inner.name
+
+    @property
+    def last_usage(self) -> Any:  # noqa: D401
+        return getattr(self._inner, "last_usage", None)
+
+    def chat_completion(self, messages: List[Message]) -> str:  # noqa: D401
+        stream = getattr(self._inner, "stream_completion", None)
+        if stream is None:
+            return self._inner.chat_completion(messages)
+        parts = []
+        for delta in stream(messages):
+            parts.append(delta)
+            self._sink.put(delta)
+        return "".join(parts)
+
+    def stream_completion(self, messages: List[Message]) -> Iterator[str]:
+        yield self.chat_completion(messages)
+
+
+def _session_id(request: Any) -> str:
+    return f"web-{getattr(request, 'session_hash', None) or 'default'}"
+
+
+def close_session(request: Any) -> None:
+    """Close the persistent shell and kernel of the browser session of *request*."""
+
+    from ecrivez.tools.kernel import close_kernel
+    from ecrivez.tools.shell import close_shell
+
+    session_id = _session_id(request)
+    close_shell(session_id)
+    close_kernel(session_id)
+
+
+def make_handler(
+    provider: BaseProvider,
+    cfg: dict[str, Any] | None = None,
+    pool: ThreadPoolExecutor | None = None,
+    shell: Callable[[str], str] | None = None,
+) -> Callable[..., Iterator[tuple[str, list, Optional[History]]]]:
+    """Return the Gradio event handler ``(message, chat, history, request)``."""
+
+    cfg = dict(cfg or {})
+    pool = pool or ThreadPoolExecutor(max_workers=16, thread_name_prefix="ecrivez-web")
+
+    def respond(message: str, chat: list, history: Optional[History], request: Any = None):
+        history = history if history is not None else History()
+        chat = list(chat or []) + [{"role": "user", "content": message}, {"role": "assistant", "content": ""}]
+        if not message.strip():
+            chat.pop()
+            yield "", chat, history
+            return
+        turn_cfg = {**cfg, "session_id": _session_id(request)}
+        deltas: "queue.Queue[object]" = queue.Queue()
+        future = pool.submit(_process_input, message, turn_cfg, _Deltas(provider, deltas), history, shell)
+        future.add_done_callback(lambda _: deltas.put(_DONE))
+        streamed = []
+        while (delta := deltas.get()) is not _DONE:
+            streamed.append(delta)
+            # drain what is already there: one UI update per batch, not per token
+            while not deltas.empty():
+                more = deltas.get()
+                if more is _DONE:
+                    deltas.put(_DONE)
+                    break
+                streamed.append(more)
+            chat[-1] = {"role": "assistant", "content": "".join(streamed)}
+            yield "", chat, history
+        try:
+            reply = future.result()
+        except Exception as exc:  # noqa: BLE001 – shown to the user
+            reply = f"Error: {exc}"
+        chat[-1] = {"role": "assistant", "content": reply}
+        yield "", chat, history
+
+    return respond
+
+
+def build_app(
+    provider: BaseProvider,
+    cfg: dict[str, Any] | None = None,
+    concurrency: int = 16,
+    max_queue: int | None = 256,
+    shell: Callable[[str], str] | None = None,
+) -> Any:
+    """The Gradio ``Blocks`` app, with its queue configured."""
+
+    import gradio as gr
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ecrivez-web")
+    respond = make_handler(provider, cfg, pool, shell)
+
+    def handler(message: str, chat: list, history: Optional[History], request: gr.Request):
+        yield from respond(message, chat, history, request)
+
+    def unload(request: gr.Request) -> None:
+        close_session(request)
+
+    handler.__annotations__["request"] = gr.Request  # resolved, not a string: gradio injects by type
+    unload.__annotations__["request"] = gr.Request
+
+    with gr.Blocks(title="Ecrivez") as app:
+        gr.Markdown(f"### 🖋 Ecrivez – `{provider.name}`")
+        chat = gr.Chatbot(height=560)
+        history = gr.State(None)  # per browser session
+        box = gr.Textbox(placeholder="Message, !command or JSON tool call…", show_label=False)
+        box.submit(handler, [box, chat, history], [box, chat, history], api_name="chat", concurrency_limit=concurrency)
+        app.unload(unload)  # the visitor left: don't leak their bash and kernel
+    app.queue(max_size=max_queue, default_concurrency_limit=concurrency)
+    return app
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+def load_test(
+    provider: BaseProvider,
+    clients: int = 32,
+    turns: int = 5,
+    concurrency: int = 16,
+    cfg: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Serve the app locally and run *clients* simultaneous simulated users."""
+
+    from gradio_client import Client
+
+    app = build_app(provider, cfg, concurrency=concurrency, max_queue=None)
+    app.launch(server_name="127.0.0.1", prevent_thread_lock=True, quiet=True)
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    started = [0.0]
+    barrier = threading.Barrier(clients, action=lambda: started.__setitem__(0, time.perf_counter()))
+
+    def user(index: int) -> None:
+        client = Client(app.local_url, verbose=False)
+        barrier.wait()  # all clients start together
+        for turn in range(turns):
+            sent = time.perf_counter()
+            try:
+                _, chat = client.predict(f"client {index} turn {turn}", [], api_name="/chat")
+                content = chat[-1]["content"] if chat else ""
+                if isinstance(content, list):  # gradio 6 returns content parts
+                    content = "".join(part.get("text", "") for part in content)
+                ok = content.endswith(f"client {index} turn {turn}")
+            except Exception as exc:  # noqa: BLE001
+                ok, chat = False, str(exc)
+            with lock:
+                latencies.append(time.perf_counter() - sent)
+                if not ok:
+                    errors.append(f"client {index} turn {turn}: {chat!r}"[:200])
+        client.close()
+
+    try:
+        threads = [threading.Thread(target=user, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started[0]  # from the moment all clients are connected
+    finally:
+        app.close()
+    latencies.sort()
+    return {
+        "clients": clients,
+        "turns": len(latencies),
+        "elapsed": elapsed,
+        "turns_per_second": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency_p50": _percentile(latencies, 50),
+        "latency_p90": _percentile(latencies, 90),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "errors": errors,
+    }
@@ -0,0 +1,388 @@
+"""DAG workflow engine for multi-step agent tasks.
+
+A workflow is a set of named :class:`Step` objects, each declaring the steps
+it depends on.  :class:`Workflow` schedules every step as soon as its
+dependencies are done, running independent steps concurrently on a bounded
+pool, so the total time is the critical path rather than the sum of steps.
+
+Each step's *input hash* covers its kind, parameters and everything it
+receives (workflow inputs and dependency results).  Finished steps are appended to a JSONL checkpoint under that
+hash: re-running (or resuming an interrupted run) skips every step whose
+inputs did not change.
+
+Steps are provider calls, shell commands, file edits or arbitrary Python
+callables (sync callables run on worker threads, coroutine functions on the
+event loop)::
+
+    wf = Workflow(
+        [
+            provider_step("test", provider, "Write a failing pytest for: {task}"),
+            edit_step("write", "tests/test_feature.py", source="test", deps=["test"]),
+            shell_step("run", "pytest -x tests/test_feature.py", deps=["write"]),
+        ],
+        checkpoint=".ecrivez/workflows/feature.jsonl",
+        inputs={"task": "parse ISO dates"},
+    )
+    results = wf.run_sync()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+__all__ = [
+    "Step",
+    "Workflow",
+    "WorkflowError",
+    "edit_step",
+    "load_workflow",
+    "provider_step",
+    "shell_step",
+]
+
+
+class WorkflowError(RuntimeError):
+    """A step failed; ``results`` holds everything that finished before."""
+
+    def __init__(self, step: str, cause: BaseException, results: dict[str, Any]) -> None:
+        super().__init__(f"Step {step!r} failed: {cause}")
+        self.step = step
+        self.results = results
+
+
+class Step:
+    """One node of the DAG.
+
+    *fn* is called as ``fn(results, **params)`` where *results* maps the
+    names of the dependencies (and the workflow inputs) to their results.
+    *params* must be JSON-serialisable: they are part of the input hash.
+    """
+
+    __slots__ = ("name", "fn", "deps", "params", "kind")
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        deps: Iterable[str] = (),
+        params: dict[str, Any] | None = None,
+        kind: str = "python",
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.params = params or {}
+        self.kind = kind
+
+    def input_hash(self, args: dict[str, Any]) -> str:
+        """Hash of everything the step sees: kind, callable, params and *args*."""
+
+        payload = {
+            "kind": self.kind,
+            "fn": f"{self.fn.__module__}.{self.fn.__qualname__}",
+            "params": self.params,
+            "args": args,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=repr, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Built-in step kinds
+# ---------------------------------------------------------------------------
+
+
+def provider_step(name: str, provider: Any, prompt: str, deps: Iterable[str] = ()) -> Step:
+    """Ask *provider* for a completion of *prompt* (``str.format``-ed with results)."""
+
+    def call(results: dict[str, Any], prompt: str) -> str:
+        content = prompt.format_map(results)
+        return provider.chat_completion([{"role": "user", "content": content}])
+
+    return Step(name, call, deps, {"prompt": prompt}, kind=f"provider:{provider.name}")
+
+
+def shell_step(name: str, cmd: str, deps: Iterable[str] = ()) -> Step:
+    """Run *cmd* (``str.format``-ed with results); a non-zero exit fails the step.
+
+    Like :func:`~ecrivez.tools.run_shell` the command is split with
+    :mod:`shlex` and its combined output is the result – but a failure raises
+    instead of being returned, so it is never checkpointed as done.
+    """
+
+    def call(results: dict[str, Any], cmd: str) -> str:
+        completed = subprocess.run(  # noqa: S603 – workflow author's command
+            shlex.split(cmd.format_map(results)), capture_output=True, text=True
+        )
+        output = completed.stdout.strip()
+        if completed.stderr:
+            output += ("\n" if output else "") + completed.stderr.strip()
+        if completed.returncode != 0:
+            raise RuntimeError(f"exit code {completed.returncode}:\n{output}")
+        return output or "<no output>"
+
+    return Step(name, call, deps, {"cmd": cmd}, kind="shell")
+
+
+def edit_step(
+    name: str,
+    path: str | Path,
+    content: str | None = None,
+    source: str | None = None,
+    deps: Iterable[str] = (),
+) -> Step:
+    """Atomically write *content* – or the result of step *source* – to *path*.
+
+    The result is ``{"path": …, "sha256": …}`` (use ``{name[path]}`` in later
+    commands): the digest makes dependent steps re-run whenever the written
+    content changes.
+    """
+
+    deps = tuple(deps)
+    if source is not None and source not in deps:
+        deps += (source,)
+
+    def call(results: dict[str, Any], path: str, content: str | None, source: str | None) -> dict[str, str]:
+        text = str(results[source]) if source is not None else (content or "")
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(text)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return {"path": str(target), "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+
+    params = {"path": str(path), "content": content, "source": source}
+    return Step(name, call, deps, params, kind="edit")
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+
+class Workflow:
+    """Run a DAG of steps with bounded concurrency and memoised results."""
+
+    def __init__(
+        self,
+        steps: Iterable[Step],
+        max_concurrency: int = 4,
+        checkpoint: str | Path | None = None,
+        inputs: dict[str, Any] | None = None,
+    ) -> None:
+        self.steps: dict[str, Step] = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate step name: {step.name!r}")
+            self.steps[step.name] = step
+        self.inputs = dict(inputs or {})
+        self.max_concurrency = max(1, max_concurrency)
+        self.checkpoint = Path(checkpoint) if checkpoint is not None else None
+        self.order = self._toposort()
+        self.executed: list[str] = []
+        self.skipped: list[str] = []
+        self.timings: dict[str, float] = {}
+        self._memo = self._load_checkpoint()
+        self._task: asyncio.Task[Any] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _toposort(self) -> list[str]:
+        for step in self.steps.values():
+            for dep in step.deps:
+                if dep not in self.steps and dep not in self.inputs:
+                    raise ValueError(f"Step {step.name!r} depends on unknown {dep!r}")
+        order: list[str] = []
+        state: dict[str, int] = {}  # 1 = visiting, 2 = done
+
+        def visit(name: str) -> None:
+            if state.get(name) == 2 or name not in self.steps:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in workflow at step {name!r}")
+            state[name] = 1
+            for dep in self.steps[name].deps:
+                visit(dep)
+            state[name] = 2
+            order.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return order
+
+    def _load_checkpoint(self) -> dict[str, Any]:
+        memo: dict[str, Any] = {}
+        if self.checkpoint is None or not self.checkpoint.exists():
+            return memo
+        with self.checkpoint.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from an interrupted run
+                memo[entry["key"]] = entry["result"]
+        return memo
+
+    def _save(self, name: str, key: str, result: Any) -> None:
+        self._memo[key] = result
+        if self.checkpoint is None:
+            return
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "step": name, "result": result, "ts": time.time()}
+        with self.checkpoint.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def _args(self, step: Step, results: dict[str, Any]) -> dict[str, Any]:
+        return {**self.inputs, **{d: results[d] for d in step.deps}}
+
+    async def _execute(
+        self, step: Step, args: dict[str, Any], pool: ThreadPoolExecutor, gate: asyncio.Semaphore
+    ) -> Any:
+        async with gate:
+            start = time.perf_counter()
+            if inspect.iscoroutinefunction(step.fn):
+                result = await step.fn(args, **step.params)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(pool, functools.partial(step.fn, args, **step.params))
+            self.timings[step.name] = time.perf_counter() - start
+        return result
+
+    async def run(self) -> dict[str, Any]:
+        """Run every step; return ``{step name: result}``.
+
+        Raises :class:`WorkflowError` on the first failing step (in-flight
+        steps are cancelled, finished ones – including those that completed
+        together with the failing one – stay checkpointed).
+        """
+
+        self._task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        results: dict[str, Any] = dict(self.inputs)
+        remaining = {name: set(self.steps[name].deps) - set(self.inputs) for name in self.order}
+        running: dict[asyncio.Task[Any], tuple[str, str]] = {}
+        gate = asyncio.Semaphore(self.max_concurrency)
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ecrivez-step")
+
+        def finish(name: str) -> list[str]:
+            """Mark *name* done and return the steps that became ready."""
+
+            ready = []
+            for other, deps in remaining.items():
+                if name in deps:
+                    deps.discard(name)
+                    if not deps:
+                        ready.append(other)
+            return ready
+
+        def launch(ready: list[str]) -> None:
+            while ready:
+                name = ready.pop()
+                del remaining[name]
+                step = self.steps[name]
+                args = self._args(step, results)
+                key = step.input_hash(args)
+                if key in self._memo:
+                    results[name] = self._memo[key]
+                    self.skipped.append(name)
+                    ready.extend(finish(name))
+                    continue
+                task = asyncio.ensure_future(self._execute(step, args, pool, gate))
+                running[task] = (name, key)
+
+        try:
+            launch([n for n, deps in remaining.items() if not deps])
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                failed: tuple[str, Exception] | None = None
+                ready: list[str] = []
+                for task in done:
+                    name, key = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as exc:
+                        failed = failed or (name, exc)
+                        continue
+                    results[name] = result
+                    self.executed.append(name)
+                    self._save(name, key, result)  # checkpointed even if a sibling failed
+                    ready.extend(finish(name))
+                if failed is not None:
+                    partial = {k: v for k, v in results.items() if k in self.steps}
+                    raise WorkflowError(failed[0], failed[1], partial) from failed[1]
+                launch(ready)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._task = None
+        return {name: results[name] for name in self.order}
+
+    def run_sync(self) -> dict[str, Any]:
+        return asyncio.run(self.run())
+
+    def cancel(self) -> None:
+        """Cancel a running workflow (safe to call from any thread)."""
+
+        if self._task is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+
+# ---------------------------------------------------------------------------
+# Declarative specs
+# ---------------------------------------------------------------------------
+
+
+def load_workflow(
+    spec: dict[str, Any],
+    provider: Any = None,
+    checkpoint: str | Path | None = None,
+    max_concurrency: int | None = None,
+) -> Workflow:
+    """Build a :class:`Workflow` from a YAML/JSON-style mapping::
+
+        inputs: {task: "parse ISO dates"}
+        steps:
+          - {name: test, prompt: "Write a failing pytest for: {task}"}
+          - {name: write, edit: tests/test_dates.py, source: test}
+          - {name: run, shell: "pytest -x tests/test_dates.py", deps: [write]}
+    """
+
+    steps: list[Step] = []
+    for entry in spec.get("steps", []):
+        name = entry["name"]
+        deps = entry.get("deps", [])
+        if "prompt" in entry:
+            if provider is None:
+                raise ValueError(f"Step {name!r} needs a provider")
+            steps.append(provider_step(name, provider, entry["prompt"], deps))
+        elif "shell" in entry:
+            steps.append(shell_step(name, entry["shell"], deps))
+        elif "edit" in entry:
+            steps.append(edit_step(name, entry["edit"], entry.get("content"), entry.get("source"), deps))
+        else:
+            raise ValueError(f"Step {name!r} needs one of 'prompt', 'shell' or 'edit'")
+    return Workflow(
+        steps,
+        max_concurrency=max_concurrency or spec.get("max_concurrency", 4),
+        checkpoint=checkpoint,
+        inputs=spec.get("inputs"),
+    )
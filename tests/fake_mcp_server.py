@@ -0,0 +1,59 @@
+"""Minimal stdio MCP server used by test_mcp.py.
+
+Usage: ``python fake_mcp_server.py VERSION [SPAWN_LOG]``.  Each start appends
+a line to SPAWN_LOG; ``tools/call`` requests are answered on threads so
+concurrent calls overlap.
+"""
+
+import json
+import sys
+import threading
+import time
+
+VERSION = sys.argv[1] if len(sys.argv) > 1 else "1.0"
+if len(sys.argv) > 2:
+    with open(sys.argv[2], "a") as fh:
+        fh.write("spawn\n")
+
+TOOLS = [
+    {"name": "echo", "description": "Echo text", "inputSchema": {"type": "object"}},
+    {"name": "sleep", "description": "Sleep then answer", "inputSchema": {"type": "object"}},
+]
+lock = threading.Lock()
+
+
+def send(message):
+    with lock:
+        sys.stdout.write(json.dumps({"jsonrpc": "2.0", **message}) + "\n")
+        sys.stdout.flush()
+
+
+def call(request):
+    args = request["params"].get("arguments", {})
+    name = request["params"]["name"]
+    if name == "sleep":
+        time.sleep(args.get("seconds", 0.2))
+        text = f"slept {args.get('seconds', 0.2)}"
+    elif name == "echo":
+        text = args.get("text", "")
+    else:
+        send({"id": request["id"], "error": {"code": -32602, "message": f"no tool {name}"}})
+        return
+    send({"id": request["id"], "result": {"content": [{"type": "text", "text": text}]}})
+
+
+for line in sys.stdin:
+    request = json.loads(line)
+    method = request.get("method")
+    if method == "initialize":
+        send({"id": request["id"], "result": {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {"tools": {}},
+            "serverInfo": {"name": "fake", "version": VERSION},
+        }})
+    elif method == "tools/list":
+        send({"id": request["id"], "result": {"tools": TOOLS}})
+    elif method == "tools/call":
+        threading.Thread(target=call, args=(request,)).start()
+    elif "id" in request:
+        send({"id": request["id"], "error": {"code": -32601, "message": method}})
@@ -0,0 +1,87 @@
+import json
+import threading
+
+import pytest
+
+from ecrivez.batch import BatchJob, parse_item
+from ecrivez.chat import EchoProvider
+
+
+def _prompts(path, n, start=0):
+    with path.open("a") as fh:
+        for i in range(start, start + n):
+            fh.write(json.dumps({"id": f"p{i}", "prompt": f"prompt {i}"}) + "\n")
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class CrashingProvider(EchoProvider):
+    """Echo, but simulate a crash (KeyboardInterrupt) on the n-th call."""
+
+    def __init__(self, crash_at):
+        self.calls = 0
+        self.crash_at = crash_at
+        self.lock = threading.Lock()
+
+    def chat_completion(self, messages):
+        with self.lock:
+            self.calls += 1
+            if self.calls == self.crash_at:
+                raise KeyboardInterrupt
+        return super().chat_completion(messages)
+
+
+def test_parse_item():
+    assert parse_item(3, '"hi"') == {"line": 3, "id": "3", "messages": [{"role": "user", "content": "hi"}]}
+    item = parse_item(0, '{"id": "x", "prompt": "p", "system": "s"}')
+    assert [m["role"] for m in item["messages"]] == ["system", "user"]
+    with pytest.raises(ValueError):
+        parse_item(0, "[1, 2]")
+
+
+def test_batch_runs_and_reports_progress(tmp_path):
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _prompts(src, 200)
+    with src.open("a") as fh:
+        fh.write("\n{not json\n")
+    seen = []
+    stats = BatchJob(src, out, EchoProvider(), concurrency=16).run(progress=seen.append)
+    assert (stats["done"], stats["failed"], stats["skipped"], stats["total"]) == (200, 0, 0, 202)
+    assert len(seen) == 200 and seen[-1]["eta"] == 0
+    records = _records(out)
+    assert sorted(r["id"] for r in records if "reply" in r) == sorted(f"p{i}" for i in range(200))
+    errors = [r for r in records if "error" in r]
+    assert [(r["line"], r["permanent"]) for r in errors] == [(201, True)]
+    assert errors[0]["error"].startswith("invalid item")
+    checkpoint = json.loads((tmp_path / "out.jsonl.ckpt").read_text())
+    assert checkpoint["watermark"] == 202 and checkpoint["done"] == []
+
+    # appended prompts: only the new ones are processed, starting at the saved offset
+    _prompts(src, 10, start=200)
+    stats = BatchJob(src, out, EchoProvider()).run()
+    assert (stats["done"], stats["skipped"]) == (10, 202)
+
+
+def test_crashed_job_resumes_without_redoing_items(tmp_path):
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _prompts(src, 100)
+    with pytest.raises(KeyboardInterrupt):
+        BatchJob(src, out, CrashingProvider(crash_at=40), concurrency=4, checkpoint_every=0).run()
+    first = {r["id"] for r in _records(out) if "reply" in r}
+    assert 30 <= len(first) < 100
+
+    # a torn record and a stale checkpoint, as after a hard crash
+    checkpoint = out.with_name("out.jsonl.ckpt")
+    state = json.loads(checkpoint.read_text())
+    state.update(watermark=0, offset=0, done=[], output_bytes=0)
+    checkpoint.write_text(json.dumps(state))
+    with out.open("a") as fh:
+        fh.write('{"id": "p99", "line": 99, "rep')
+
+    stats = BatchJob(src, out, EchoProvider(), concurrency=4).run()
+    assert stats["skipped"] == len(first)
+    assert stats["done"] == 100 - len(first)
+    ids = [r["id"] for r in _records(out) if "reply" in r]
+    assert sorted(ids) == sorted(f"p{i}" for i in range(100))  # each item exactly once
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from ecrivez.tools.candidates import best_of, extract_diff
+
+
+def _diff(body):
+    return f"```diff\n--- a/mod.py\n+++ b/mod.py\n@@ -1,2 +1,2 @@\n import time\n-def check(): return 1\n+{body}\n```"
+
+
+REPLIES = [
+    "--- a/mod.py\n+++ b/mod.py\n@@ -1 +1 @@\n-not in the file\n+x\n",  # does not apply
+    _diff("def check(): time.sleep(60); return 1"),  # slow and wrong
+    _diff("def check(): return 0"),  # correct
+    _diff("def check(): return 3"),  # fast and wrong
+]
+
+
+class ScriptedProvider:
+    name = "scripted"
+
+    def __init__(self, replies, delays):
+        self.replies, self.delays = list(replies), list(delays)
+        self.lock = threading.Lock()
+
+    def chat_completion(self, messages):
+        with self.lock:
+            reply, delay = self.replies.pop(0), self.delays.pop(0)
+        time.sleep(delay)
+        return reply
+
+
+@pytest.fixture
+def repo(tmp_path):
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    git("init", "-q")
+    (tmp_path / "mod.py").write_text("import time\ndef check(): return 1\n")
+    git("add", "mod.py")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    return tmp_path
+
+
+def test_extract_diff():
+    assert extract_diff("Here:\n```diff\n--- a/x\n+++ b/x\n```\nbye") == "--- a/x\n+++ b/x\n"
+    assert extract_diff("--- a/x\n+++ b/x") == "--- a/x\n+++ b/x\n"
+
+
+def test_first_passing_candidate_wins_and_others_are_cancelled(repo):
+    provider = ScriptedProvider(REPLIES, [0.0, 0.0, 1.0, 0.0])
+    cmd = f'{sys.executable} -c "import sys, mod; sys.exit(mod.check())"'
+    result = best_of(provider, "make check() pass", n=4, test_cmd=cmd, root=repo, workers=4, timeout=120)
+
+    status = {c["diff"].splitlines()[-1] if c["diff"] else "": c["status"] for c in result["candidates"]}
+    assert status == {
+        "+x": "invalid",
+        "+def check(): time.sleep(60); return 1": "cancelled",
+        "+def check(): return 0": "passed",
+        "+def check(): return 3": "failed",
+    }
+    assert result["candidates"][result["winner"]]["status"] == "passed"
+    assert result["duration"] < 30  # the slow candidate was killed, not awaited
+    assert (repo / "mod.py").read_text() == "import time\ndef check(): return 0\n"
+    worktrees = subprocess.run(["git", "worktree", "list"], cwd=repo, capture_output=True, text=True).stdout
+    assert len(worktrees.splitlines()) == 1
+    assert not any((repo / ".ecrivez" / "worktrees").iterdir())
+
+
+def test_no_winner_leaves_tree_untouched(repo):
+    (repo / "mod.py").write_text("import time\ndef check(): return 1\n# local edit\n")
+    provider = ScriptedProvider([REPLIES[3]], [0.0])
+    cmd = f'{sys.executable} -c "import sys, mod; sys.exit(mod.check())"'
+    result = best_of(provider, "task", n=1, test_cmd=cmd, root=repo)
+    assert result["winner"] is None
+    assert result["candidates"][0]["returncode"] == 3
+    assert (repo / "mod.py").read_text().endswith("# local edit\n")
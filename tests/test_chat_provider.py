@@ -52,4 +52,32 @@ def test_choose_openai_with_key(monkeypatch):
 def test_choose_echo_when_no_pkg():
     cfg = {"model": "gpt-4o", "provider": "echo"}
     provider = _choose_provider(cfg)
-    assert provider.name == "echo"
\ No newline at end of file
+    assert provider.name == "echo"
+
+
+def test_openai_stream_sends_cache_key_and_reports_usage():
+    from types import SimpleNamespace
+
+    from ecrivez.chat import OpenAIProvider
+
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        delta = lambda text: SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)  # noqa: E731
+        usage = SimpleNamespace(prompt_tokens=1200, prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+        return iter([delta("hel"), delta("lo"), SimpleNamespace(choices=[], usage=usage)])
+
+    module = ModuleType("openai")
+    module.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+    sys.modules["openai"] = module
+    provider = OpenAIProvider("gpt-4o")
+    provider.cache_key = "session-1"
+    provider.last_usage = {"prompt_tokens": 1, "cached_tokens": 0}  # from an earlier turn
+
+    stream = provider.stream_completion([{"role": "user", "content": "hi"}])
+    assert next(stream) == "hel" and provider.last_usage is None
+    assert "".join(stream) == "lo"
+    assert provider.last_usage == {"prompt_tokens": 1200, "cached_tokens": 1024}
+    assert calls[0]["extra_body"] == {"prompt_cache_key": "session-1"}
+    assert calls[0]["stream_options"] == {"include_usage": True}
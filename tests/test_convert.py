@@ -0,0 +1,102 @@
+import io
+import json
+
+from click.testing import CliRunner
+
+from ecrivez.cli import ecrivez
+from ecrivez.session.convert import convert, read_records
+from ecrivez.session.jsonld import _template
+
+RECORDS = [
+    {"role": "system", "content": "Be terse.", "ts": 1700000000.0, "tokens": 3},
+    {"role": "user", "content": "### assistant\nnot a heading\n\\## user too", "ts": 1700000001.5, "tokens": 9},
+    {"role": "assistant", "content": "Here:\n\n```\n{\"n\": 12345}\n```", "ts": 1700000002.0, "tokens": 12},
+]
+
+
+def _jsonl(records):
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+
+def _run(text, src, dst, **kwargs):
+    out = io.StringIO()
+    count = convert(io.StringIO(text), out, src, dst, **kwargs)
+    return count, out.getvalue()
+
+
+def test_round_trip_through_jsonld_and_markdown():
+    count, jsonld = _run(_jsonl(RECORDS), "jsonl", "jsonld", session_id="abc", model="gpt-4o")
+    assert count == 3
+    assert json.loads(jsonld)["model"][0]["message_ids"] == ["abc#2"]
+
+    _, markdown = _run(jsonld, "jsonld", "md")
+    assert markdown.startswith("# Session abc\n")
+    assert "\n\\### assistant\n" in markdown  # content line escaped, not a new message
+
+    _, back = _run(markdown, "markdown", "json")
+    assert [json.loads(line) for line in back.splitlines()] == [
+        {k: v for k, v in r.items() if k != "tokens"} for r in RECORDS
+    ]
+
+
+class Trickle(io.StringIO):
+    def read(self, size=-1):
+        return super().read(5)  # every value spans several reads
+
+
+def test_jsonld_is_decoded_across_tiny_reads():
+    _, jsonld = _run(_jsonl(RECORDS), "jsonl", "jsonld", session_id="abc")
+    meta = {}
+    records = list(read_records(Trickle(jsonld), "jsonld", meta))
+    assert [r["content"] for r in records] == [r["content"] for r in RECORDS]
+    assert records[1]["ts"] == 1700000001.5 and meta["session"] == "abc"
+
+
+class Counting(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+
+def test_malformed_jsonld_fails_without_reading_on():
+    import pytest
+
+    from ecrivez.session.convert import ConvertError
+
+    text = '{"messages": [{"role": "user", "content": "a"}, {role: 1}' + " " * (8 << 20)
+    source = Counting(text)
+    with pytest.raises(ConvertError, match="invalid JSON"):
+        list(read_records(source, "jsonld"))
+    assert source.consumed <= 1 << 17  # one or two reads, not the whole input
+
+
+def test_message_ids_of_every_assistant_turn():
+    turns = [{"role": "user" if i % 2 == 0 else "assistant", "content": str(i)} for i in range(7)]
+    _, jsonld = _run(_jsonl(turns), "jsonl", "jsonld", session_id="s")
+    model = json.loads(jsonld)["model"][0]
+    assert model["message_ids"] == ["s#1", "s#3", "s#5"] and model["name"] == ""
+
+
+def test_bundled_template_is_readable():
+    meta = {}
+    records = list(read_records(io.StringIO(json.dumps(_template())), "jsonld", meta))
+    assert records == [{"role": "user", "content": "Hello, how are you?"}]
+    assert meta["model"] == "llama3.1" and meta["provider"] == "Ollama"
+
+
+def test_cli_streams_large_input_with_tee(tmp_path):
+    source = tmp_path / "sess-1.jsonl"
+    source.write_text(_jsonl({"role": "user", "content": f"message {i}"} for i in range(5000)), encoding="utf-8")
+    tee = tmp_path / "copy.md"
+    result = CliRunner().invoke(ecrivez, ["convert", str(source), "--to", "md", "--tee", str(tee)])
+    assert result.exit_code == 0, result.output
+    assert result.output == tee.read_text(encoding="utf-8")
+    assert result.output.startswith("# Session sess-1\n") and result.output.count("### user") == 5000
+
+    bad = CliRunner().invoke(ecrivez, ["convert", "--from", "jsonl"], input='{"role": "user"}\n')
+    assert bad.exit_code != 0 and "line 1" in bad.output
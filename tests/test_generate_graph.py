@@ -0,0 +1,81 @@
+import io
+import json
+import re
+
+from ecrivez.ui.generate_graph import _iter_json, generate_html, iter_graph, write_html
+
+YAML_GRAPH = """\
+title: demo
+nodes:
+  - {id: 1, label: "</script><b>", ok: yes}
+  - id: 2
+    label: two
+edges:
+  - {from: 1, to: 2}
+"""
+
+
+def _added(html, target):
+    found = []
+    for chunk in re.findall(rf"{target}\.add\((.*?)\);</script>", html):
+        found.extend(json.loads(chunk.replace("<\\/", "</")))
+    return found
+
+
+def test_generate_html_embeds_json_safely():
+    html = generate_html(YAML_GRAPH)
+    assert "</script><b>" not in html
+    assert _added(html, "nodes") == [{"id": 1, "label": "</script><b>", "ok": True}, {"id": 2, "label": "two"}]
+    assert _added(html, "edges") == [{"from": 1, "to": 2}]
+
+
+def test_json_and_yaml_stream_the_same_items(tmp_path):
+    data = {"meta": {"n": [1, 2.5]}, "nodes": [{"id": i} for i in range(50)], "edges": [{"from": 0, "to": 1}]}
+    path = tmp_path / "g.json"
+    path.write_text(json.dumps(data, indent=1))
+    items = list(iter_graph(path))
+    assert items[:2] == [("node", {"id": 0}), ("node", {"id": 1})]
+    assert items[-1] == ("edge", {"from": 0, "to": 1})
+
+    # A tiny read buffer exercises refills in the middle of values.
+    assert list(_iter_json(io.StringIO(json.dumps(data)), chunk=7)) == items
+
+
+def test_yaml_flow_mapping_is_not_read_as_json(tmp_path):
+    flow = "{nodes: [{id: 1}, {id: 2}], edges: [{from: 1, to: 2}]}"
+    expected = [("node", {"id": 1}), ("node", {"id": 2}), ("edge", {"from": 1, "to": 2})]
+    assert list(iter_graph(flow)) == expected
+    for name in ("g.yaml", "g.txt"):
+        path = tmp_path / name
+        path.write_text(flow)
+        assert list(iter_graph(path)) == expected
+
+
+def test_large_graph_is_chunked_and_laid_out():
+    def source():
+        for i in range(300):
+            yield "node", {"id": i, "group": f"g{i % 3}"}
+        for i in range(299):
+            yield "edge", {"from": i, "to": i + 1}
+
+    out = io.StringIO()
+    counts = write_html(source, out, threshold=100, chunk_size=64)
+    html = out.getvalue()
+    assert counts == {"nodes": 300, "edges": 299}
+    nodes = _added(html, "nodes")
+    assert len(nodes) == 300 and html.count("nodes.add(") == 5
+    assert all("x" in n and "y" in n for n in nodes)
+    assert '"physics":{"enabled":false}' in html
+
+    clustered = io.StringIO()
+    counts = write_html(source, clustered, mode="cluster")
+    assert counts == {"nodes": 3, "edges": 3}
+    assert {n["value"] for n in _added(clustered.getvalue(), "nodes")} == {100}
+
+
+def test_data_file_mode(tmp_path):
+    out = io.StringIO()
+    write_html(YAML_GRAPH, out, data_file=tmp_path / "g.ndjson")
+    lines = (tmp_path / "g.ndjson").read_text().splitlines()
+    assert json.loads(lines[-1]) == ["edge", {"from": 1, "to": 2}]
+    assert 'fetch("g.ndjson")' in out.getvalue()
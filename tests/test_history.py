@@ -0,0 +1,113 @@
+from ecrivez.chat import EchoProvider, _process_input
+from ecrivez.history import History
+
+
+def _pytest_log(duration: str) -> str:
+    lines = [f"tests/test_mod_{i}.py::test_case PASSED" for i in range(400)]
+    return "\n".join([*lines, f"===== 400 passed in {duration}s ====="])
+
+
+def test_small_outputs_are_kept_verbatim():
+    history = History()
+    history.add_tool_output("ls", "a\nb")
+    assert history == [{"role": "assistant", "content": "a\nb"}]
+
+
+def test_repeated_outputs_are_stored_once_and_rendered_compactly():
+    history = History(threshold=1024, budget=1024)
+    log = _pytest_log("1.00")
+
+    first = history.add_tool_output("pytest", log)
+    assert len(first["content"]) < 1200
+    assert "lines omitted" in first["content"]
+    assert history.expand(first)["content"] == log
+
+    again = history.add_tool_output("pytest", log)
+    assert "identical to the previous output" in again["content"]
+    assert again["ref"] == first["ref"]
+    assert history.stored_bytes == len(log)
+
+    changed = history.add_tool_output("pytest", _pytest_log("2.00"))
+    assert "-===== 400 passed in 1.00s" in changed["content"]
+    assert "+===== 400 passed in 2.00s" in changed["content"]
+
+
+def test_memory_cap_keeps_latest_output_per_command():
+    history = History(threshold=10, max_bytes=100)
+    for i in range(20):
+        history.add_tool_output(f"cmd{i % 2}", f"{i:03d}" + "x" * 40)
+    assert history.stored_bytes <= 100
+    assert history.output(history[-1]["ref"]) is not None
+
+
+def test_memory_cap_holds_across_many_commands():
+    history = History(threshold=10, max_bytes=100)
+    for i in range(50):
+        history.add_tool_output(f"cmd{i}", f"{i:03d}" + "x" * 40)
+    assert history.stored_bytes <= 100
+    assert len(history._latest) <= 2
+    assert history.output(history[-1]["ref"]) is not None
+    assert history.output(history[0]["ref"]) is None
+
+    again = history.add_tool_output("cmd0", "000" + "x" * 40)  # evicted: rendered in full
+    assert "previous output" not in again["content"]
+
+
+def test_process_input_stores_shell_output_by_reference():
+    history = History(threshold=100, budget=200)
+    reply = _process_input("!seq 1 500", {}, EchoProvider(), history)
+
+    assert reply.splitlines()[-1] == "500"
+    assert history[-1]["ref"]
+    assert len(history[-1]["content"]) < len(reply)
+
+
+def test_compact_history_behaves_like_a_list():
+    history = History([{"role": "system", "content": "sys"}, {"role": "user", "content": "héllo ✓"}])
+    history.append({"role": "assistant", "content": "hi", "ref": "abc"})
+    assert history[1] == {"role": "user", "content": "héllo ✓"}
+    assert history[-1]["ref"] == "abc" and history[:1] == [{"role": "system", "content": "sys"}]
+
+    history[1] = {"role": "user", "content": "bye"}
+    history.insert(0, {"role": "critic", "content": "new role"})
+    del history[2]
+    assert [m["content"] for m in history] == ["new role", "sys", "hi"]
+    assert history[2]["ref"] == "abc"
+    assert history.pop()["content"] == "hi" and len(history) == 2
+
+
+def test_request_view_matches_build_request_layout_and_meter():
+    from ecrivez.prefix import PromptMeter, build_request
+
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "q"}]
+    history = History(messages)
+    assert build_request(history, context="ctx") == build_request(messages, context="ctx")
+
+    compact, plain = PromptMeter(), PromptMeter()
+    for turn in range(5):
+        for m in ({"role": "user", "content": f"question {turn} " * 20}, {"role": "assistant", "content": "ok"}):
+            history.append(m)
+            messages.append(m)
+        assert compact.measure(build_request(history, "ctx")) == plain.measure(build_request(messages, "ctx"))
+    history[0] = {"role": "system", "content": "changed"}  # not an append: falls back to digests
+    messages[0] = history[0]
+    assert compact.measure(build_request(history, "ctx")) == plain.measure(build_request(messages, "ctx"))
+
+
+def test_compact_history_uses_less_memory_than_dicts():
+    import tracemalloc
+
+    turns = [
+        {"role": "user" if i % 2 else "assistant", "content": f"message number {i} " + "x" * (i % 50)}
+        for i in range(20000)
+    ]
+    tracemalloc.start()
+    as_dicts = [dict(m, content="".join(m["content"])) for m in turns]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    compact = History(turns)
+    compact_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert compact == as_dicts
+    assert compact_bytes < dict_bytes / 2
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+pytest.importorskip("ipykernel")
+pytest.importorskip("jupyter_client")
+
+from ecrivez.chat import EchoProvider, _process_input  # noqa: E402
+from ecrivez.history import History  # noqa: E402
+from ecrivez.tools import kernel as kernel_mod  # noqa: E402
+from ecrivez.tools.kernel import PythonKernel  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def kernel():
+    k = PythonKernel()
+    yield k
+    k.shutdown()
+
+
+def test_state_persists_and_output_streams(kernel):
+    assert kernel.execute("import json\nx = 41")["status"] == "ok"
+    chunks = []
+    result = kernel.execute("print('a', flush=True)\nx + 1", on_output=chunks.append)
+    assert result["status"] == "ok"
+    assert result["output"] == "a\n42\n"
+    assert chunks == ["a\n", "42\n"]
+    # warm call: no interpreter start or import cost
+    assert kernel.execute("json.dumps({'x': x})")["duration"] < 1.0
+
+
+def test_errors_timeouts_and_crashes(kernel):
+    error = kernel.execute("1 / 0")
+    assert error["status"] == "error" and "ZeroDivisionError" in error["output"]
+    assert "\x1b[" not in error["output"]
+
+    kernel.execute("y = 'kept'")
+    timed_out = kernel.execute("import time\ntime.sleep(30)", timeout=1)
+    assert timed_out["status"] == "timeout" and timed_out["duration"] < 10
+    assert kernel.execute("y")["output"] == "'kept'\n"  # interrupt keeps state
+
+    crashed = kernel.execute("import os\nos._exit(1)")
+    assert crashed["status"] == "restarted" and kernel.restarts == 1
+    after = kernel.execute("'y' in dir()")
+    assert after["status"] == "ok" and after["output"] == "False\n"
+
+
+def test_python_json_tool(monkeypatch, kernel):
+    monkeypatch.setattr(kernel_mod, "_KERNELS", {"default": kernel})
+    history = History()
+    call = {"type": "tool", "tool": "python", "code": "sum(range(10))"}
+    assert _process_input(json.dumps(call), {}, EchoProvider(), history) == "45"
+
+
+def test_python_json_tool_uses_the_session_kernel(monkeypatch, kernel):
+    monkeypatch.setattr(kernel_mod, "_KERNELS", {"s1": kernel})
+    call = {"type": "tool", "tool": "python", "code": "6 * 7", "session": "other"}
+    assert _process_input(json.dumps(call), {"session_id": "s1"}, EchoProvider(), History()) == "42"
+    assert list(kernel_mod._KERNELS) == ["s1"]
+
+
+def test_printing_snippet_is_interrupted_and_output_capped(monkeypatch, kernel):
+    monkeypatch.setattr(kernel_mod, "MAX_OUTPUT", 1000)
+    seen = []
+    loop = "import time\nwhile True:\n    print('x' * 50, flush=True)\n    time.sleep(0.01)"
+    result = kernel.execute(loop, timeout=2, on_output=seen.append)
+    assert result["status"] == "timeout" and result["duration"] < 10
+    assert result["output"].startswith("[") and "characters truncated]" in result["output"].splitlines()[0]
+    assert len(result["output"]) < 1100 < sum(map(len, seen))
+    assert result["output"].endswith("[interrupted after 2s]\n")
@@ -0,0 +1,104 @@
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from ecrivez.config.mcp import DefaultMCP, MCPError, MCPPool, MCPServerConfig, format_result
+
+FAKE = str(Path(__file__).with_name("fake_mcp_server.py"))
+
+
+def _pool(tmp_path, version="1.0"):
+    server = MCPServerConfig(command=[sys.executable, FAKE, version, str(tmp_path / "spawns")])
+    return MCPPool(DefaultMCP(servers={"fake": server}, cache_dir=tmp_path / "cache", timeout=5))
+
+
+def _spawns(tmp_path):
+    path = tmp_path / "spawns"
+    return len(path.read_text().splitlines()) if path.exists() else 0
+
+
+def test_calls_reuse_one_process_and_run_concurrently(tmp_path):
+    pool = _pool(tmp_path)
+    try:
+        assert format_result(pool.call("fake", "echo", {"text": "hi"})) == "hi"
+        start = time.perf_counter()
+        with ThreadPoolExecutor(8) as ex:
+            results = list(ex.map(lambda _: pool.call("fake", "sleep", {"seconds": 0.3}), range(8)))
+        assert time.perf_counter() - start < 1.5  # 8 × 0.3 s would be 2.4 s
+        assert all(format_result(r) == "slept 0.3" for r in results)
+        assert _spawns(tmp_path) == 1
+    finally:
+        pool.close()
+
+
+def test_tool_schemas_come_from_cache_without_spawning(tmp_path):
+    first = _pool(tmp_path)
+    assert [t["name"] for t in first.tools("fake")] == ["echo", "sleep"]
+    first.close()
+    assert _spawns(tmp_path) == 1
+
+    second = _pool(tmp_path)
+    assert [t["name"] for t in second.tools("fake")] == ["echo", "sleep"]
+    assert _spawns(tmp_path) == 1
+    second.close()
+
+
+def test_new_server_version_refreshes_cache(tmp_path):
+    first = _pool(tmp_path)
+    first.tools("fake")
+    first.close()
+    cache = tmp_path / "cache" / "tools.json"
+    data = json.loads(cache.read_text())
+    data["fake"]["version"] = "0.9"
+    data["fake"]["tools"] = data["fake"]["tools"][:1]
+    cache.write_text(json.dumps(data))
+
+    pool = _pool(tmp_path)
+    try:
+        assert len(pool.tools("fake")) == 1  # stale cache, still no spawn
+        pool.call("fake", "echo")  # the server reports 1.0 on initialize
+        assert [t["name"] for t in pool.tools("fake")] == ["echo", "sleep"]
+        assert json.loads(cache.read_text())["fake"]["version"] == "1.0"
+    finally:
+        pool.close()
+
+
+def test_errors_and_restart(tmp_path):
+    pool = _pool(tmp_path)
+    try:
+        with pytest.raises(MCPError, match="no tool"):
+            pool.call("fake", "missing")
+        with pytest.raises(MCPError, match="Unknown MCP server"):
+            pool.call("other", "echo")
+        pool.connection("fake")._proc.kill()
+        time.sleep(0.1)
+        assert format_result(pool.call("fake", "echo", {"text": "back"})) == "back"
+        assert pool.spawned == 2
+    finally:
+        pool.close()
+
+
+def test_bad_configuration_and_missing_command_are_mcp_errors(tmp_path):
+    pool = _pool(tmp_path)
+    try:
+        with pytest.raises(MCPError, match="invalid configuration"):
+            pool.configure({"broken": {"cmd": "oops"}})
+        pool.configure({"ghost": {"command": [str(tmp_path / "no-such-server")]}})
+        with pytest.raises(MCPError, match="cannot start"):
+            pool.call("ghost", "echo")
+    finally:
+        pool.close()
+
+
+def test_chat_reports_unstartable_server(tmp_path, monkeypatch):
+    from ecrivez.chat import EchoProvider, _process_input
+    from ecrivez.config import mcp
+
+    monkeypatch.setattr(mcp, "_POOL", MCPPool(DefaultMCP(cache_dir=tmp_path / "cache")))
+    cfg = {"mcp_servers": {"ghost": {"command": [str(tmp_path / "no-such-server")]}}}
+    call = {"type": "tool", "tool": "mcp", "server": "ghost", "name": "echo"}
+    assert _process_input(json.dumps(call), cfg, EchoProvider(), []).startswith("MCP error: ghost: cannot start")
@@ -0,0 +1,134 @@
+import queue
+from types import SimpleNamespace
+
+from ecrivez.nvim_api import apply_diff
+from ecrivez.nvim_mirror import BufferMirror, MirroredBuffer
+
+
+class FakeBuffer(list):
+    """A buffer's lines plus the handle pynvim buffers carry."""
+
+    def __init__(self, lines, handle=1):
+        super().__init__(lines)
+        self.handle = handle
+
+
+class FakeNvim:
+    """Plays notifications queued by the test through ``run_loop``."""
+
+    channel_id = 7
+
+    def __init__(self, buffers):
+        self.buffers = {number: SimpleNamespace(handle=number, name=f"/f{number}") for number in buffers}
+        self.current = SimpleNamespace(buffer=self.buffers[buffers[0]])
+        self.attached, self.commands, self.rpcs = [], [], 0
+        self.queue = queue.Queue()
+        self.changedtick = 0  # of the current buffer, as Neovim reports it
+        self.api = SimpleNamespace(buf_attach=self._buf_attach, buf_get_changedtick=lambda buf: self.changedtick)
+
+    def _buf_attach(self, buf, send_buffer, opts):
+        self.rpcs += 1
+        self.attached.append(buf.handle)
+        return True
+
+    def command(self, cmd):
+        self.commands.append(cmd)
+
+    def run_loop(self, request_cb, notification_cb):
+        while (event := self.queue.get()) is not None:
+            notification_cb(*event)
+
+    def async_call(self, fn):
+        fn()
+
+    def stop_loop(self):
+        self.queue.put(None)
+
+
+def test_dirty_ranges_are_merged_and_shifted():
+    buf = MirroredBuffer(1)
+    buf.apply(1, 0, -1, [str(i) for i in range(100)])
+    buf.take_dirty()
+    buf.apply(2, 10, 12, ["a", "b", "c"])  # +1 line
+    buf.apply(3, 50, 51, ["x"])
+    buf.apply(4, 0, 1, [])  # -1 line: everything shifts up
+    assert buf.take_dirty() == [(0, 0), (9, 12), (49, 50)]
+    assert buf.lines[9:12] == ["a", "b", "c"] and buf.lines[49] == "x"
+    buf.apply(5, 11, 13, ["merged"])  # overlaps (9, 12)
+    assert buf.take_dirty() == [(11, 12)]
+
+
+def test_mirror_follows_events_without_rpcs():
+    nvim = FakeNvim([1, 2])
+    mirror = BufferMirror(nvim).start()
+    assert nvim.attached == [1]
+    assert "rpcnotify(7, 'ecrivez_bufenter'" in nvim.commands[0]
+
+    nvim.queue.put(("nvim_buf_lines_event", [nvim.buffers[1], 3, 0, -1, ["a", "b", "c"], False]))
+    nvim.queue.put(("nvim_buf_lines_event", [nvim.buffers[1], 4, 1, 2, ["B", "B2"], False]))
+    nvim.queue.put(("nvim_buf_changedtick_event", [nvim.buffers[1], 5]))
+    assert mirror.get().wait_for(5, timeout=2)
+    assert mirror.lines() == ["a", "B", "B2", "c"]
+    assert mirror.get().changedtick == 5
+
+    nvim.queue.put(("ecrivez_bufenter", [2]))
+    nvim.queue.put(("nvim_buf_lines_event", [nvim.buffers[2], 1, 0, -1, ["second"], False]))
+    mirror.stop()
+    assert mirror.current == 2 and mirror.lines() == ["second"]
+    assert mirror.lines(1) == ["a", "B", "B2", "c"]
+    assert nvim.rpcs == 2  # one attach per buffer, no reads
+
+
+def test_apply_diff_reads_from_mirror():
+    nvim = FakeNvim([1])
+    nvim.current.buffer = FakeBuffer([])  # would be read without a mirror
+    nvim.changedtick = 2
+    mirror = BufferMirror(nvim)
+    mirror.attach(nvim.buffers[1])
+    mirror.current = 1
+    mirror.on_notification("nvim_buf_lines_event", [nvim.buffers[1], 2, 0, -1, ["a", "bar"], False])
+    apply_diff(nvim, "-bar\n+baz", mirror=mirror)
+    assert nvim.current.buffer == ["a", "baz"]
+    assert nvim.commands == ["write"]
+
+
+def test_unloaded_mirror_falls_back_to_rpc():
+    nvim = FakeNvim([1])
+    nvim.current.buffer = FakeBuffer(["important", "code", "bar"])
+    mirror = BufferMirror(nvim)
+    mirror.attach(nvim.buffers[1])  # attached, initial event not received yet
+    mirror.current = 1
+    assert mirror.lines() is None
+    apply_diff(nvim, "-bar\n+baz", mirror=mirror)
+    assert nvim.current.buffer == ["important", "code", "baz"]
+
+
+def test_mirror_behind_neovim_falls_back_to_rpc():
+    from ecrivez.nvim_api import current_lines
+
+    nvim = FakeNvim([1])
+    nvim.current.buffer = FakeBuffer(["edited", "in", "nvim"])
+    mirror = BufferMirror(nvim)
+    mirror.attach(nvim.buffers[1])
+    mirror.current = 1
+    mirror.on_notification("nvim_buf_lines_event", [nvim.buffers[1], 2, 0, -1, ["stale"], False])
+    nvim.changedtick = 3  # its event has not arrived
+    assert current_lines(nvim, mirror, timeout=0.1) == ["edited", "in", "nvim"]
+    mirror.on_notification("nvim_buf_lines_event", [nvim.buffers[1], 3, 0, -1, ["caught", "up"], False])
+    assert current_lines(nvim, mirror, timeout=0.1) == ["caught", "up"]
+
+
+def test_apply_in_nvim_uses_the_project_mirror(monkeypatch):
+    from ecrivez import chat, nvim_mirror
+
+    nvim = FakeNvim([1])
+    nvim.current.buffer = FakeBuffer([])
+    nvim.changedtick = 2
+    mirror = BufferMirror(nvim)
+    mirror.attach(nvim.buffers[1])
+    mirror.current = 1
+    mirror.on_notification("nvim_buf_lines_event", [nvim.buffers[1], 2, 0, -1, ["keep", "old"], False])
+    monkeypatch.setattr(nvim_mirror, "_MIRRORS", {"demo": mirror})
+    monkeypatch.setattr(chat, "connect", lambda project: nvim)
+    chat._apply_in_nvim("demo", "-old\n+new")
+    assert nvim.current.buffer == ["keep", "new"]
@@ -0,0 +1,49 @@
+import time
+
+from ecrivez.ui.pager import SpillBuffer, view_command
+
+
+def test_small_output_stays_in_memory():
+    with SpillBuffer.from_text("a\nb\nc") as view:
+        assert view.path is None
+        assert (view.n_lines, view.n_bytes) == (3, 5)
+        assert view.summary() == "a\nb\nc"
+        assert view.page(1, 5) == ["b", "c"]
+
+
+def test_large_output_spills_and_pages_lazily(tmp_path):
+    view = SpillBuffer(memory_limit=4096, head_lines=3, tail_lines=2, spill_dir=tmp_path)
+    for i in range(0, 200_000, 1000):
+        view.write("".join(f"line {j}\n" for j in range(i, i + 1000)))
+    view.finish()
+    assert view.path is not None and view.path.parent == tmp_path
+    assert view.n_lines == 200_000
+
+    summary = view.summary().splitlines()
+    assert summary[:3] == ["line 0", "line 1", "line 2"]
+    assert summary[-2:] == ["line 199998", "line 199999"]
+    assert "199995 more lines" in summary[3]
+
+    assert view.page(150_123, 2) == ["line 150123", "line 150124"]
+    assert view.search(r"line 1234\d$", limit=3) == [(12340, "line 12340"), (12341, "line 12341"), (12342, "line 12342")]
+    path = view.path
+    view.close()
+    assert not path.exists()
+
+
+def test_summary_cost_does_not_depend_on_size(tmp_path):
+    big = SpillBuffer.from_text("x" * 100 + "\n" * 2_000_000, spill_dir=tmp_path)
+    start = time.perf_counter()
+    summary = big.summary()
+    assert time.perf_counter() - start < 0.05
+    assert len(summary) < 2_000
+    big.close()
+
+
+def test_view_commands():
+    view = SpillBuffer.from_text("\n".join(f"row {i}" for i in range(100)), head_lines=2, tail_lines=2)
+    assert view_command("hello", view) is None
+    assert view_command(":page 10", view, page_size=2) == "     10  row 10\n     11  row 11"
+    assert view_command(":search row 9[89]", view) == "     98  row 98\n     99  row 99"
+    assert view_command(":search (", view).startswith("Error")
+    assert view_command(":search", None) == "(no large output to view)"
@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+from ecrivez.tools.patch import PatchError, apply_patch, parse_patch, reload_buffers
+
+PATCH = """\
+diff --git a/pkg/a.py b/pkg/a.py
+--- a/pkg/a.py
++++ b/pkg/a.py
+@@ -2,3 +2,3 @@
+ two
+-three
++THREE
+ four
+@@ -8,2 +8,3 @@
+ eight
+ nine
++ten
+diff --git a/new.txt b/new.txt
+--- /dev/null
++++ b/new.txt
+@@ -0,0 +1,2 @@
++hello
++world
+\\ No newline at end of file
+--- a/old.txt
++++ /dev/null
+@@ -1 +0,0 @@
+-bye
+"""
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    # two extra lines at the top: hunks must be found at an offset
+    (tmp_path / "pkg" / "a.py").write_text("zero\nzero\none\ntwo\nthree\nfour\nfive\nsix\nseven\neight\nnine\n")
+    (tmp_path / "old.txt").write_text("bye\n")
+    return tmp_path
+
+
+def test_parse_patch():
+    patches = parse_patch(PATCH)
+    assert [(p["old_path"], p["new_path"], len(p["hunks"])) for p in patches] == [
+        ("pkg/a.py", "pkg/a.py", 2),
+        (None, "new.txt", 1),
+        ("old.txt", None, 1),
+    ]
+    assert patches[1]["hunks"][0]["no_newline_new"]
+
+
+def test_multi_file_patch_is_applied(tree):
+    result = apply_patch(PATCH, root=tree, workers=4)
+    assert result["created"] == ["new.txt"] and result["deleted"] == ["old.txt"]
+    assert result["hunks"] == 4
+    assert (tree / "pkg" / "a.py").read_text().splitlines()[4] == "THREE"
+    assert (tree / "pkg" / "a.py").read_text().endswith("nine\nten\n")
+    assert (tree / "new.txt").read_text() == "hello\nworld"
+    assert not (tree / "old.txt").exists()
+    assert sorted(os.listdir(tree)) == ["new.txt", "pkg"]  # no temp files or backups left
+
+
+def test_failing_hunk_changes_nothing(tree):
+    before = (tree / "pkg" / "a.py").read_text()
+    bad = PATCH.replace("-bye", "-not there")
+    with pytest.raises(PatchError, match="old.txt: hunk #1 does not apply"):
+        apply_patch(bad, root=tree)
+    assert (tree / "pkg" / "a.py").read_text() == before
+    assert (tree / "old.txt").exists() and not (tree / "new.txt").exists()
+
+
+def test_commit_failure_rolls_back(tree, monkeypatch):
+    before = (tree / "pkg" / "a.py").read_text()
+    real_replace = os.replace
+    calls = []
+
+    def flaky_replace(src, dst):
+        calls.append(dst)
+        if str(dst).endswith("new.txt"):
+            raise OSError("disk full")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", flaky_replace)
+    with pytest.raises(OSError):
+        apply_patch(PATCH, root=tree)
+    monkeypatch.undo()
+    assert (tree / "pkg" / "a.py").read_text() == before
+    assert sorted(os.listdir(tree)) == ["old.txt", "pkg"]
+    assert os.listdir(tree / "pkg") == ["a.py"]
+
+
+def test_check_mode_and_many_files(tmp_path):
+    n = 200
+    parts = []
+    for i in range(n):
+        (tmp_path / f"f{i}.txt").write_text(f"line {i}\n")
+        parts.append(f"--- a/f{i}.txt\n+++ b/f{i}.txt\n@@ -1 +1 @@\n-line {i}\n+edited {i}\n")
+    text = "".join(parts)
+    apply_patch(text, root=tmp_path, check=True)
+    assert (tmp_path / "f7.txt").read_text() == "line 7\n"
+    assert len(apply_patch(text, root=tmp_path)["files"]) == n
+    assert all((tmp_path / f"f{i}.txt").read_text() == f"edited {i}\n" for i in range(n))
+
+
+def test_reload_buffers(tmp_path):
+    class Buf:
+        def __init__(self, number, name):
+            self.number, self.name = number, name
+
+    class Nvim:
+        buffers = [Buf(1, str(tmp_path / "a.py")), Buf(2, str(tmp_path / "b.py")), Buf(3, "")]
+        commands = []
+
+        def call(self, fn, *args):
+            return 0
+
+        def command(self, cmd):
+            self.commands.append(cmd)
+
+    nvim = Nvim()
+    assert reload_buffers(nvim, [tmp_path / "a.py"]) == 1
+    assert nvim.commands == ["checktime 1"]
+
+
+def test_paths_outside_root_are_refused(tmp_path):
+    root = tmp_path / "repo"
+    root.mkdir()
+    for name in ("../escaped.txt", str(tmp_path / "abs.txt")):
+        patch = f"--- /dev/null\n+++ b/{name}\n@@ -0,0 +1 @@\n+owned\n"
+        with pytest.raises(PatchError, match="outside the patch root"):
+            apply_patch(patch, root=root)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["repo"]
+
+
+def test_rename_removes_the_old_path(tmp_path):
+    (tmp_path / "old.txt").write_text("a\nb\n")
+    result = apply_patch("--- a/old.txt\n+++ b/new.txt\n@@ -1,2 +1,2 @@\n a\n-b\n+c\n", root=tmp_path)
+    assert not (tmp_path / "old.txt").exists()
+    assert (tmp_path / "new.txt").read_text() == "a\nc\n"
+    assert result["renamed"] == [("old.txt", "new.txt")]
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import pytest
+
+from ecrivez.chat import EchoProvider
+from ecrivez.pipeline import STAGES, Pipeline, PipelineError, parse
+
+
+def test_parse_nested_branches():
+    tree = parse("grep -i err | { head 2 , sh 'tr a-z A-Z' | tail 1 } | cat")
+    assert len(tree.items) == 3
+    assert [len(b.items) for b in tree.items[1].branches] == [1, 2]
+
+
+@pytest.mark.parametrize("text", ["", "cat |", "{ cat", "cat }", "nope", "head x"])
+def test_invalid_pipelines(text):
+    with pytest.raises(PipelineError):
+        Pipeline(text)
+
+
+def test_linear_and_parallel_branches():
+    lines = [f"{i} {'ERROR' if i % 3 == 0 else 'ok'}" for i in range(30)]
+    out = Pipeline("grep ERROR | { head 2 , tail 1 | upper }").run_sync(lines)
+    assert sorted(out) == ["0 ERROR", "27 ERROR", "3 ERROR"]
+
+
+def test_shell_stage_streams_and_head_stops_early():
+    out = Pipeline("sh 'tr a-z A-Z' | head 3", queue_size=2).run_sync(f"line{i}" for i in range(1000))
+    assert out == ["LINE0", "LINE1", "LINE2"]
+
+
+def test_llm_windows_are_sent_while_input_streams():
+    out = Pipeline("llm -n 2 Summarise", provider=EchoProvider()).run_sync(["a", "b", "c"])
+    assert out == ["(echo) Summarise", "", "a", "b", "(echo) Summarise", "", "c"]
+
+
+def test_backpressure_and_stats(monkeypatch):
+    def _slow(args, pipeline):
+        async def run(chunks, emit):
+            async for chunk in chunks:
+                await asyncio.sleep(0.005)
+                await emit(chunk)
+
+        return run
+
+    monkeypatch.setitem(STAGES, "slow", _slow)
+    pipe = Pipeline("cat | slow", queue_size=2)
+    start = time.perf_counter()
+    assert pipe.run_sync(str(i) for i in range(40)) == [str(i) for i in range(40)]
+    assert time.perf_counter() - start >= 0.2
+    cat, slow = pipe.stats()
+    assert cat["chunks_in"] == cat["chunks_out"] == 40
+    assert slow["chunks_out"] == 40
+    # The fast stage spent most of its life waiting on the slow one.
+    assert cat["blocked"] > 0.1
+    assert slow["throughput"] > 0
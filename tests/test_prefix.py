@@ -0,0 +1,85 @@
+import json
+
+from ecrivez.chat import EchoProvider, _process_input
+from ecrivez.history import History
+from ecrivez.prefix import PromptMeter, Telemetry, build_request
+
+
+def test_build_request_layout_is_stable():
+    history = [
+        {"role": "system", "content": "You are terse."},
+        {"role": "user", "content": "hi", "ts": 1.0},
+        {"role": "assistant", "content": "big", "ref": "abc"},
+    ]
+    request = build_request(history, context="Project: demo")
+    assert request == [
+        {"role": "system", "content": "You are terse."},
+        {"role": "system", "content": "Project: demo"},
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "big"},
+    ]
+    longer = build_request(history + [{"role": "user", "content": "more"}], context="Project: demo")
+    encode = lambda msgs: json.dumps(msgs).encode()  # noqa: E731
+    assert encode(longer).startswith(encode(request)[:-1])
+
+
+def test_meter_counts_shared_prefix_locally():
+    cfg = {"name": "demo"}
+    provider = EchoProvider()
+    history = History([{"role": "system", "content": "s" * 400}])
+    meter = PromptMeter()
+    _process_input("first question", cfg, provider, history, meter=meter)
+    _process_input("second question", cfg, provider, history, meter=meter)
+    _process_input("!echo tool", cfg, provider, history, meter=meter)  # not a provider request
+
+    first, second = meter.turns
+    assert first["cached_tokens"] == 0
+    # The previous request (system + first question) is the cacheable prefix.
+    assert second["prefix_messages"] == 2
+    assert second["cached_tokens"] == first["prompt_tokens"]
+    assert second["uncached_tokens"] == second["prompt_tokens"] - second["cached_tokens"]
+    assert second["source"] == "local"
+    assert 0 < meter.cached_ratio < 1
+
+
+def test_provider_reported_usage_wins(tmp_path):
+    class Reporting(EchoProvider):
+        last_usage = {"prompt_tokens": 2000, "cached_tokens": 1536}
+
+    meter = PromptMeter()
+    usage = meter.measure([{"role": "user", "content": "x"}], Reporting())
+    assert usage == {
+        "prompt_tokens": 2000,
+        "cached_tokens": 1536,
+        "uncached_tokens": 464,
+        "prefix_messages": 0,
+        "source": "provider",
+    }
+
+    telemetry = Telemetry(tmp_path / "telemetry.jsonl")
+    telemetry.record("abc", "echo", usage)
+    telemetry.record("def", "echo", usage)
+    assert [e["session"] for e in telemetry.entries("abc")] == ["abc"]
+    assert telemetry.entries()[1]["cached_tokens"] == 1536
+
+
+def test_project_context_follows_the_system_prompt():
+    class Recording(EchoProvider):
+        requests = []
+
+        def chat_completion(self, messages):
+            self.requests.append(list(messages))
+            return "ok"
+
+    provider = Recording()
+    history = History([{"role": "system", "content": "You are terse."}])
+    cfg = {"context": "Project: demo"}
+    _process_input("hi", cfg, provider, history)
+    _process_input("more", cfg, provider, history)
+    first, second = provider.requests
+    assert first[:2] == [
+        {"role": "system", "content": "You are terse."},
+        {"role": "system", "content": "Project: demo"},
+    ]
+    assert second[: len(first)] == first  # the context keeps the prefix stable
+    assert all(m["content"] != "Project: demo" for m in history)  # never stored
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from ecrivez.config.prompts import DefaultPrompts, PromptRegistry
+
+
+def _touch_later(path, seconds=2):
+    stamp = time.time() + seconds
+    os.utime(path, (stamp, stamp))
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "prompts"
+    (root / "team").mkdir(parents=True)
+    (root / "prompt__review.md").write_text(
+        "---\ndescription: Reviewer\n---\nReview this ${language} code: {braces} stay.\n"
+    )
+    (root / "team" / "plan.md").write_text("Plan for $name.\n")
+    config = DefaultPrompts(dirs=[str(root / "**")], cache_file=tmp_path / "cache.json")
+    return root, config
+
+
+def test_index_and_render(library):
+    root, config = library
+    registry = PromptRegistry(config)
+    assert registry.ids() == ["plan", "review"]
+    assert registry.prompts["review"].meta == {"description": "Reviewer"}
+    rendered = registry.render("review", {"language": "Python", "unused": 1})
+    assert rendered["text"] == "Review this Python code: {braces} stay.\n"
+    assert rendered["tokens"] > 0
+    assert registry.render("plan")["text"] == "Plan for $name.\n"
+    with pytest.raises(KeyError):
+        registry.get("missing")
+
+
+def test_second_registry_uses_cached_index(library):
+    root, config = library
+    PromptRegistry(config).render("review", {"language": "Go"})
+    again = PromptRegistry(config)
+    assert again.scans == 0
+    assert again.ids() == ["plan", "review"]
+    key = next(iter(again._rendered))
+    assert again.render("review", {"language": "Go"}) is again._rendered[key]
+
+
+def test_changed_file_and_new_file_invalidate(library):
+    root, config = library
+    registry = PromptRegistry(config)
+    registry.render("plan", {"name": "v1"})
+
+    (root / "team" / "plan.md").write_text("New plan for $name.\n")
+    _touch_later(root / "team" / "plan.md")
+    assert registry.render("plan", {"name": "v1"})["text"] == "New plan for v1.\n"
+
+    (root / "team" / "prompt__ship.md").write_text("Ship it.\n")
+    _touch_later(root / "team")
+    fresh = PromptRegistry(config)
+    assert fresh.ids() == ["plan", "review", "ship"]
+    assert fresh.render("plan", {"name": "v1"})["text"] == "New plan for v1.\n"
+
+
+def test_directory_created_after_indexing_is_scanned(tmp_path):
+    later = tmp_path / "later"
+    config = DefaultPrompts(dirs=[str(later / "**")], cache_file=tmp_path / "cache.json")
+    first = PromptRegistry(config)
+    assert first.ids() == []
+
+    later.mkdir()
+    (later / "review.md").write_text("Review.\n")
+    assert PromptRegistry(config).ids() == ["review"]
+    assert first.render("review")["text"] == "Review.\n"  # rescanned once on the miss
+    with pytest.raises(KeyError):
+        first.get("missing")
+
+
+def test_system_prompt_gets_only_allowed_variables(library, monkeypatch, capsys):
+    from ecrivez.chat import _system_prompt
+    from ecrivez.config import prompts
+
+    root, config = library
+    (root / "leak.md").write_text("$name uses $model; key=$openai_api_key\n")
+    registry = PromptRegistry(config)
+    monkeypatch.setattr(prompts, "get_prompt_registry", lambda *a: registry)
+    cfg = {"name": "demo", "model": "m", "provider": "p", "openai_api_key": "sk-secret", "system_prompt": "leak"}
+    assert _system_prompt(cfg) == {"role": "system", "content": "demo uses m; key=$openai_api_key\n"}
+
+    assert _system_prompt({**cfg, "system_prompt": "missing"}) is None
+    assert "Unknown prompt: 'missing'" in capsys.readouterr().err
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PyQt6.QtWidgets")
+
+from PyQt6.QtCore import QEventLoop, QTimer  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QPlainTextEdit  # noqa: E402
+
+from ecrivez.chat import EchoProvider  # noqa: E402
+from ecrivez.ui.qt_bridge import ChatBridge, FrameBuffer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def _run_turn(bridge, text, timeout_ms=20_000):
+    loop = QEventLoop()
+    replies = []
+    bridge.reply_ready.connect(lambda reply: (replies.append(reply), loop.quit()))
+    bridge.submit(text)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    gaps = []
+    last = [time.perf_counter()]
+
+    def beat():
+        now = time.perf_counter()
+        gaps.append(now - last[0])
+        last[0] = now
+
+    heartbeat = QTimer()
+    heartbeat.timeout.connect(beat)
+    heartbeat.start(5)
+    loop.exec()
+    heartbeat.stop()
+    return replies, gaps
+
+
+def test_echo_reply_is_streamed_off_the_gui_thread(app):
+    widget = QPlainTextEdit()
+    bridge = ChatBridge(EchoProvider(), FrameBuffer(widget))
+    replies, _ = _run_turn(bridge, "hello there world")
+    bridge.close()
+    assert replies == ["(echo) hello there world"]
+    assert widget.toPlainText() == "you › hello there world\nllm › (echo) hello there world\n"
+    assert [m["role"] for m in bridge.history] == ["user", "assistant"]
+
+
+def test_high_volume_tool_output_is_coalesced(app):
+    widget = QPlainTextEdit()
+    output = FrameBuffer(widget)
+    bridge = ChatBridge(EchoProvider(), output, {"persistent_shell": True, "session_id": "qt-volume"})
+    n = 100_000
+    replies, gaps = _run_turn(bridge, f"!{sys.executable} -c \"for i in range({n}): print(i)\"")
+    bridge.close()
+
+    assert replies and replies[0].splitlines()[-1] == str(n - 1)
+    assert widget.toPlainText().splitlines()[-1] == str(n - 1)
+    assert widget.blockCount() == 50_000  # bounded scrollback
+    assert output.updates < n / 100  # one insertion per frame, not per line
+    assert max(gaps) < 0.5  # the event loop kept running during the command
+
+
+def test_shell_runs_like_the_repl(app):
+    widget = QPlainTextEdit()
+    cfg = {"persistent_shell": True, "session_id": "qt-shell", "shell_timeout": 0.5}
+    bridge = ChatBridge(EchoProvider(), FrameBuffer(widget), cfg)
+    replies, _ = _run_turn(bridge, "!echo oops; (exit 3)")
+    assert replies[0].startswith("Command failed with exit code 3:\noops")
+    replies, _ = _run_turn(bridge, "!sleep 5")
+    bridge.close()
+    assert "timed out after 0.5s" in replies[0]
+    assert "oops" in widget.toPlainText()  # streamed while it ran
@@ -0,0 +1,95 @@
+from click.testing import CliRunner
+
+from ecrivez.chat import CachedProvider, EchoProvider
+from ecrivez.cli import ecrivez
+from ecrivez.session import SessionStore
+from ecrivez.session.replay import replay_sessions, split_session, split_turns
+
+RECORDING = [
+    {"role": "user", "content": "hello"},
+    {"role": "assistant", "content": "(echo) hello"},
+    {"role": "user", "content": "!rm -rf /definitely-not-run"},
+    {"role": "assistant", "content": "recorded shell output"},
+    {"role": "user", "content": "/apply +x"},
+    {"role": "assistant", "content": "Error applying diff: no socket"},
+    {"role": "user", "content": "what now?"},
+    {"role": "assistant", "content": "a different model answer"},
+]
+
+
+def test_split_turns():
+    assert split_turns(RECORDING)[1] == ("!rm -rf /definitely-not-run", "recorded shell output")
+
+
+def test_replay_starts_from_the_recorded_system_prompt():
+    seen = []
+
+    class Spy(EchoProvider):
+        def chat_completion(self, messages):
+            seen.append(list(messages))
+            return super().chat_completion(messages)
+
+    records = [{"role": "system", "content": "answer in French"}, *RECORDING[:2]]
+    system, turns = split_session(records)
+    assert system == [{"role": "system", "content": "answer in French"}]
+    report = replay_sessions([("s1", turns, system)], Spy)
+    assert report["mismatches"] == []
+    assert seen[0][0] == {"role": "system", "content": "answer in French"}
+
+
+def test_recorded_replay_reproduces_session_exactly():
+    sessions = [("s1", split_turns(RECORDING))]
+    report = replay_sessions(sessions, lambda: None, concurrency=4, repeat=10)
+    assert report["sessions"] == 10
+    assert report["turns"] == 40
+    assert report["mismatches"] == []
+    assert report["latency"]["p50"] <= report["latency"]["max"]
+
+
+def test_echo_replay_reports_only_model_differences():
+    provider = EchoProvider()
+    report = replay_sessions([("s1", split_turns(RECORDING))], lambda: provider)
+    assert [(m["turn"], m["reply"]) for m in report["mismatches"]] == [(3, "(echo) what now?")]
+
+
+def test_cached_provider_persists_replies(tmp_path):
+    cache = tmp_path / "cache.jsonl"
+    messages = [{"role": "user", "content": "hi"}]
+    first = CachedProvider(EchoProvider(), cache)
+    assert first.chat_completion(messages) == "(echo) hi"
+
+    second = CachedProvider(EchoProvider(), cache)
+    assert second.chat_completion(messages) == "(echo) hi"
+    assert (second.hits, second.misses) == (1, 0)
+
+
+def test_replay_cli(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with SessionStore() as store:
+        store.append("abc", RECORDING)
+
+    result = CliRunner().invoke(ecrivez, ["replay", "--provider", "echo", "-j", "2"])
+    assert result.exit_code == 0, result.output
+    assert "1 sessions, 4 turns" in result.output
+    assert "1 replies differ" in result.output
+    assert "+(echo) what now?" in result.output
+
+
+def test_replay_stubs_every_tool(monkeypatch):
+    import ecrivez.tools.kernel as kernel
+    import ecrivez.tools.testloop as testloop
+
+    def boom(*_args, **_kwargs):
+        raise AssertionError("a replayed tool call was executed")
+
+    monkeypatch.setattr(kernel, "get_kernel", boom)
+    monkeypatch.setattr(testloop, "get_test_loop", boom)
+    calls = [
+        '{"type": "tool", "tool": "python", "code": "1/0"}',
+        '{"type": "tool", "tool": "pytest", "args": ["-x"]}',
+        '{"type": "tool", "tool": "mcp", "server": "nowhere", "name": "drop"}',
+    ]
+    turns = [(call, f"recorded {i}") for i, call in enumerate(calls)]
+    report = replay_sessions([("s1", turns)], lambda: None)
+    assert report["turns"] == 3
+    assert report["mismatches"] == []
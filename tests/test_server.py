@@ -0,0 +1,137 @@
+import asyncio
+import threading
+
+from ecrivez.chat import EchoProvider
+from ecrivez.server import Client, SessionServer, load_test
+from ecrivez.session import SessionStore
+
+
+def test_handle_isolates_histories_per_session():
+    server = SessionServer(EchoProvider())
+
+    async def scenario():
+        a = (await server.handle({"op": "open"}))["session"]
+        b = (await server.handle({"op": "open"}))["session"]
+        await server.handle({"op": "input", "session": a, "text": "from a"})
+        reply = await server.handle({"id": 7, "op": "input", "session": b, "text": "from b"})
+        missing = await server.handle({"id": 8, "op": "input", "session": "nope", "text": "x"})
+        return a, b, reply, missing
+
+    a, b, reply, missing = asyncio.run(scenario())
+    server.close()
+    assert reply == {"id": 7, "ok": True, "session": b, "reply": "(echo) from b"}
+    assert [m["content"] for m in server.sessions[a].history] == ["from a", "(echo) from a"]
+    assert missing["ok"] is False
+
+
+def test_client_over_unix_socket_persists_turns(tmp_path):
+    path = tmp_path / "srv.sock"
+    server = SessionServer(EchoProvider())
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def main():
+        server.store = SessionStore(tmp_path / "sessions")  # owned by the loop thread
+        listener = await server.start(path)
+        ready.set()
+        async with listener:
+            await listener.serve_forever()
+
+    thread = threading.Thread(target=lambda: loop.run_until_complete(main()), daemon=True)
+    thread.start()
+    ready.wait(5)
+
+    client = Client(path)
+    session = client.open()
+    assert client.send(session, "hello server") == "(echo) hello server"
+    client.close()
+    loop.call_soon_threadsafe(lambda: [t.cancel() for t in asyncio.all_tasks(loop)])
+    thread.join(5)
+    server.close()
+
+    with SessionStore(tmp_path / "sessions") as store:
+        assert store.load(session)[1]["content"] == "(echo) hello server"
+
+
+def test_load_test_hundreds_of_clients(tmp_path):
+    stats = load_test(EchoProvider(), clients=200, turns=5, path=tmp_path / "load.sock")
+    assert stats["turns"] == 1000
+    assert stats["turns_per_second"] > 0
+    assert 0 < stats["memory_per_session"] < 64 * 1024
+
+
+def test_each_session_has_its_own_persistent_shell(tmp_path):
+    import shutil
+
+    import pytest
+
+    from ecrivez.tools import shell as shell_mod
+
+    if shutil.which("bash") is None:
+        pytest.skip("needs bash")
+    server = SessionServer(EchoProvider(), cfg={"persistent_shell": True})
+
+    async def scenario():
+        a = (await server.handle({"op": "open"}))["session"]
+        b = (await server.handle({"op": "open"}))["session"]
+        await server.handle({"op": "input", "session": a, "text": f"!cd {tmp_path} && export WHO=a"})
+        seen_by_b = await server.handle({"op": "input", "session": b, "text": "!echo ${WHO:-nobody}"})
+        seen_by_a = await server.handle({"op": "input", "session": a, "text": "!echo $WHO $PWD"})
+        await server.handle({"op": "close", "session": a})
+        return a, seen_by_a["reply"], seen_by_b["reply"]
+
+    a, seen_by_a, seen_by_b = asyncio.run(scenario())
+    server.close()
+    assert seen_by_b == "nobody"
+    assert seen_by_a == f"a {tmp_path}"
+    assert a not in shell_mod._SHELLS  # closed with its session
+    shell_mod.shutdown_shells()
+
+
+def test_throttle_forwards_streams_and_usage():
+    from ecrivez.server import _Throttled
+
+    class Usage(EchoProvider):
+        last_usage = {"prompt_tokens": 3}
+
+    throttled = _Throttled(Usage(), rate=1000.0, burst=1)
+    assert throttled.last_usage == {"prompt_tokens": 3}
+    deltas = list(throttled.stream_completion([{"role": "user", "content": "a b c"}]))
+    assert len(deltas) > 1 and "".join(deltas) == "(echo) a b c"
+    assert throttled._tokens < 1  # the stream took a token
+
+
+def test_disconnect_closes_the_sessions_of_the_connection(tmp_path):
+    import time
+
+    path = tmp_path / "srv.sock"
+    server = SessionServer(EchoProvider(), store=SessionStore(tmp_path / "sessions"))
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def main():
+        listener = await server.start(path)
+        ready.set()
+        async with listener:
+            await listener.serve_forever()
+
+    thread = threading.Thread(target=lambda: loop.run_until_complete(main()), daemon=True)
+    thread.start()
+    ready.wait(5)
+
+    client, other = Client(path), Client(path)
+    session = client.open()
+    assert other.open(session) == session  # shared by two connections
+    assert client.send(session, "hi") == "(echo) hi"
+    client.close()  # no "close" op
+    time.sleep(0.2)
+    assert session in server.sessions  # still used by the other connection
+    other.close()
+    for _ in range(50):
+        if session not in server.sessions:
+            break
+        time.sleep(0.05)
+    assert session not in server.sessions
+    loop.call_soon_threadsafe(lambda: [t.cancel() for t in asyncio.all_tasks(loop)])
+    thread.join(5)
+    server.close()
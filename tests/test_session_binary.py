@@ -0,0 +1,74 @@
+import io
+import json
+
+from ecrivez.session import SessionStore
+from ecrivez.session.binary import BinaryJournal, BinarySession
+from ecrivez.session.jsonld import write_jsonld
+
+
+def _records(n, big=""):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg {i}{big}", "ts": 1.0 + i, "tokens": i}
+        for i in range(n)
+    ]
+
+
+def test_roundtrip_with_blobs_and_lazy_meta(tmp_path):
+    path = tmp_path / "s.ecz"
+    journal = BinaryJournal(path, blob_threshold=64)
+    journal.append(_records(3))
+    journal.append([{"role": "tool", "content": "x" * 10_000, "ts": 9.0, "tokens": 5}])
+
+    with BinarySession(path) as session:
+        assert len(session) == 4
+        meta = session.meta(3)
+        assert meta == {"role": "tool", "ts": 9.0, "tokens": 5, "size": 10_000, "blob": True}
+        assert session.content(3) == "x" * 10_000
+        assert [r["content"] for r in session.tail(2)] == ["msg 2", "x" * 10_000]
+        assert session[0]["role"] == "user"
+
+
+def test_identical_large_payloads_share_one_blob(tmp_path):
+    journal = BinaryJournal(tmp_path / "s.ecz", blob_threshold=16)
+    journal.append(_records(2, big="y" * 100) + _records(2, big="y" * 100))
+    assert len([p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]) == 2
+
+
+def test_recovers_from_missing_trailer(tmp_path):
+    path = tmp_path / "s.ecz"
+    BinaryJournal(path).append(_records(2))
+    data = path.read_bytes()
+    # Simulate a crash: index and trailer lost, half a record left behind.
+    path.write_bytes(data[: -(8 * 2 + 20)] + b"\x40\x00\x00\x00garbage")
+
+    with BinarySession(path) as session:
+        assert [r["content"] for r in session] == ["msg 0", "msg 1"]
+
+    BinaryJournal(path).append(_records(1))
+    with BinarySession(path) as session:
+        assert len(session) == 3
+
+
+def test_store_binary_format_is_indexed(tmp_path):
+    with SessionStore(tmp_path, fmt="binary") as store:
+        store.open_session("bin1", model="gpt-4o", provider="echo")
+        store.append("bin1", [{"role": "user", "content": "pip install ruff"}])
+        assert store.journal_path("bin1").suffix == ".ecz"
+        assert store.load("bin1") == [{"role": "user", "content": "pip install ruff"}]
+        assert store.search("ruff")[0]["session_id"] == "bin1"
+
+    with SessionStore(tmp_path) as store:  # reopened with the default format
+        store.append("bin1", [{"role": "assistant", "content": "done"}])
+        assert store.tail("bin1", 1)[0]["content"] == "done"
+        assert store.session_info("bin1")["n_messages"] == 2
+
+
+def test_jsonld_export_matches_template():
+    out = io.StringIO()
+    count = write_jsonld(out, "sid", _records(2), model="gpt-4o", provider="openai")
+    doc = json.loads(out.getvalue())
+    assert count == 2
+    assert doc["@type"] == "Session"
+    assert doc["session"]["uuid"] == "sid"
+    assert doc["model"][0]["message_ids"] == ["sid#1"]
+    assert doc["messages"][0]["@type"] == "Message"
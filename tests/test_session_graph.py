@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from ecrivez.session import SessionStore
+from ecrivez.session.graph import SessionGraph
+from ecrivez.ui.generate_graph import write_html
+
+DIFF = "/apply --- a/src/app.py\n+++ b/src/app.py\n@@ -1 +1 @@\n-a\n+b\n"
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "binary"])
+def test_graph_is_built_incrementally(tmp_path, fmt):
+    store = SessionStore(tmp_path / "sessions", fmt=fmt)
+    store.open_session("s1")
+    store.append(
+        "s1",
+        [
+            {"role": "user", "content": "hello", "ts": 0.0},
+            {"role": "assistant", "content": "hi there", "ts": 2.0},
+            {"role": "user", "content": "!pytest -q", "ts": 5.0},
+            {"role": "assistant", "content": "1 passed", "ts": 50.0},
+        ],
+    )
+    graph = SessionGraph(store, slow=30)
+    assert graph.update("s1") == 4
+    assert graph.update("s1") == 0
+
+    store.append(
+        "s1",
+        [
+            {"role": "user", "content": DIFF, "ts": 60.0},
+            {"role": "assistant", "content": "(diff applied)", "ts": 61.0},
+        ],
+    )
+    assert graph.update("s1") == 2
+
+    items = list(graph.items(["s1"]))
+    nodes = {item["id"]: item for kind, item in items if kind == "node"}
+    edges = [item for kind, item in items if kind == "edge"]
+    assert [n["group"] for n in nodes.values()] == [
+        "session", "user", "assistant", "user", "tool", "user", "edit", "file",
+    ]
+    assert nodes["s1#3"]["label"] == "pytest -q"
+    slow = [e for e in edges if "color" in e]
+    assert [(e["from"], e["to"], e["dt"]) for e in slow] == [("s1#2", "s1#3", 45.0)]
+    assert {"from": "s1#5", "to": "file:src/app.py", "label": "edit", "dashes": True} in edges
+    store.close()
+
+
+def test_shared_files_and_cache_rebuild(tmp_path):
+    store = SessionStore(tmp_path / "sessions")
+    for sid in ("a", "b"):
+        store.open_session(sid)
+        store.append(sid, [{"role": "user", "content": DIFF}, {"role": "assistant", "content": "(diff applied)"}])
+    graph = SessionGraph(store)
+    for sid in ("a", "b"):
+        graph.update(sid)
+    items = list(graph.items(["a", "b"]))
+    assert sum(1 for kind, item in items if kind == "node" and item["group"] == "file") == 1
+
+    # A torn cache file is detected and rebuilt from the journal.
+    with (graph.cache_dir / "a.ndjson").open("a") as fh:
+        fh.write('["node", {"id": "junk"}]\n')
+    assert graph.update("a") == 2
+    assert all(item["id"] != "junk" for kind, item in graph.items(["a"]) if kind == "node")
+
+    out = io.StringIO()
+    counts = write_html(lambda: graph.items(["a", "b"]), out)
+    assert counts == {"nodes": 7, "edges": 6}
+    store.close()
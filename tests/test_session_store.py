@@ -0,0 +1,67 @@
+import json
+
+from click.testing import CliRunner
+
+from ecrivez.cli import ecrivez
+from ecrivez.session import SessionStore
+
+
+def test_append_load_and_search(tmp_path):
+    store = SessionStore(tmp_path)
+    store.open_session("abc123", model="gpt-4o", provider="echo")
+    store.append(
+        "abc123",
+        [
+            {"role": "user", "content": "how do I force push?"},
+            {"role": "assistant", "content": "Run git push --force-with-lease origin main"},
+        ],
+    )
+
+    assert store.load("abc123")[1]["content"].startswith("Run git push")
+
+    hits = store.search("git push --force-with-lease")
+    assert [(h["session_id"], h["seq"], h["role"]) for h in hits] == [("abc123", 1, "assistant")]
+    assert store.search("push", role="user")[0]["seq"] == 0
+
+    (info,) = store.list_sessions()
+    assert info["model"] == "gpt-4o"
+    assert info["n_messages"] == 2
+    assert info["tokens"] > 0
+    store.close()
+
+
+def test_sync_indexes_external_journals_incrementally(tmp_path):
+    journal = tmp_path / "legacy.jsonl"
+    journal.write_text(json.dumps({"role": "user", "content": "hello legacy"}) + "\n")
+
+    store = SessionStore(tmp_path)
+    assert store.sync() == 1
+    assert store.sync() == 0
+
+    with journal.open("a") as fh:
+        fh.write(json.dumps({"role": "assistant", "content": "hi again"}) + "\n")
+        fh.write('{"role": "user", "content": "half writ')  # incomplete line
+    assert store.sync() == 1
+    assert store.resolve("leg") == "legacy"
+    assert len(store.search("again")) == 1
+    store.close()
+
+
+def test_sessions_cli(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with SessionStore() as store:
+        store.append("deadbeef", [{"role": "user", "content": "pytest -x tests"}])
+
+    runner = CliRunner()
+    listed = runner.invoke(ecrivez, ["sessions", "list"])
+    assert "deadbeef" in listed.output
+
+    found = runner.invoke(ecrivez, ["sessions", "search", "pytest"])
+    assert found.exit_code == 0
+    assert "[pytest]" in found.output
+
+    shown = runner.invoke(ecrivez, ["sessions", "show", "dead"])
+    assert shown.output.strip() == "you › pytest -x tests"
+
+    missing = runner.invoke(ecrivez, ["sessions", "show", "nope"])
+    assert missing.exit_code != 0
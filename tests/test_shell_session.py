@@ -0,0 +1,87 @@
+import shutil
+import time
+
+import pytest
+
+from ecrivez.chat import EchoProvider, _process_input
+from ecrivez.history import History
+from ecrivez.tools import shell as shell_mod
+from ecrivez.tools.shell import ShellSession
+
+pytestmark = pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash")
+
+
+@pytest.fixture
+def session(tmp_path):
+    s = ShellSession(cwd=tmp_path)
+    yield s
+    s.close()
+
+
+def test_state_is_kept_between_commands(session, tmp_path):
+    (tmp_path / "sub").mkdir()
+    assert session.run("cd sub && export GREETING=hi")["exit_code"] == 0
+    result = session.run('echo "$GREETING from $(basename "$PWD")"')
+    assert result["output"] == "hi from sub\n"
+    assert result["cwd"] == str(tmp_path / "sub")
+    assert session.run("false")["exit_code"] == 1
+    assert session.run("printf 'no newline'")["output"] == "no newline"
+    assert session.run("echo err >&2")["output"] == "err\n"
+    assert session.run("cat")["output"] == ""  # stdin is not the control pipe
+
+    start = time.perf_counter()
+    for _ in range(50):
+        session.run("true")
+    assert (time.perf_counter() - start) / 50 < 0.05  # no process spawn per command
+
+
+def test_streaming_timeout_and_exit(session, tmp_path):
+    chunks = []
+    result = session.run("for i in 1 2 3; do echo $i; sleep 0.2; done", on_output=chunks.append)
+    assert result["output"] == "1\n2\n3\n" and len(chunks) >= 2
+    assert "".join(chunks) == result["output"]
+
+    session.run("cd /")
+    timed_out = session.run("sleep 30", timeout=0.5)
+    assert timed_out["exit_code"] == -1 and timed_out["restarted"]
+    assert session.run("pwd")["output"] == "/\n"  # restarted in the last directory
+
+    exited = session.run("exit 3")
+    assert exited["exit_code"] == 3 and exited["restarted"]
+    assert session.run("echo back")["output"] == "back\n"
+
+
+def test_bang_commands_use_the_persistent_shell(monkeypatch, session):
+    monkeypatch.setattr(shell_mod, "_SHELLS", {"default": session})
+    cfg = {"persistent_shell": True}
+    history = History()
+    _process_input("!cd / && X=1", cfg, EchoProvider(), history)
+    assert _process_input("!echo $X $PWD", cfg, EchoProvider(), history) == "1 /"
+    assert _process_input("!exit 2", cfg, EchoProvider(), history).startswith("Command failed with exit code 2")
+
+
+def test_malformed_commands_cannot_break_the_wrapper(session):
+    session.run("export KEPT=yes")
+    for bad in ['echo "abc', "cat <<EOF", "}", "fi"]:
+        start = time.perf_counter()
+        result = session.run(bad, timeout=5)
+        assert time.perf_counter() - start < 2, bad
+        assert not result["restarted"], bad
+    assert session.run("echo $KEPT")["output"] == "yes\n"
+    assert session.run("echo 'a b'  \"$((1 + 1))\"")["output"] == "a b 2\n"
+
+
+def test_endless_output_times_out_and_is_capped(monkeypatch, session):
+    monkeypatch.setattr(shell_mod, "MAX_OUTPUT", 4096)
+    start = time.perf_counter()
+    result = session.run("yes", timeout=1)
+    assert time.perf_counter() - start < 2
+    assert result["exit_code"] == -1 and result["restarted"]
+    first, rest = result["output"].split("\n", 1)
+    assert first.startswith("[") and first.endswith(" bytes truncated]")
+    assert len(rest.encode()) <= 4096 and rest.endswith("environment lost]\n")
+
+    chunks = []
+    small = session.run("seq 1 5000", on_output=chunks.append)
+    assert "".join(chunks).splitlines()[-1] == "5000" and len("".join(chunks)) > 4096
+    assert small["output"].endswith("\n4999\n5000\n") and "bytes truncated]" in small["output"]
@@ -0,0 +1,105 @@
+import os
+import textwrap
+import time
+
+import pytest
+
+from ecrivez.tools.testloop import TestLoop
+
+
+def _write(path, source):
+    path.write_text(textwrap.dedent(source))
+    # mtime resolution can be coarse – make every write visible
+    stamp = time.time() + getattr(_write, "bump", 0)
+    _write.bump = getattr(_write, "bump", 0) + 1
+    os.utime(path, (stamp, stamp))
+
+
+@pytest.fixture
+def project(tmp_path):
+    _write(tmp_path / "calc.py", "def add(a, b):\n    return a + b\n")
+    _write(tmp_path / "words.py", "def shout(s):\n    return s.upper()\n")
+    (tmp_path / "tests").mkdir()
+    _write(
+        tmp_path / "tests" / "test_calc.py",
+        """
+        from calc import add
+
+        def test_add():
+            assert add(1, 2) == 3
+        """,
+    )
+    _write(
+        tmp_path / "tests" / "test_words.py",
+        """
+        from words import shout
+
+        def test_shout():
+            assert shout("a") == "A"
+        """,
+    )
+    _write(tmp_path / "conftest.py", "import sys, os\nsys.path.insert(0, os.path.dirname(__file__))\n")
+    loop = TestLoop(tmp_path)
+    yield tmp_path, loop
+    loop.close()
+
+
+def test_first_run_is_full_and_builds_map(project):
+    root, loop = project
+    run = loop.run(["-q"])
+    assert run["mode"] == "full"
+    assert run["exit_code"] == 0
+    assert loop.tests["tests/test_calc.py::test_add"] == ["calc.py", "tests/test_calc.py"]
+
+
+def test_only_affected_tests_run_and_modules_are_reloaded(project):
+    root, loop = project
+    loop.run(["-q"])
+
+    _write(root / "calc.py", "def add(a, b):\n    return a - b\n")
+    run = loop.run(["-q"])
+    assert run["mode"] == "affected"
+    assert run["selected"] == ["tests/test_calc.py::test_add"]
+    assert "calc" in run["reloaded"]
+    assert run["exit_code"] == 1
+    assert "1 failed" in run["output"]
+
+    # Nothing changed since: only the previously failing test is retried.
+    assert loop.run(["-q"])["selected"] == ["tests/test_calc.py::test_add"]
+
+    _write(root / "calc.py", "def add(a, b):\n    return a + b\n")
+    assert loop.run(["-q"])["exit_code"] == 0
+    assert loop.run(["-q"])["mode"] == "none"
+
+
+def test_periodic_full_run(project):
+    root, loop = project
+    loop.full_every = 2
+    assert [loop.run(["-q"])["mode"] for _ in range(3)] == ["full", "none", "full"]
+
+
+def test_deleted_files_reselect_their_tests(project):
+    root, loop = project
+    loop.run(["-q"])
+
+    (root / "words.py").unlink()
+    run = loop.run(["-q"])
+    assert run["selected"] == ["tests/test_words.py::test_shout"] and run["exit_code"] != 0
+
+    (root / "tests" / "test_words.py").unlink()
+    run = loop.run(["-q"])
+    assert run["mode"] == "none"
+    assert not any(t.startswith("tests/test_words.py") for t in loop.tests)
+
+
+def test_hanging_test_times_out_and_worker_restarts(project):
+    root, loop = project
+    loop.run(["-q"])
+    _write(root / "tests" / "test_calc.py", "import time\n\ndef test_add():\n    time.sleep(60)\n")
+    run = loop.run(["-q"], timeout=2)
+    assert run["exit_code"] == -1 and run["duration"] < 10
+    assert "timed out" in run["output"]
+
+    _write(root / "tests" / "test_calc.py", "from calc import add\n\ndef test_add():\n    assert add(1, 2) == 3\n")
+    run = loop.run(["-q"])
+    assert run["selected"] == ["tests/test_calc.py"] and run["exit_code"] == 0
@@ -0,0 +1,94 @@
+import json
+import time
+
+from ecrivez.chat import BaseProvider, CachedProvider, EchoProvider, _process_input
+from ecrivez.history import History
+from ecrivez.toolcalls import ToolCallParser, stream_tool_calls
+
+
+def _chunks(text, size=3):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_finds_calls_across_deltas_and_keeps_prose():
+    reply = (
+        'Let me check {x} first. {"type": "tool", "tool": "shell", "cmd": "echo \\"}{\\""}'
+        ' then {"not": "a tool"} and {"type": "tool", "tool": "pytest", "args": [{"k": 1}]} done {'
+    )
+    parser = ToolCallParser()
+    calls = [call for chunk in _chunks(reply) for call in parser.feed(chunk)]
+    parser.close()
+    assert calls == [
+        {"type": "tool", "tool": "shell", "cmd": 'echo "}{"'},
+        {"type": "tool", "tool": "pytest", "args": [{"k": 1}]},
+    ]
+    assert parser.text == 'Let me check {x} first.  then {"not": "a tool"} and  done {'
+
+
+def test_tool_latency_overlaps_with_generation():
+    call = json.dumps({"type": "tool", "tool": "slow"})
+
+    def deltas():
+        yield "first " + call
+        for _ in range(5):
+            time.sleep(0.1)  # the model keeps generating for 0.5s
+            yield " more"
+
+    def execute(c):
+        time.sleep(0.4)
+        return "slow result"
+
+    streamed = stream_tool_calls(deltas(), execute)
+    assert streamed["text"] == "first  more more more more more"
+    assert [c["result"] for c in streamed["calls"]] == ["slow result"]
+    assert streamed["calls"][0]["dispatched"] < 0.05  # dispatched as soon as it closed
+    assert streamed["duration"] < 0.8  # 0.5s generation + 0.4s tool would be 0.9s sequentially
+
+
+def test_calls_run_in_order_unless_parallel():
+    import threading
+
+    log, lock = [], threading.Lock()
+
+    def execute(call):
+        time.sleep(call["sleep"])
+        with lock:
+            log.append(call["cmd"])
+        return call["cmd"]
+
+    def reply(*calls):
+        return "".join(json.dumps({"type": "tool", "tool": "shell", **c}) for c in calls)
+
+    cd, ls = {"cmd": "cd src", "sleep": 0.3}, {"cmd": "ls", "sleep": 0}
+    streamed = stream_tool_calls(_chunks(reply(cd, ls)), execute)
+    assert log == ["cd src", "ls"] and [c["result"] for c in streamed["calls"]] == ["cd src", "ls"]
+
+    log.clear()
+    stream_tool_calls(_chunks(reply({**cd, "parallel": True}, {**ls, "parallel": True})), execute)
+    assert log == ["ls", "cd src"]
+
+
+def test_model_tool_calls_in_chat():
+    class ToolModel(EchoProvider):
+        def chat_completion(self, messages):
+            return 'Listing: {"type": "tool", "tool": "shell", "cmd": "ls"} ok'
+
+    history = History()
+    cfg = {"model_tools": True}
+    reply = _process_input("what is here?", cfg, ToolModel(), history, shell=lambda cmd: f"ran {cmd}")
+    assert reply == 'Listing:  ok\n\n[tool {"cmd": "ls", "tool": "shell", "type": "tool"}]\nran ls'
+    # without the setting the reply is left alone
+    assert "ran ls" not in _process_input("again", {}, ToolModel(), history, shell=lambda cmd: f"ran {cmd}")
+
+
+def test_model_tool_calls_without_streaming():
+    class ToolModel(BaseProvider):
+        name = "tool-model"
+
+        def chat_completion(self, messages):
+            return 'Listing: {"type": "tool", "tool": "shell", "cmd": "ls"} ok'
+
+    provider = CachedProvider(ToolModel())
+    assert not hasattr(provider, "stream_completion")
+    reply = _process_input("what is here?", {"model_tools": True}, provider, History(), shell=lambda cmd: f"ran {cmd}")
+    assert reply.endswith('[tool {"cmd": "ls", "tool": "shell", "type": "tool"}]\nran ls')
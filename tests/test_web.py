@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from ecrivez.chat import EchoProvider
+from ecrivez.history import History
+from ecrivez.ui.web import make_handler
+
+
+class Request:
+    def __init__(self, session_hash):
+        self.session_hash = session_hash
+
+
+def test_handler_streams_and_keeps_sessions_apart():
+    respond = make_handler(EchoProvider(), shell=lambda cmd: f"ran {cmd}")
+    updates = list(respond("hello big world", [], None, Request("a")))
+    assert len(updates) >= 2  # partial reply first, final reply last
+    _, chat, history_a = updates[-1]
+    assert chat[-1] == {"role": "assistant", "content": "(echo) hello big world"}
+    assert isinstance(history_a, History) and len(history_a) == 2
+
+    *_, (_, chat_b, history_b) = respond("other", [], None, Request("b"))
+    assert history_b is not history_a and len(history_a) == 2
+    *_, (_, chat, _) = respond("!ls", chat, history_a, Request("a"))
+    assert chat[-1]["content"] == "ran ls" and len(history_a) == 4
+
+
+def test_slow_tool_does_not_block_other_sessions():
+    def shell(cmd):
+        time.sleep(1.0)
+        return "slow"
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    respond = make_handler(EchoProvider(), pool=ThreadPoolExecutor(4), shell=shell)
+    with ThreadPoolExecutor(2) as users:
+        slow = users.submit(lambda: list(respond("!sleep", [], None, Request("a"))))
+        time.sleep(0.1)
+        started = time.perf_counter()
+        fast = list(respond("quick", [], None, Request("b")))
+        assert time.perf_counter() - started < 0.5
+        assert fast[-1][1][-1]["content"] == "(echo) quick"
+        assert slow.result()[-1][1][-1]["content"] == "slow"
+
+
+def test_load_test_against_local_server():
+    pytest.importorskip("gradio")
+    pytest.importorskip("gradio_client")
+    from ecrivez.ui.web import load_test
+
+    stats = load_test(EchoProvider(), clients=8, turns=3, concurrency=4)
+    assert stats["errors"] == []
+    assert stats["turns"] == 24
+    assert stats["turns_per_second"] > 0 and stats["latency_p50"] <= stats["latency_max"]
+
+
+def test_closing_a_session_closes_its_shell():
+    from ecrivez.tools import shell as shell_mod
+    from ecrivez.ui.web import close_session
+
+    respond = make_handler(EchoProvider(), cfg={"persistent_shell": True})
+    *_, (_, chat, _) = respond("!echo hi", [], None, Request("gone"))
+    assert chat[-1]["content"] == "hi"
+    session = shell_mod._SHELLS["web-gone"]
+    close_session(Request("gone"))
+    assert "web-gone" not in shell_mod._SHELLS
+    assert not session.alive
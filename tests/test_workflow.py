@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from ecrivez.chat import EchoProvider
+from ecrivez.workflow import Step, Workflow, WorkflowError, load_workflow
+
+
+def _sleepy(results, value, delay=0.2):
+    time.sleep(delay)
+    return value + "".join(str(results[k]) for k in sorted(results))
+
+
+def test_independent_steps_finish_in_critical_path_time():
+    steps = [
+        Step("a", _sleepy, params={"value": "a"}),
+        Step("b", _sleepy, ["a"], {"value": "b"}),
+        Step("c", _sleepy, ["a"], {"value": "c"}),
+        Step("d", _sleepy, ["a"], {"value": "d"}),
+        Step("e", _sleepy, ["b", "c", "d"], {"value": "e"}),
+    ]
+    start = time.perf_counter()
+    results = Workflow(steps, max_concurrency=4).run_sync()
+    elapsed = time.perf_counter() - start
+
+    assert results["e"] == "ebacada"
+    assert elapsed < 0.8  # 3 levels × 0.2 s, not 5 × 0.2 s
+
+
+def test_checkpoint_skips_finished_steps(tmp_path):
+    calls = []
+
+    def record(results, value):
+        calls.append(value)
+        return value
+
+    def build(b_value):
+        return Workflow(
+            [
+                Step("a", record, params={"value": "a"}),
+                Step("b", record, ["a"], {"value": b_value}),
+                Step("c", record, ["b"], {"value": "c"}),
+            ],
+            checkpoint=tmp_path / "wf.jsonl",
+        )
+
+    build("b").run_sync()
+    again = build("b")
+    again.run_sync()
+    assert calls == ["a", "b", "c"]
+    assert again.skipped == ["a", "b", "c"]
+
+    changed = build("B")
+    changed.run_sync()
+    assert changed.skipped == ["a"]
+    assert changed.executed == ["b", "c"]
+
+
+def test_failure_keeps_partial_checkpoint(tmp_path):
+    def boom(results):
+        raise RuntimeError("kaboom")
+
+    wf = Workflow(
+        [Step("ok", _sleepy, params={"value": "x", "delay": 0}), Step("bad", boom, ["ok"])],
+        checkpoint=tmp_path / "wf.jsonl",
+    )
+    with pytest.raises(WorkflowError) as exc:
+        wf.run_sync()
+    assert exc.value.step == "bad"
+    assert exc.value.results == {"ok": "x"}
+    assert "ok" in (tmp_path / "wf.jsonl").read_text()
+
+
+def test_failure_checkpoints_steps_finished_alongside_it(tmp_path):
+    async def ok(results):
+        return "fine"
+
+    async def bad(results):
+        raise RuntimeError("kaboom")
+
+    def never(results):
+        raise AssertionError("launched after a failure")
+
+    wf = Workflow(
+        [Step("bad", bad), Step("ok", ok), Step("next", never, ["ok"])],
+        checkpoint=tmp_path / "wf.jsonl",
+    )
+    with pytest.raises(WorkflowError) as exc:
+        wf.run_sync()  # both async steps finish in the same wakeup
+    assert exc.value.step == "bad"
+    assert exc.value.results == {"ok": "fine"}
+    assert '"fine"' in (tmp_path / "wf.jsonl").read_text()
+
+
+def test_cancellation_stops_pending_steps():
+    started = []
+
+    async def slow(results, value):
+        started.append(value)
+        await asyncio.sleep(10)
+
+    wf = Workflow([Step("a", slow, params={"value": "a"}), Step("b", slow, ["a"], {"value": "b"})])
+
+    async def main():
+        task = asyncio.create_task(wf.run())
+        await asyncio.sleep(0.05)
+        wf.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert started == ["a"]
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError, match="Cycle"):
+        Workflow([Step("a", _sleepy, ["b"]), Step("b", _sleepy, ["a"])])
+
+
+def test_load_workflow_spec(tmp_path):
+    spec = {
+        "inputs": {"task": "dates"},
+        "steps": [
+            {"name": "ask", "prompt": "test for {task}"},
+            {"name": "write", "edit": str(tmp_path / "out.txt"), "source": "ask"},
+            {"name": "show", "shell": f"cat {tmp_path / 'out.txt'}", "deps": ["write"]},
+        ],
+    }
+    results = load_workflow(spec, provider=EchoProvider()).run_sync()
+    assert results["show"] == "(echo) test for dates"
+
+
+def test_edit_content_change_reruns_dependents(tmp_path):
+    target = tmp_path / "out.txt"
+
+    def build(content):
+        return load_workflow(
+            {
+                "steps": [
+                    {"name": "write", "edit": str(target), "content": content},
+                    {"name": "run", "shell": "cat {write[path]}", "deps": ["write"]},
+                ]
+            },
+            checkpoint=tmp_path / "wf.jsonl",
+        )
+
+    assert build("A").run_sync()["run"] == "A"
+    changed = build("B")
+    assert changed.run_sync()["run"] == "B"
+    assert changed.executed == ["write", "run"]
+
+
+def test_failing_shell_step_fails_and_is_not_memoised(tmp_path):
+    def build():
+        return load_workflow({"steps": [{"name": "check", "shell": "false"}]}, checkpoint=tmp_path / "wf.jsonl")
+
+    for _ in range(2):
+        with pytest.raises(WorkflowError, match="exit code 1"):
+            build().run_sync()
+    assert not (tmp_path / "wf.jsonl").exists()